@@ -0,0 +1,253 @@
+"""
+Logging-Pipeline für cbv_goodwill.
+
+Log-Einträge werden im Request nur in eine Queue gestellt (``BackgroundHandler``);
+ein Hintergrund-Thread (``QueueListener``) formatiert und schreibt sie in
+Konsole und rotierende Datei. Optional als JSON-Zeilen mit ``request_id``,
+``lender_id`` und ``duration_ms``.
+
+Gesteuert über Umgebungsvariablen (siehe ``logging_config``):
+
+    LOG_LEVEL=INFO                      Root-Level
+    LOG_LEVELS=lenders=DEBUG,django.db.backends=WARNING
+    LOG_FORMAT=json                     text (Standard) oder json
+    LOG_FILE=/var/log/cbv/app.log       leer = keine Datei
+    LOG_ROTATION=size                   size oder time
+    LOG_MAX_BYTES=10485760              bei size
+    LOG_WHEN=midnight                   bei time
+    LOG_BACKUP_COUNT=7
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+_plain_formatter = logging.Formatter()
+
+# Felder, die – falls vorhanden – in jede JSON-Zeile übernommen werden.
+CONTEXT_FIELDS = ("request_id", "lender_id", "duration_ms", "status", "method", "path")
+
+
+# -----------------------
+# 🧵 Handler
+# -----------------------
+
+class BackgroundHandler(QueueHandler):
+    """QueueHandler, der seine Ziel-Handler über einen eigenen Thread bedient.
+
+    In ``LOGGING`` werden die Ziele per ``cfg://handlers.<name>`` angegeben.
+    Nach einem ``fork`` (gunicorn mit ``preload_app``) startet der Listener im
+    neuen Prozess automatisch neu – Threads überleben den Fork nicht.
+    """
+
+    def __init__(self, handlers, queue_size=10000):
+        # Index-Zugriff, damit dictConfig die "cfg://"-Verweise auflöst.
+        self.targets = [handlers[i] for i in range(len(handlers))]
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self.listener = None
+        super().__init__(queue.Queue(queue_size))
+        self._start()
+        atexit.register(self.stop)
+
+    def _start(self):
+        self.queue = queue.Queue(self.queue_size)
+        self.listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+        self._pid = os.getpid()
+
+    def stop(self):
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Lieber einzelne Zeilen verlieren als den Request blockieren.
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Wie QueueHandler.prepare, aber Traceback getrennt von der Nachricht
+        # halten – der JsonFormatter schreibt ihn in ein eigenes Feld.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _plain_formatter.formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def close(self):
+        self.stop()
+        super().close()
+
+
+class RequestContextFilter(logging.Filter):
+    """Hängt die ``request_id`` des laufenden Requests an jeden Eintrag.
+
+    Muss am ``BackgroundHandler`` hängen, damit die ID noch im Request-Thread
+    gelesen wird – der Listener-Thread kennt sie nicht.
+    """
+
+    def filter(self, record):
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Eine JSON-Zeile pro Eintrag."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None and value != "-":
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+# -----------------------
+# 🆔 Middleware
+# -----------------------
+
+class RequestIdMiddleware:
+    """Vergibt pro Request eine ID (oder übernimmt ``X-Request-ID``) und loggt die Dauer."""
+
+    logger = logging.getLogger("cbv_goodwill.requests")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+        request.request_id = request_id
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            response["X-Request-ID"] = request_id
+            self.logger.info(
+                "%s %s → %s", request.method, request.path, response.status_code,
+                extra={
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "status": response.status_code,
+                    "method": request.method,
+                    "path": request.path,
+                },
+            )
+            return response
+        finally:
+            request_id_var.reset(token)
+
+
+# -----------------------
+# ⚙️ Konfiguration
+# -----------------------
+
+def parse_levels(value):
+    """``"lenders=DEBUG,django.db.backends=WARNING"`` → {logger: level}."""
+    levels = {}
+    for item in (value or "").split(","):
+        name, _, level = item.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def logging_config(level="INFO", log_file=None, levels=None):
+    """Baut das ``LOGGING``-Dict; Umgebungsvariablen haben Vorrang vor den Argumenten."""
+    level = os.environ.get("LOG_LEVEL", level).upper()
+    log_file = os.environ.get("LOG_FILE", log_file)
+    log_format = os.environ.get("LOG_FORMAT", "text")
+    backup_count = int(os.environ.get("LOG_BACKUP_COUNT", 7))
+
+    handlers = {
+        "console": {
+            "class": "logging.StreamHandler",
+            "formatter": log_format,
+        },
+    }
+    if log_file:
+        if os.environ.get("LOG_ROTATION", "size") == "time":
+            handlers["file"] = {
+                "class": "logging.handlers.TimedRotatingFileHandler",
+                "filename": str(log_file),
+                "when": os.environ.get("LOG_WHEN", "midnight"),
+                "backupCount": backup_count,
+                "encoding": "utf-8",
+                "formatter": log_format,
+            }
+        else:
+            handlers["file"] = {
+                "class": "logging.handlers.RotatingFileHandler",
+                "filename": str(log_file),
+                "maxBytes": int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024)),
+                "backupCount": backup_count,
+                "encoding": "utf-8",
+                "formatter": log_format,
+            }
+    # Name "queue" sortiert hinter "console"/"file": dictConfig richtet die Ziele zuerst ein.
+    handlers["queue"] = {
+        "()": BackgroundHandler,
+        "handlers": [f"cfg://handlers.{name}" for name in handlers],
+        "filters": ["request_context"],
+    }
+
+    loggers = {
+        # SQL-Zeilen und Autoreload-Rauschen nur auf ausdrücklichen Wunsch (LOG_LEVELS).
+        "django.db.backends": {"level": "INFO"},
+        "django.utils.autoreload": {"level": "INFO"},
+    }
+    for name, logger_level in {**(levels or {}), **parse_levels(os.environ.get("LOG_LEVELS"))}.items():
+        loggers[name] = {"level": logger_level}
+
+    return {
+        "version": 1,
+        "disable_existing_loggers": False,
+        "filters": {
+            "request_context": {"()": RequestContextFilter},
+        },
+        "formatters": {
+            "text": {
+                "format": "[{levelname}] {asctime} {name} [{request_id}]: {message}",
+                "style": "{",
+            },
+            "json": {
+                "()": JsonFormatter,
+            },
+        },
+        "handlers": handlers,
+        "loggers": loggers,
+        "root": {
+            "handlers": ["queue"],
+            "level": level,
+        },
+    }
@@ -14,6 +14,8 @@ import os
 from pathlib import Path
 import dj_database_url
 
+from .log import logging_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cbv_goodwill.log.RequestIdMiddleware',
+    'lenders.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -81,6 +85,37 @@ DATABASES = {
     )
 }
 
+# Cache (Reports, Kalender-Feed, Versionszähler – siehe lenders/cache.py)
+# Ohne CACHE_DIR: LocMem pro Prozess. Mit CACHE_DIR teilen sich alle Worker einen Dateicache.
+if os.environ.get("CACHE_DIR"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ["CACHE_DIR"],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cbv-goodwill',
+        }
+    }
+LENDERS_CACHE_TIMEOUT = 60 * 60 * 24
+LENDERS_REPORT_PAGE_SIZE = 100  # Zeilen pro Seite in der Rohdaten-Liste der Zahlungen
+LENDERS_QUOTE_MAX_CANDIDATES = 100  # Zeiträume pro Anfrage an /lenders/quotes/
+LENDERS_AVAILABILITY_HORIZON_DAYS = 730  # Suchhorizont für freie Zeitfenster
+LENDERS_SEARCH_LIMIT = 200  # Treffer der Admin-Suche (lenders/search.py), beste zuerst
+LENDERS_SEARCH_MIN_SIMILARITY = 0.4  # Mindestähnlichkeit der unscharfen Suche (0–1)
+
+# 🏦 Kontoauszug-Import: automatische Zuordnung nur bei sicherem, eindeutigem Treffer (lenders/matching.py)
+LENDERS_MATCH_MIN_CONFIDENCE = 0.8
+LENDERS_MATCH_MIN_MARGIN = 0.1
+
+# ⏱ Laufzeit-/SQL-Messung pro View (lenders/metrics.py, Übersicht im Admin)
+LENDERS_METRICS_ENABLED = os.environ.get("LENDERS_METRICS_ENABLED", "1") != "0"
+LENDERS_METRICS_FLUSH_INTERVAL = 60  # Sekunden
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -125,31 +160,16 @@ EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD")
 # 📬 Absenderadresse (nicht nochmal überschreiben!)
 DEFAULT_FROM_EMAIL = "Casa Bella Vista <casabelavista@amt-fuer-liebe-und-dankbarkeit.de>"
 
-import os  # falls nicht schon vorhanden
-
-LOGGING = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '[{levelname}] {asctime} {name}: {message}',
-            'style': '{',
-        },
-    },
-    'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
-        },
-        'file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'debug.log'),
-            'formatter': 'verbose',
-        },
-    },
-    'root': {
-        'handlers': ['console', 'file'],
-        'level': 'DEBUG',
-    },
-}
+# 📮 E-Mail-Ausgang (lenders/outbox.py, Versand per "manage.py process_outbox")
+LENDERS_OUTBOX_BATCH_SIZE = 50
+LENDERS_OUTBOX_MAX_ATTEMPTS = 6
+LENDERS_OUTBOX_RETRY_BASE = 60  # Sekunden, verdoppelt sich pro Fehlversuch
+LENDERS_OUTBOX_RETRY_MAX = 6 * 60 * 60
+LENDERS_BULK_EMAIL_CHUNK_SIZE = 100  # Nachrichten pro send_messages()-Aufruf beim Serienversand
+
+# 📝 Logging: Schreiben im Hintergrund-Thread, rotierende Datei, optional JSON
+# (Steuerung per LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_FILE … – siehe cbv_goodwill/log.py)
+LOGGING = logging_config(
+    level="DEBUG" if DEBUG else "INFO",
+    log_file=os.path.join(BASE_DIR, 'debug.log'),
+)
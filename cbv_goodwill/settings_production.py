@@ -0,0 +1,101 @@
+"""
+Produktions-Settings für cbv_goodwill.
+
+Aktivierung über die Umgebung:
+
+    DJANGO_SETTINGS_MODULE=cbv_goodwill.settings_production
+
+Alles, was hier nicht überschrieben wird, kommt aus ``settings.py``.
+Start mit gunicorn, siehe ``gunicorn.conf.py`` und ``docs/production.md``.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, TEMPLATES
+from .log import logging_config
+
+import dj_database_url
+
+
+def env_bool(name, default=False):
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+# SECURITY: In Produktion kommt der Schlüssel ausschließlich aus der Umgebung.
+SECRET_KEY = os.environ["SECRET_KEY"]
+DEBUG = env_bool("DEBUG", False)
+
+ALLOWED_HOSTS = os.environ.get(
+    "ALLOWED_HOSTS", "cbvgoodwill.onrender.com,localhost,127.0.0.1"
+).split(",")
+CSRF_TRUSTED_ORIGINS = [
+    origin for origin in os.environ.get("CSRF_TRUSTED_ORIGINS", "https://cbvgoodwill.onrender.com").split(",") if origin
+]
+
+# TLS wird vom Proxy (Render, nginx …) terminiert.
+SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
+SESSION_COOKIE_SECURE = env_bool("SECURE_COOKIES", True)
+CSRF_COOKIE_SECURE = env_bool("SECURE_COOKIES", True)
+
+# Database
+# Persistente Verbindungen: jeder gunicorn-Thread behält seine Verbindung
+# DB_CONN_MAX_AGE Sekunden, statt pro Request neu zu verbinden.
+# Mit DB_POOL=1 (nur PostgreSQL mit psycopg 3) übernimmt stattdessen Djangos
+# Connection-Pool – persistente Verbindungen sind dann abgeschaltet.
+DB_POOL = env_bool("DB_POOL", False)
+DATABASES = {
+    'default': dj_database_url.config(
+        default=os.environ.get("DATABASE_URL", f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
+        conn_max_age=0 if DB_POOL else int(os.environ.get("DB_CONN_MAX_AGE", 600)),
+        conn_health_checks=True,
+    )
+}
+if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+        "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+    }
+
+# Templates: gecachter Loader ohne Dateisystem-Prüfung (E-Mail- und Report-Templates
+# werden nur einmal pro Prozess kompiliert). Änderungen erfordern einen Neustart.
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'debug': False,
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]
+
+# Statische Dateien: WhiteNoise mit komprimierten, gehashten Dateien
+# (STATICFILES_STORAGE aus settings.py wird seit Django 5.1 ignoriert).
+# Setzt ``collectstatic`` voraus – das Dockerfile erledigt das beim Build.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+}
+
+# Cache: mehrere gunicorn-Worker müssen dieselben Versionszähler sehen
+# (lenders/cache.py) – deshalb standardmäßig ein gemeinsamer Dateicache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get("CACHE_DIR", "/tmp/cbv-goodwill-cache"),
+    }
+}
+
+# Sessions aus Cache + Datenbank: spart pro Request die Session-Abfrage.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Logging: INFO, nur Konsole (gunicorn sammelt sie ein). Datei per LOG_FILE,
+# JSON-Zeilen per LOG_FORMAT=json, einzelne Logger per LOG_LEVELS.
+LOGGING = logging_config(level="INFO", log_file=None)
@@ -0,0 +1,31 @@
+# gunicorn.conf.py
+# Start: gunicorn -c gunicorn.conf.py cbv_goodwill.wsgi
+# Alle Werte lassen sich über Umgebungsvariablen überschreiben (siehe docs/production.md).
+import multiprocessing
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cbv_goodwill.settings_production")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Prozesse nach CPU-Anzahl, dazu Threads pro Prozess: die Requests warten
+# überwiegend auf die Datenbank, nicht auf die CPU.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+
+# App einmal im Master laden (schnellerer Start, geteilter Speicher per Copy-on-Write).
+# Datenbankverbindungen öffnet Django erst im Request – also erst im Worker.
+preload_app = True
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Worker regelmäßig erneuern, falls doch etwas Speicher leckt.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = 100
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
@@ -1,4 +1,4 @@
-from .email_utils import send_custom_email
+from .email_utils import email_language, send_bulk_email, send_custom_email
 from django.contrib import admin, messages
 from django import forms
 from django.template.loader import render_to_string
@@ -9,15 +9,20 @@ from django.utils.html import format_html, mark_safe, strip_tags
 from django.utils.translation import gettext_lazy as _, activate
 from django.core.mail import EmailMultiAlternatives
 from django.core.exceptions import ValidationError
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.auth.admin import GroupAdmin, UserAdmin
 from django.contrib.auth.models import User, Group
+from datetime import timedelta
 from decimal import Decimal
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils import timezone
 
 from .models import (
     Lender, Loan, Payment, Booking, Apartment,
-    SeasonalRate, SentConfirmation
+    SeasonalRate, SentConfirmation, EmailOutbox, ExchangeRate, LANGUAGE_CHOICES
 )
-from .forms import BookingAdminForm, LenderAdminForm
-from .signals import send_booking_confirmation, send_payment_confirmation
+from .forms import BankImportForm, BookingAdminForm, ExportFilterForm, LenderAdminForm
+from . import bank_import, exports, metrics, outbox, reports, search
 
 # -----------------------
 # 📧 Admin E-Mail-Formular
@@ -33,12 +38,29 @@ class AdminEmailForm(forms.Form):
     subject = forms.CharField(label="Betreff", max_length=200)
     message = forms.CharField(label="Nachricht", widget=forms.Textarea(attrs={"rows": 6}))
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        lender_autocomplete(self, SentConfirmation)
+
     def clean(self):
         cleaned_data = super().clean()
         if not cleaned_data.get("lender") and not cleaned_data.get("custom_email"):
             raise ValidationError("Bitte entweder einen Lender auswählen oder eine E-Mail-Adresse eingeben.")
         return cleaned_data
 
+class BroadcastEmailForm(forms.Form):
+    subject_de = forms.CharField(label="Betreff (Deutsch)", max_length=200)
+    message_de = forms.CharField(label="Nachricht (Deutsch)", widget=forms.Textarea(attrs={"rows": 6}))
+    subject_en = forms.CharField(label="Betreff (Englisch, optional)", max_length=200, required=False)
+    message_en = forms.CharField(label="Nachricht (Englisch, optional)", widget=forms.Textarea(attrs={"rows": 6}), required=False)
+
+    def texts(self, language):
+        """Betreff und Nachricht für eine Sprache – ohne englischen Text gilt der deutsche."""
+        data = self.cleaned_data
+        if language == "en" and data.get("subject_en") and data.get("message_en"):
+            return data["subject_en"], data["message_en"]
+        return data["subject_de"], data["message_de"]
+
 # -----------------------
 # 📌 Custom AdminSite
 # -----------------------
@@ -54,35 +76,105 @@ class CustomAdminSite(admin.AdminSite):
             path("auswahlbereich/reports/raw/", self.admin_view(self.payment_list_raw), name="payment_list_raw"),
             path("auswahlbereich/reports/with-usage/", self.admin_view(self.payment_list_with_usage), name="payment_list_with_usage"),
             path("auswahlbereich/reports/apartments/", self.admin_view(self.apartment_price_list), name="apartment_price_list"),
+            path("auswahlbereich/reports/occupancy/", self.admin_view(self.occupancy_report), name="occupancy_report"),
+            path("auswahlbereich/performance/", self.admin_view(self.request_metrics_view), name="request_metrics"),
+            path("auswahlbereich/export/", self.admin_view(self.export_view), name="export"),
+            path("auswahlbereich/import/", self.admin_view(self.bank_import_view), name="bank_import"),
             path("send-email/", self.admin_view(self.send_email_view), name="send_custom_email"),
         ]
         return custom_urls + urls
 
     def payment_list_raw(self, request):
-        payments = Payment.objects.select_related("lender").order_by("lender__last_name", "date")
-        return TemplateResponse(request, "admin/lenders/reports/payment_list_raw.html", {"payments": payments})
+        return TemplateResponse(request, "admin/lenders/reports/payment_list_raw.html", {
+            **self.each_context(request),
+            **reports.payment_list_raw_context(request),
+        })
 
     def payment_list_with_usage(self, request):
-        lenders = []
-        for lender in Lender.objects.all():
-            total_payments = sum(p.amount_eur() for p in lender.payments.all())
-            total_used = sum(b.total_cost() for b in lender.bookings.all())
-            balance = total_payments - total_used
-            lenders.append({
-                "lender": lender,
-                "total_payments": total_payments,
-                "total_used": total_used,
-                "balance": balance
-            })
         return TemplateResponse(
             request,
             "admin/lenders/reports/payment_list_with_usage.html",
-            {"lenders": lenders}
+            {"table": reports.payment_list_with_usage_table()}
         )
 
     def apartment_price_list(self, request):
-        apartments = Apartment.objects.prefetch_related("seasonal_rates").all()
-        return TemplateResponse(request, "admin/lenders/reports/apartment_price_list.html", {"apartments": apartments})
+        return TemplateResponse(request, "admin/lenders/reports/apartment_price_list.html", {
+            "table": reports.apartment_price_list_table()
+        })
+
+    def occupancy_report(self, request):
+        return TemplateResponse(request, "admin/lenders/reports/occupancy.html", {
+            **self.each_context(request),
+            "title": "📈 Auslastung und Umsatz",
+            **reports.occupancy_report_context(request),
+        })
+
+    def request_metrics_view(self, request):
+        try:
+            hours = int(request.GET.get("hours", 24))
+        except ValueError:
+            hours = 24
+        bounds = {name: bounds[-1] for name, bounds in metrics.METRICS.items()}
+
+        def upper(name, value):
+            return f"> {bounds[name]}" if value is None else f"≤ {value}"
+
+        rows = [
+            {
+                **entry,
+                "wall": [upper("wall_ms", entry[f"wall_ms_p{q}"]) for q in (50, 95, 99)],
+                "queries": [upper("queries", entry[f"queries_p{q}"]) for q in (50, 95, 99)],
+                "sql": [upper("sql_ms", entry[f"sql_ms_p{q}"]) for q in (50, 95, 99)],
+            }
+            for entry in metrics.summary(since=timezone.now() - timedelta(hours=hours))
+        ]
+        return TemplateResponse(request, "admin/lenders/reports/request_metrics.html", {
+            **self.each_context(request),
+            "title": "⏱ Laufzeiten pro Ansicht",
+            "rows": rows,
+            "hours": hours,
+            "hour_choices": [(1, "1 Stunde"), (24, "24 Stunden"), (24 * 7, "7 Tage"), (24 * 30, "30 Tage")],
+        })
+
+    def export_view(self, request):
+        form = ExportFilterForm(request.GET or None)
+        lender_autocomplete(form, Payment)
+        dataset, fmt = request.GET.get("dataset"), request.GET.get("fmt")
+        if form.is_valid() and dataset in exports.DATASETS and fmt in exports.FORMATS:
+            return exports.export_response(dataset, fmt, **form.cleaned_data)
+        return TemplateResponse(request, "admin/lenders/export.html", {
+            **self.each_context(request),
+            "title": "📤 Export (CSV / Excel)",
+            "form": form,
+            "datasets": [(name, meta["title"]) for name, meta in exports.DATASETS.items()],
+        })
+
+    def bank_import_view(self, request):
+        form = BankImportForm(request.POST or None, request.FILES or None)
+        result = None
+        if request.method == "POST" and form.is_valid():
+            upload = form.cleaned_data["file"]
+            try:
+                result = bank_import.import_file(
+                    upload, upload.name,
+                    dry_run=form.cleaned_data["dry_run"],
+                    notify=form.cleaned_data["notify"],
+                )
+            except bank_import.ImportFormatError as e:
+                messages.error(request, f"❌ Import fehlgeschlagen: {e}")
+            else:
+                if not form.cleaned_data["dry_run"]:
+                    messages.success(
+                        request,
+                        f"🏦 {result['created']} Zahlung(en) angelegt, {len(result['skipped'])} übersprungen, "
+                        f"{result['emails']} E-Mail(s) eingereiht.",
+                    )
+        return TemplateResponse(request, "admin/lenders/bank_import.html", {
+            **self.each_context(request),
+            "title": "🏦 Kontoauszug importieren",
+            "form": form,
+            "result": result,
+        })
 
     def send_email_view(self, request):
         form = AdminEmailForm(request.POST or None)
@@ -136,34 +228,157 @@ class CustomAdminSite(admin.AdminSite):
 
 custom_admin_site = CustomAdminSite(name="custom_admin")
 
+
+def lender_autocomplete(form, source_model):
+    """Lender-Auswahl als Suchfeld (Admin-Autocomplete, Suche über LenderAdmin) statt einer Liste aller Lender."""
+    field = form.fields["lender"]
+    field.widget = AutocompleteSelect(
+        source_model._meta.get_field("lender"), custom_admin_site, attrs={"style": "width: 20em"},
+    )
+    field.widget.choices = field.choices
+
+# -----------------------
+# 🔎 Admin-Suche mit Index und Rangfolge
+# -----------------------
+class RankedSearchMixin:
+    """Suche über lenders.search statt icontains; Treffer nach Relevanz sortiert.
+
+    ``ranked_search``: Paare (Suchindex, Feld dieses Models mit den IDs des Index).
+    Kann der Index nicht helfen, sucht Django wie gewohnt über ``search_fields``.
+    """
+    ranked_search = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        ranking = []
+        for name, field in self.ranked_search:
+            ids = search.search_ids(name, search_term)
+            if ids is None:
+                return super().get_search_results(request, queryset, search_term)
+            ranking += [(position, field, pk) for position, pk in enumerate(ids)]
+        if not ranking:
+            return queryset.none(), False
+        ranking.sort()
+        condition = Q()
+        for _name, field in self.ranked_search:
+            condition |= Q(**{f"{field}__in": [pk for _position, f, pk in ranking if f == field]})
+        # Erste passende Bedingung zählt – dank Sortierung die beste Position
+        rank = Case(
+            *[When(**{field: pk}, then=Value(position)) for position, field, pk in ranking],
+            default=Value(len(ranking)),
+            output_field=IntegerField(),
+        )
+        request.lenders_ranked_search = True
+        return queryset.filter(condition).annotate(search_rank=rank).order_by("search_rank", "pk"), False
+
+    def get_ordering(self, request):
+        ordering = tuple(super().get_ordering(request) or ())
+        if getattr(request, "lenders_ranked_search", False):
+            # Changelist: Relevanz vor der Standard-Sortierung (Spaltenklick hat Vorrang)
+            return ("search_rank",) + ordering
+        return ordering
+
+
+class ExportActionsMixin:
+    """Admin-Aktionen „Als CSV/Excel exportieren“ für die ausgewählten Zeilen."""
+    export_dataset = None
+
+    def _export(self, queryset, fmt):
+        # Annotationen der Changelist (z. B. with_balance) nicht doppelt anwenden
+        selection = self.model.objects.filter(pk__in=queryset.order_by().values("pk"))
+        return exports.export_response(self.export_dataset, fmt, queryset=selection)
+
+    @admin.action(description="📄 Als CSV exportieren")
+    def export_csv(self, request, queryset):
+        return self._export(queryset, "csv")
+
+    @admin.action(description="📊 Als Excel exportieren")
+    def export_xlsx(self, request, queryset):
+        return self._export(queryset, "xlsx")
+
 @admin.register(Lender, site=custom_admin_site)
-class LenderAdmin(admin.ModelAdmin):
+class LenderAdmin(RankedSearchMixin, ExportActionsMixin, admin.ModelAdmin):
     form = LenderAdminForm
+    export_dataset = "balances"
     list_display = ("first_name", "last_name", "email", "language", "discount_percent", "get_current_balance_display")
+    search_fields = ("first_name", "last_name", "email")
+    ranked_search = [("lender", "pk")]
 
-    @admin.display(description="Saldo")
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_balance()
+
+    @admin.display(description="Saldo", ordering="balance")
     def get_current_balance_display(self, obj):
-        try:
-            return f"{obj.current_balance():.2f} €"
-        except Exception as e:
-            return f"Fehler: {e}"
+        return f"{obj.balance:.2f} €"
+
+    actions = ["broadcast_email", "export_csv", "export_xlsx"]
+
+    @admin.action(description="📣 E-Mail an ausgewählte Lender senden")
+    def broadcast_email(self, request, queryset):
+        form = BroadcastEmailForm(request.POST if "apply" in request.POST else None)
+        if form.is_valid():
+            texts = {language: form.texts(language) for language, _label in LANGUAGE_CHOICES}
+            lenders = queryset.order_by("language", "last_name").only("first_name", "last_name", "email", "language")
+
+            def message(lender):
+                language = email_language(lender.language, texts)
+                return lender.email, language, {"lender": lender, "message": texts[language][1]}
+
+            try:
+                result = send_bulk_email(
+                    (message(lender) for lender in lenders),
+                    subject={language: subject for language, (subject, _message) in texts.items()},
+                    template_name="emails/broadcast_{language}.html",
+                )
+            except Exception as e:
+                self.message_user(request, f"❌ Serienversand fehlgeschlagen: {e}", messages.ERROR)
+                return None
+            level = messages.SUCCESS if not result["failed"] else messages.WARNING
+            self.message_user(
+                request,
+                f"📣 {result['sent']} E-Mail(s) gesendet, {result['failed']} fehlgeschlagen.",
+                level,
+            )
+            return None
+
+        return TemplateResponse(request, "admin/lenders/broadcast_email.html", {
+            **self.admin_site.each_context(request),
+            "title": "📣 E-Mail an ausgewählte Lender",
+            "form": form,
+            "lenders": queryset,
+            "action_checkbox_name": admin.helpers.ACTION_CHECKBOX_NAME,
+            "opts": self.model._meta,
+        })
 
 @admin.register(Payment, site=custom_admin_site)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(RankedSearchMixin, ExportActionsMixin, admin.ModelAdmin):
     list_display = ("lender", "date", "original_amount", "currency", "is_fixed_display", "get_amount_eur_display")
     list_filter = ("currency", "is_fixed", "date")
     search_fields = ("lender__first_name", "lender__last_name")
+    ranked_search = [("lender", "lender_id")]
+    list_select_related = ("lender",)
+    autocomplete_fields = ("lender",)
+    export_dataset = "payments"
+    actions = ["export_csv", "export_xlsx"]
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "loan":
+            # Loan.__str__ zeigt den Lender – sonst eine Abfrage pro Auswahleintrag
+            kwargs["queryset"] = Loan.objects.select_related("lender")
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
     @admin.display(description="Typ")
     def is_fixed_display(self, obj):
         return _("Fixbetrag") if obj.is_fixed else _("Flexibel")
 
-    @admin.display(description="Betrag in EUR")
+    @admin.display(description="Betrag in EUR", ordering="amount_eur")
     def get_amount_eur_display(self, obj):
-        try:
-            return f"{obj.amount_eur():,.2f} €"
-        except Exception:
-            return "–"
+        return f"{obj.amount_eur:,.2f} €"
+
+@admin.register(ExchangeRate, site=custom_admin_site)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ("date", "currency", "rate", "source")
+    list_filter = ("currency", "source")
+    date_hierarchy = "date"
 
 @admin.register(Apartment, site=custom_admin_site)
 class ApartmentAdmin(admin.ModelAdmin):
@@ -180,10 +395,14 @@ class SeasonalRateAdmin(admin.ModelAdmin):
     ordering = ("apartment__name", "start_date")
 
 @admin.register(Booking, site=custom_admin_site)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(ExportActionsMixin, admin.ModelAdmin):
     form = BookingAdminForm
     list_display = ("lender", "apartment", "start_date", "end_date", "total_cost_display", "custom_total_price")
+    list_select_related = ("lender", "apartment")
+    autocomplete_fields = ("lender",)
     readonly_fields = ("_saldo_warnung",)
+    export_dataset = "bookings"
+    actions = ["export_csv", "export_xlsx"]
 
     @admin.display(description="⚠️ Warnung")
     def _saldo_warnung(self, obj):
@@ -192,21 +411,26 @@ class BookingAdmin(admin.ModelAdmin):
             return mark_safe(form.warning_html)
         return mark_safe('<div id="saldo-warning"></div>')
 
-    @admin.display(description="Abgewohnter Betrag")
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_cost()
+
+    @admin.display(description="Abgewohnter Betrag", ordering="cost")
     def total_cost_display(self, obj):
-        try:
-            return f"{obj.total_cost():.2f} €"
-        except Exception:
-            return "–"
+        return f"{obj.cost:.2f} €"
 
     class Media:
         js = ("lenders/js/check_balance.js",)
 
 @admin.register(SentConfirmation, site=custom_admin_site)
-class SentConfirmationAdmin(admin.ModelAdmin):
+class SentConfirmationAdmin(RankedSearchMixin, admin.ModelAdmin):
     list_display = ["sent_at", "lender", "linked_confirmation", "recipient", "language", "current_balance", "resend_button"]
     list_filter = ["language", "sent_at"]
     search_fields = ["lender__first_name", "lender__last_name", "recipient"]
+    ranked_search = [("lender", "lender_id"), ("sentconfirmation", "pk")]
+    # payment/booking für __str__ (Links der Zeilen, Löschbestätigung)
+    list_select_related = ("lender__ledger", "payment", "booking")
+    autocomplete_fields = ("lender",)
+    raw_id_fields = ("payment", "booking")
 
     def get_urls(self):
         urls = super().get_urls()
@@ -217,12 +441,12 @@ class SentConfirmationAdmin(admin.ModelAdmin):
 
     @admin.display(description="Bestätigung")
     def linked_confirmation(self, obj):
-        if obj.payment:
-            url = reverse("admin:lenders_payment_change", args=[obj.payment.pk])
-            return format_html("💰 <a href='{}'>Zahlung #{}</a>", url, obj.payment.pk)
-        if obj.booking:
-            url = reverse("admin:lenders_booking_change", args=[obj.booking.pk])
-            return format_html("📅 <a href='{}'>Buchung #{}</a>", url, obj.booking.pk)
+        if obj.payment_id:
+            url = reverse("admin:lenders_payment_change", args=[obj.payment_id])
+            return format_html("💰 <a href='{}'>Zahlung #{}</a>", url, obj.payment_id)
+        if obj.booking_id:
+            url = reverse("admin:lenders_booking_change", args=[obj.booking_id])
+            return format_html("📅 <a href='{}'>Buchung #{}</a>", url, obj.booking_id)
         return "—"
 
     @admin.display(description="Saldo")
@@ -240,19 +464,33 @@ class SentConfirmationAdmin(admin.ModelAdmin):
     def resend_confirmation(self, request, pk):
         obj = SentConfirmation.objects.get(pk=pk)
         if obj.payment:
-            send_payment_confirmation(sender=None, instance=obj.payment, created=False)
-            msg = _("Zahlungsbestätigung wurde erneut gesendet.")
+            outbox.enqueue_payment_confirmation(obj.payment)
+            msg = _("Zahlungsbestätigung wurde zum erneuten Versand eingereiht.")
         elif obj.booking:
-            send_booking_confirmation(sender=None, instance=obj.booking, created=False)
-            msg = _("Buchungsbestätigung wurde erneut gesendet.")
+            outbox.enqueue_booking_confirmation(obj.booking)
+            msg = _("Buchungsbestätigung wurde zum erneuten Versand eingereiht.")
         else:
             msg = _("Keine zugehörige Buchung oder Zahlung gefunden.")
         self.message_user(request, msg, messages.SUCCESS)
         return HttpResponseRedirect(request.META.get("HTTP_REFERER", "/admin/"))
 
-# Auth
-custom_admin_site.register(User)
-custom_admin_site.register(Group)
+@admin.register(EmailOutbox, site=custom_admin_site)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "recipient", "subject", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status", "language")
+    search_fields = ("recipient", "subject", "lender__first_name", "lender__last_name")
+    readonly_fields = ("lender", "payment", "booking", "attempts", "last_error", "sent_at", "created_at")
+    list_select_related = ("lender",)
+    actions = ["retry_now"]
+
+    @admin.action(description="🔁 Sofort erneut versuchen")
+    def retry_now(self, request, queryset):
+        count = outbox.retry(queryset)
+        self.message_user(request, f"{count} E-Mail(s) werden beim nächsten Lauf erneut versendet.", messages.SUCCESS)
+
+# Auth (mit den Django-Admins: Passwort-Formulare, Berechtigungen inkl. content_type geladen)
+custom_admin_site.register(User, UserAdmin)
+custom_admin_site.register(Group, GroupAdmin)
 
 # Kalender-Link
 admin.site.site_url = "/lenders/calendar/"
@@ -0,0 +1,154 @@
+# lenders/analytics.py
+"""
+Auslastung und Umsatz pro Apartment, Monat und Jahr.
+
+Jede Buchung wird auf Tages-Arrays ihres Apartments ausgerollt: ``nights``
+(1 = Nacht gebucht) und ``cents`` (Umsatz dieser Nacht nach Rabatt, in Cent).
+Saisonabschnitte werden dabei als ganze Slices geschrieben, nicht Tag für
+Tag. Monats- und Jahreswerte sind danach nur noch Summen über Index-Bereiche
+(``numpy.add.reduceat``). Ohne NumPy übernehmen ``array``-Arrays aus der
+Standardbibliothek dieselbe Rolle – langsamer, aber gleiche Ergebnisse.
+
+Der Umsatz einer Nacht ist ihr rabattierter Preis aus ``pricing``; die Summe
+aller Nächte einer Buchung entspricht also ``Booking.total_cost()``.
+Pauschalpreise der Villa werden gleichmäßig auf die Nächte verteilt.
+"""
+import calendar
+from array import array
+from datetime import date
+from decimal import Decimal
+
+from .models import VILLA_NAME, Booking
+from .pricing import discounted, get_price_book
+
+try:
+    import numpy
+except ImportError:  # optional, siehe Modul-Docstring
+    numpy = None
+
+
+# -----------------------
+# 📐 Tages-Arrays
+# -----------------------
+
+def _zeros(length):
+    if numpy is not None:
+        return numpy.zeros(length, dtype=numpy.int64)
+    return array("q", bytes(8 * length))
+
+
+def _fill(values, first, last, value):
+    """``values[first:last] = value`` – ein Slice, kein Python-Loop pro Tag."""
+    if numpy is not None:
+        values[first:last] = value
+    else:
+        values[first:last] = array("q", [value]) * (last - first)
+
+
+def _sums(values, bounds):
+    """Summen der Abschnitte [bounds[i], bounds[i + 1])."""
+    if numpy is not None:
+        return [int(total) for total in numpy.add.reduceat(values, bounds[:-1])]
+    return [sum(values[a:b]) for a, b in zip(bounds, bounds[1:])]
+
+
+def _cents(amount):
+    return int(amount * 100)
+
+
+class DayArrays:
+    """Gebuchte Nächte und Umsatz (Cent) eines Apartments, ein Eintrag pro Tag ab ``origin``."""
+
+    def __init__(self, origin, length):
+        self.origin = origin
+        self.length = length
+        self.nights = _zeros(length)
+        self.cents = _zeros(length)
+
+    def add_booking(self, start, end, segments):
+        """``segments``: (nächte, cent_pro_nacht) ab ``start``, wie ``RateIndex.price_segments``."""
+        cursor = (start - self.origin).days
+        for count, cents in segments:
+            first, last = max(cursor, 0), min(cursor + count, self.length)
+            if first < last:
+                _fill(self.nights, first, last, 1)
+                _fill(self.cents, first, last, cents)
+            cursor += count
+
+    def totals(self, bounds):
+        """(nächte, cent) je Abschnitt zwischen den Tagesindizes ``bounds``."""
+        return list(zip(_sums(self.nights, bounds), _sums(self.cents, bounds)))
+
+
+def _flat_rate_segments(total, nights):
+    """Pauschalpreis auf die Nächte verteilen; Rest-Cents auf die ersten Nächte."""
+    cents = _cents(total)
+    share, rest = divmod(cents, nights)
+    segments = []
+    if rest:
+        segments.append((rest, share + 1))
+    segments.append((nights - rest, share))
+    return segments
+
+
+# -----------------------
+# 📊 Auswertung
+# -----------------------
+
+def _stats(nights, cents, days):
+    revenue = Decimal(cents) / 100
+    return {
+        "days": days,
+        "nights": nights,
+        "occupancy": round(Decimal(nights * 100) / days, 1) if days else Decimal("0.0"),
+        "revenue": revenue.quantize(Decimal("0.01")),
+        "avg_price": (revenue / nights).quantize(Decimal("0.01")) if nights else None,
+    }
+
+
+def occupancy_stats(first_year, last_year):
+    """Auslastung und Umsatz aller Apartments für die Jahre ``first_year`` bis ``last_year``.
+
+    Returns:
+        Liste pro Apartment (nach Name): ``{"apartment", "months": [(jahr, monat, werte)],
+        "years": [(jahr, werte)]}``; ``werte`` siehe ``_stats``.
+    """
+    origin, stop = date(first_year, 1, 1), date(last_year + 1, 1, 1)
+    length = (stop - origin).days
+    book = get_price_book()
+
+    arrays = {pk: DayArrays(origin, length) for pk in book.apartments}
+    rows = (
+        Booking.objects.filter(start_date__lt=stop, end_date__gt=origin)
+        .values_list("apartment_id", "start_date", "end_date", "custom_total_price", "lender__discount_percent")
+    )
+    for apartment_id, start, end, custom_total_price, discount in rows:
+        apartment = book.apartments.get(apartment_id)
+        nights = (end - start).days
+        if apartment is None or nights <= 0:
+            continue
+        if apartment.name == VILLA_NAME and custom_total_price:
+            segments = _flat_rate_segments(custom_total_price, nights)
+        else:
+            segments = [
+                (count, _cents(discounted(price, discount)))
+                for count, price in book.index(apartment).price_segments(start, end)
+            ]
+        arrays[apartment_id].add_booking(start, end, segments)
+
+    months = [(year, month) for year in range(first_year, last_year + 1) for month in range(1, 13)]
+    month_bounds = [(date(year, month, 1) - origin).days for year, month in months] + [length]
+    result = []
+    for apartment in sorted(book.apartments.values(), key=lambda a: a.name):
+        per_month = arrays[apartment.pk].totals(month_bounds)
+        month_rows = [
+            (year, month, _stats(nights, cents, calendar.monthrange(year, month)[1]))
+            for (year, month), (nights, cents) in zip(months, per_month)
+        ]
+        year_rows = []
+        for i, year in enumerate(range(first_year, last_year + 1)):
+            chunk = per_month[i * 12:(i + 1) * 12]
+            days = 366 if calendar.isleap(year) else 365
+            year_rows.append((year, _stats(sum(n for n, _ in chunk), sum(c for _, c in chunk), days)))
+        result.append({"apartment": apartment, "months": month_rows, "years": year_rows})
+    return result
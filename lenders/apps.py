@@ -7,3 +7,4 @@ class LendersConfig(AppConfig):
     verbose_name = _("Menue - Auswahlbereich")  # 👈 Das wird im Admin angezeigt
     def ready(self):
         import lenders.signals  # wichtig!
+        import lenders.search  # System-Check der Such-Trigger
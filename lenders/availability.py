@@ -0,0 +1,189 @@
+# lenders/availability.py
+"""
+Verfügbarkeitssuche: freie Apartments im Zeitraum, nächste freie Zeitfenster.
+
+Alle Buchungen des Suchhorizonts werden mit einer Abfrage geladen und je
+Apartment als sortierte, verschmolzene Belegt-Intervalle [anreise, abreise)
+abgelegt. Ob ein Zeitraum frei ist, entscheidet eine binäre Suche; die freien
+Fenster sind einfach die Lücken zwischen den Intervallen. Der Aufwand hängt
+damit von der Zahl der Buchungen ab, nicht von der Länge des Horizonts.
+
+Die Villa-Regel aus ``Booking.clean`` gilt auch hier: „La Villa Complete“ ist
+nur frei, wenn im selben Zeitraum mindestens ein anderes Apartment frei ist.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+
+from .cache import get_versions
+from .models import Apartment, Booking, villa_rule_others
+
+# Ein freies Fenster: frühestmögliche Anreise, Abreise nach ``nights`` Nächten
+# und das Ende der Lücke (bis dahin könnte der Aufenthalt verlängert werden).
+FreeWindow = namedtuple("FreeWindow", "start end free_until")
+
+
+def horizon():
+    return timedelta(days=getattr(settings, "LENDERS_AVAILABILITY_HORIZON_DAYS", 730))
+
+
+class AvailabilityIndex:
+    def __init__(self, start, end, apartments, bookings=()):
+        """``apartments``: {id: Apartment}; ``bookings``: (apartment_id, anreise, abreise), nach Anreise sortiert.
+
+        Gesucht wird nur in aktiven Apartments (``self.apartments``); für die
+        Villa-Regel zählen wie in ``Booking.clean`` alle, daher die Buchungen aller.
+        """
+        self.start = start
+        self.end = end
+        self.apartments = {pk: apartment for pk, apartment in apartments.items() if apartment.is_active}
+        self.villa_rule_others = villa_rule_others(apartments.values())
+        busy = defaultdict(list)
+        for apartment_id, b_start, b_end in bookings:
+            intervals = busy[apartment_id]
+            if intervals and b_start <= intervals[-1][1]:
+                # überlappend oder direkt anschließend: verschmelzen
+                intervals[-1][1] = max(intervals[-1][1], b_end)
+            else:
+                intervals.append([b_start, b_end])
+        self.starts = {pk: [i[0] for i in intervals] for pk, intervals in busy.items()}
+        self.ends = {pk: [i[1] for i in intervals] for pk, intervals in busy.items()}
+
+    @classmethod
+    def build(cls, start, end):
+        """Apartments und alle Buchungen, die [start, end) berühren – zwei Abfragen."""
+        apartments = {apartment.pk: apartment for apartment in Apartment.objects.all()}
+        rows = (
+            Booking.objects.filter(start_date__lt=end, end_date__gt=start)
+            .order_by("apartment_id", "start_date")
+            .values_list("apartment_id", "start_date", "end_date")
+        )
+        return cls(start, end, apartments, rows)
+
+    def covers(self, start, end):
+        return self.start <= start and end <= self.end
+
+    def villa_ids(self):
+        return [pk for pk, apartment in self.apartments.items() if apartment.is_villa]
+
+    # -----------------------
+    # 🔍 Ein Apartment
+    # -----------------------
+
+    def is_free(self, apartment_id, start, end):
+        """True, wenn keine Nacht von [start, end) belegt ist."""
+        starts = self.starts.get(apartment_id)
+        if not starts:
+            return True
+        # letztes Intervall, das vor ``end`` beginnt – endet es nach ``start``, überlappt es
+        i = bisect_left(starts, end) - 1
+        return i < 0 or self.ends[apartment_id][i] <= start
+
+    def gaps(self, apartment_id, start, end):
+        """Freie Lücken [von, bis) des Apartments innerhalb von [start, end), aufsteigend."""
+        starts = self.starts.get(apartment_id, [])
+        ends = self.ends.get(apartment_id, [])
+        # erstes Intervall, das nach ``start`` endet
+        i = bisect_right(ends, start)
+        cursor = start
+        while cursor < end:
+            if i < len(starts) and starts[i] < end:
+                if starts[i] > cursor:
+                    yield cursor, starts[i]
+                cursor = max(cursor, ends[i])
+                i += 1
+            else:
+                yield cursor, end
+                return
+
+    # -----------------------
+    # 🏠 Mehrere Apartments, Villa-Regel
+    # -----------------------
+
+    def free_apartments(self, start, end):
+        """IDs der aktiven Apartments, die in [start, end) komplett frei sind (Villa-Regel beachtet)."""
+        free = [pk for pk in self.apartments if self.is_free(pk, start, end)]
+        if not any(self.is_free(pk, start, end) for pk in self.villa_rule_others):
+            villas = set(self.villa_ids())
+            free = [pk for pk in free if pk not in villas]
+        return free
+
+    def _allowed_stretches(self, apartment_id, start, end):
+        """Zeitspannen, innerhalb derer ein Aufenthalt liegen muss, um erlaubt zu sein."""
+        own = list(self.gaps(apartment_id, start, end))
+        if not self.apartments[apartment_id].is_villa:
+            return own
+        # Villa: Aufenthalt muss in eine eigene Lücke UND komplett in die Lücke
+        # eines anderen Apartments passen – also in eine der Schnittmengen.
+        stretches = []
+        for other in self.villa_rule_others:
+            theirs = list(self.gaps(other, start, end))
+            i = j = 0
+            while i < len(own) and j < len(theirs):
+                lo, hi = max(own[i][0], theirs[j][0]), min(own[i][1], theirs[j][1])
+                if lo < hi:
+                    stretches.append((lo, hi))
+                if own[i][1] < theirs[j][1]:
+                    i += 1
+                else:
+                    j += 1
+        stretches.sort()
+        return stretches
+
+    def next_free_windows(self, apartment_id, nights, after, limit=5):
+        """Die nächsten ``limit`` freien Fenster mit ``nights`` Nächten ab ``after``.
+
+        Pro zusammenhängender freier Zeitspanne wird ein Fenster geliefert
+        (frühestmögliche Anreise); ``free_until`` zeigt, wie lange die Spanne reicht.
+        """
+        if apartment_id not in self.apartments or nights <= 0 or limit <= 0:
+            return []
+        length = timedelta(days=nights)
+        windows = []
+        cursor = after
+        for lo, hi in self._allowed_stretches(apartment_id, after, self.end):
+            begin = max(lo, cursor)
+            if hi - begin < length:
+                continue
+            windows.append(FreeWindow(begin, begin + length, hi))
+            if len(windows) >= limit:
+                break
+            cursor = hi
+        return windows
+
+
+# -----------------------
+# 🗂 Prozessweiter Cache, über die Versionszähler auch prozessübergreifend aktuell
+# -----------------------
+
+_lock = threading.Lock()
+_cached = None
+
+
+def get_availability(start, end):
+    """Index, der mindestens [start, end) abdeckt; neu geladen nach Buchungs- oder Apartment-Änderungen."""
+    global _cached
+    version = get_versions("booking", "apartment")
+    with _lock:
+        cached = _cached
+    if cached is not None and cached[0] == version and cached[1].covers(start, end):
+        return cached[1]
+    index = AvailabilityIndex.build(start, max(end, start + horizon()))
+    with _lock:
+        _cached = (version, index)
+    return index
+
+
+def free_apartments(start, end):
+    """Aktive Apartments, die in [start, end) frei sind, nach Name sortiert."""
+    index = get_availability(start, end)
+    return sorted((index.apartments[pk] for pk in index.free_apartments(start, end)), key=lambda a: a.name)
+
+
+def next_free_windows(apartment_id, nights, after, limit=5):
+    """Nächste freie Fenster eines Apartments innerhalb des Suchhorizonts ab ``after``."""
+    index = get_availability(after, after + horizon())
+    return index.next_free_windows(apartment_id, nights, after, limit)
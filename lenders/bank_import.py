@@ -0,0 +1,459 @@
+# lenders/bank_import.py
+"""
+Import von Zahlungseingängen aus Kontoauszügen (CSV oder CAMT.053-XML).
+
+Ablauf: ``parse()`` liest die Datei streamend (``csv``-Reader bzw.
+``iterparse``), ``plan()`` ordnet jede Gutschrift über den Zuordnungs-Index
+(matching.py) einem Lender zu und prüft auf Doppelimporte, ``execute()`` legt alle Zahlungen in einer Transaktion per
+``bulk_create`` an. Da dabei keine Signale laufen, werden Ledger,
+Versionszähler und Bestätigungs-E-Mails anschließend gesammelt nachgezogen.
+Mit ``dry_run`` bleibt es bei der Vorschau.
+"""
+import csv
+import hashlib
+import io
+import xml.etree.ElementTree as ET
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import ledger, matching, outbox
+from .cache import bump_version_on_commit
+from .exchange_rates import eur_rate
+from .models import Lender, Loan, Payment
+
+import logging
+logger = logging.getLogger(__name__)
+
+BankTransaction = namedtuple(
+    "BankTransaction", "line date amount currency exchange_rate name reference purpose"
+)
+
+NOTIFY_CHOICES = [
+    ("digest", "Eine Sammel-E-Mail pro Lender"),
+    ("each", "Eine Bestätigung pro Zahlung"),
+    ("none", "Keine E-Mails"),
+]
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+# -----------------------
+# 📄 Einlesen
+# -----------------------
+
+# Übliche Spaltennamen deutscher und englischer Bank-Exporte
+CSV_COLUMNS = {
+    "date": ("buchungstag", "buchungsdatum", "valuta", "wertstellung", "datum", "date", "booking date"),
+    "amount": ("betrag", "umsatz", "amount"),
+    "currency": ("währung", "waehrung", "currency"),
+    "exchange_rate": ("wechselkurs", "kurs", "exchange rate"),
+    "name": ("name zahlungsbeteiligter", "auftraggeber", "zahlungspflichtiger", "name", "payer", "beguenstigter/zahlungspflichtiger"),
+    "reference": ("bankreferenz", "referenz", "transaktions-id", "reference", "end-to-end-referenz"),
+    "purpose": ("verwendungszweck", "buchungstext", "purpose", "description"),
+}
+
+
+def parse_amount(value):
+    """'1.234,56' / '1,234.56' / '-50' → Decimal."""
+    value = (value or "").strip().replace(" ", "").replace("€", "")
+    if "," in value and "." in value:
+        # Das letzte Trennzeichen ist das Dezimaltrennzeichen
+        if value.rfind(",") > value.rfind("."):
+            value = value.replace(".", "").replace(",", ".")
+        else:
+            value = value.replace(",", "")
+    elif "," in value:
+        value = value.replace(",", ".")
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ImportFormatError(f"Ungültiger Betrag: {value!r}")
+
+
+def parse_date(value):
+    value = (value or "").strip()
+    for fmt in ("%d.%m.%Y", "%Y-%m-%d", "%d.%m.%y", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ImportFormatError(f"Ungültiges Datum: {value!r}")
+
+
+class SemicolonDialect(csv.excel):
+    delimiter = ";"
+
+
+# Bank-Exporte kommen als UTF-8 oder – aus älteren Online-Bankings und Excel – als Windows-1252
+CSV_ENCODINGS = ("utf-8-sig", "cp1252")
+
+
+def decode_lines(fh):
+    """Zeilen einer Byte-Datei als Text, ohne die Datei komplett einzulesen.
+
+    Gelesen wird als UTF-8; ab der ersten Zeile, die kein gültiges UTF-8 ist,
+    als Windows-1252 (reine ASCII-Zeilen davor sind in beiden gleich).
+    """
+    encodings = iter(CSV_ENCODINGS)
+    encoding = next(encodings)
+    for line, raw in enumerate(fh, start=1):
+        while True:
+            try:
+                yield raw.decode(encoding)
+                break
+            except UnicodeDecodeError:
+                encoding = next(encodings, None)
+                if encoding is None:
+                    raise ImportFormatError(
+                        f"Zeile {line}: Unbekannte Zeichenkodierung – bitte als UTF-8 oder Windows-1252 exportieren"
+                    )
+
+
+def parse_csv(fh):
+    """Liest Gutschriften aus einer CSV-Datei (Bytes oder Text), Zeile für Zeile."""
+    lines = iter(fh) if isinstance(fh, io.TextIOBase) else decode_lines(fh)
+    header_line = next(lines, "")
+    try:
+        dialect = csv.Sniffer().sniff(header_line, delimiters=";,\t")
+    except csv.Error:
+        dialect = SemicolonDialect
+    header = [column.strip().lower() for column in next(csv.reader([header_line], dialect))]
+    positions = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in header:
+                positions[field] = header.index(alias)
+                break
+    missing = {"date", "amount"} - positions.keys()
+    if missing:
+        raise ImportFormatError(f"Spalten fehlen in der CSV-Datei: {', '.join(sorted(missing))}")
+
+    def cell(row, field, default=""):
+        index = positions.get(field)
+        return row[index].strip() if index is not None and index < len(row) else default
+
+    for line, row in enumerate(csv.reader(lines, dialect), start=2):
+        if not any(value.strip() for value in row):
+            continue
+        try:
+            amount = parse_amount(cell(row, "amount"))
+            if amount <= 0:
+                continue  # Lastschriften/Abbuchungen interessieren nicht
+            rate = cell(row, "exchange_rate")
+            yield BankTransaction(
+                line=line,
+                date=parse_date(cell(row, "date")),
+                amount=amount,
+                currency=(cell(row, "currency") or "EUR").upper(),
+                exchange_rate=parse_amount(rate) if rate else None,
+                name=cell(row, "name"),
+                reference=cell(row, "reference"),
+                purpose=cell(row, "purpose"),
+            )
+        except ImportFormatError as e:
+            raise ImportFormatError(f"Zeile {line}: {e}")
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _find(element, path):
+    """Namespace-unabhängige Suche: ``_find(ntry, "NtryDtls/TxDtls/RmtInf/Ustrd")``."""
+    for part in path.split("/"):
+        if element is None:
+            return None
+        element = next((child for child in element if _local(child.tag) == part), None)
+    return element
+
+
+def _text(element, *paths):
+    for path in paths:
+        found = _find(element, path)
+        if found is not None and (found.text or "").strip():
+            return found.text.strip()
+    return ""
+
+
+def _reference(entry, tx):
+    for value in (
+        _text(tx, "Refs/AcctSvcrRef") if tx is not None else "",
+        _text(entry, "AcctSvcrRef"),
+        _text(tx, "Refs/EndToEndId") if tx is not None else "",
+    ):
+        if value and value != "NOTPROVIDED":
+            return value
+    return ""
+
+
+def _camt_amount(element, path):
+    """Betrag aus ``<Amt>`` (größer 0); fehlt er oder ist er ungültig: ImportFormatError."""
+    if element is None:
+        raise ImportFormatError(f"{path} fehlt")
+    value = (element.text or "").strip()
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise ImportFormatError(f"Ungültiger Betrag in {path}: {value!r}")
+    if not amount.is_finite() or amount <= 0:
+        raise ImportFormatError(f"Ungültiger Betrag in {path}: {value!r}")
+    return amount
+
+
+def _camt_transaction(element, count):
+    amount_element = _find(element, "Amt")
+    amount = _camt_amount(amount_element, "Amt")
+    currency = amount_element.get("Ccy", "EUR")
+    rate = None
+    tx = _find(element, "NtryDtls/TxDtls")
+    instructed = _find(tx, "AmtDtls/InstdAmt/Amt") if tx is not None else None
+    if instructed is not None and instructed.get("Ccy", currency) != currency:
+        # Fremdwährung: Originalbetrag + Kurs (Gutschrift / Original) wie bei
+        # manuell erfassten USD-Zahlungen
+        original = _camt_amount(instructed, "InstdAmt")
+        rate = (amount / original).quantize(Decimal("0.0001"))
+        amount, currency = original, instructed.get("Ccy")
+    booked = _text(element, "BookgDt/Dt", "ValDt/Dt") or _text(element, "BookgDt/DtTm", "ValDt/DtTm")[:10]
+    if not booked:
+        raise ImportFormatError("Buchungsdatum fehlt (BookgDt/ValDt)")
+    return BankTransaction(
+        line=count,
+        date=parse_date(booked),
+        amount=amount,
+        currency=currency.upper(),
+        exchange_rate=rate,
+        name=_text(tx, "RltdPties/Dbtr/Nm", "RltdPties/Dbtr/Pty/Nm") if tx is not None else "",
+        reference=_reference(element, tx),
+        purpose=" ".join(
+            (node.text or "").strip() for node in (tx.iter() if tx is not None else ())
+            if _local(node.tag) == "Ustrd"
+        ),
+    )
+
+
+def parse_camt053(fh):
+    """Liest Gutschriften (``CdtDbtInd`` = CRDT) aus einem CAMT.053-Auszug per ``iterparse``."""
+    count = 0
+    try:
+        for _event, element in ET.iterparse(fh, events=("end",)):
+            if _local(element.tag) != "Ntry":
+                continue
+            count += 1
+            if _text(element, "CdtDbtInd") == "CRDT" and _text(element, "Sts", "Sts/Cd") in ("", "BOOK"):
+                try:
+                    yield _camt_transaction(element, count)
+                except ImportFormatError as e:
+                    raise ImportFormatError(f"Eintrag {count}: {e}")
+            element.clear()
+    except ET.ParseError as e:
+        raise ImportFormatError(f"Ungültiges CAMT-XML: {e}")
+
+
+def parse(fh, filename="", fmt=None):
+    """Wählt den Parser nach ``fmt`` (csv/camt) oder Dateiendung."""
+    fmt = fmt or ("camt" if filename.lower().endswith(".xml") else "csv")
+    if fmt == "camt":
+        return parse_camt053(fh)
+    if fmt == "csv":
+        return parse_csv(fh)
+    raise ImportFormatError(f"Unbekanntes Format: {fmt}")
+
+
+# -----------------------
+# 🔎 Zuordnung und Vorschau
+# -----------------------
+
+def transaction_reference(tx, seen):
+    """Bankreferenz; ohne Referenz ein Fingerabdruck aus Datum, Betrag, Name und Zweck."""
+    if tx.reference:
+        return tx.reference[:120]
+    raw = "|".join(str(value) for value in (
+        tx.date, tx.amount, tx.currency, tx.name, tx.purpose,
+    ))
+    seen[raw] += 1  # gleiche Buchungen in einer Datei bleiben unterscheidbar
+    return "sha1:" + hashlib.sha1(f"{raw}|{seen[raw]}".encode()).hexdigest()
+
+
+def plan(transactions, index=None):
+    """Prüft alle Gutschriften, ohne etwas zu speichern.
+
+    Zugeordnet wird nur, wenn der beste Vorschlag des Zuordnungs-Index sicher
+    genug ist und sich deutlich vom zweitbesten abhebt; sonst landet die Zeile
+    mit den Vorschlägen unter ``skipped``.
+
+    Returns:
+        dict mit ``payments`` (ungespeicherte ``Payment``-Objekte) und
+        ``skipped`` (Liste von (BankTransaction, Grund)).
+    """
+    index = index or matching.get_index()
+    min_confidence = getattr(settings, "LENDERS_MATCH_MIN_CONFIDENCE", 0.8)
+    min_margin = getattr(settings, "LENDERS_MATCH_MIN_MARGIN", 0.1)
+    seen = Counter()
+    matched, unsure, skipped = [], [], []
+    for tx in transactions:
+        if tx.currency not in ("EUR", "USD"):
+            skipped.append((tx, f"Währung {tx.currency} wird nicht unterstützt"))
+            continue
+        if tx.currency == "USD" and not tx.exchange_rate:
+            rate = eur_rate(tx.currency, tx.date)
+            if rate is None:
+                skipped.append((tx, "Wechselkurs fehlt (weder in der Datei noch in der Wechselkurstabelle)"))
+                continue
+            tx = tx._replace(exchange_rate=rate)
+        suggestions = index.suggest(tx.name, f"{tx.purpose} {tx.reference}", limit=3)
+        if not suggestions:
+            skipped.append((tx, "Kein Lender zugeordnet"))
+        elif suggestions[0].confidence < min_confidence or (
+            len(suggestions) > 1 and suggestions[0].confidence - suggestions[1].confidence < min_margin
+        ):
+            unsure.append((tx, suggestions))
+        else:
+            matched.append((tx, suggestions[0].lender_id))
+
+    lender_ids = {lender_id for _tx, lender_id in matched}
+    lender_ids |= {suggestion.lender_id for _tx, suggestions in unsure for suggestion in suggestions}
+    lenders = Lender.objects.only("first_name", "last_name", "email", "language").in_bulk(lender_ids)
+
+    for tx, suggestions in unsure:
+        names = ", ".join(
+            f"{lenders[suggestion.lender_id]} ({suggestion.confidence:.0%})"
+            for suggestion in suggestions if suggestion.lender_id in lenders
+        )
+        skipped.append((tx, f"Unsicher – Vorschläge: {names}"))
+
+    candidates = []
+    for tx, lender_id in matched:
+        if lender_id not in lenders:  # inzwischen gelöscht
+            skipped.append((tx, "Kein Lender zugeordnet"))
+            continue
+        payment = Payment(
+            lender=lenders[lender_id],
+            date=tx.date,
+            original_amount=tx.amount,
+            currency=tx.currency,
+            exchange_rate=tx.exchange_rate if tx.currency == "USD" else None,
+            is_fixed=False,
+            bank_reference=transaction_reference(tx, seen),
+        )
+        payment.amount_eur = payment.calculate_amount_eur()
+        candidates.append((tx, payment))
+
+    existing = set()
+    references = [payment.bank_reference for _transaction, payment in candidates]
+    for start in range(0, len(references), 500):
+        existing.update(Payment.objects.filter(
+            bank_reference__in=references[start:start + 500]
+        ).values_list("bank_reference", flat=True))
+
+    payments = []
+    for tx, payment in candidates:
+        if payment.bank_reference in existing:
+            skipped.append((tx, "Bereits importiert"))
+        else:
+            payments.append(payment)
+    return {"payments": payments, "skipped": skipped}
+
+
+# -----------------------
+# 💾 Speichern
+# -----------------------
+
+def flexible_loans(lender_ids):
+    """Flexibles Darlehen pro Lender – vorhandene einmal laden, fehlende gesammelt anlegen."""
+    loans = {}
+    for loan in Loan.objects.filter(lender_id__in=lender_ids, loan_type="flexible").order_by("-pk"):
+        loans[loan.lender_id] = loan  # bei mehreren gewinnt das älteste, wie get_or_create
+    missing = [Loan(lender_id=lender_id, loan_type="flexible") for lender_id in lender_ids if lender_id not in loans]
+    for loan in Loan.objects.bulk_create(missing, batch_size=500):
+        loans[loan.lender_id] = loan
+    return loans
+
+
+def execute(payments, notify="digest"):
+    """Speichert die geplanten Zahlungen und reiht die Bestätigungen ein."""
+    if not payments:
+        return {"created": 0, "emails": 0}
+    lender_ids = {payment.lender_id for payment in payments}
+    with transaction.atomic():
+        loans = flexible_loans(lender_ids)
+        for payment in payments:
+            payment.loan = loans[payment.lender_id]
+        payments = _insert_new(payments)
+        ledger.rebuild_ledgers(Lender.objects.filter(pk__in=lender_ids))
+        emails = _enqueue_confirmations(payments, notify)
+    bump_version_on_commit("payment")
+    logger.info(f"🏦 Kontoauszug importiert: {len(payments)} Zahlung(en), {emails} E-Mail(s) eingereiht")
+    return {"payments": payments, "created": len(payments), "emails": emails}
+
+
+def _insert_new(payments):
+    """Legt die Zahlungen an, deren Bankreferenz noch frei ist, und gibt sie zurück.
+
+    ``plan()`` filtert bereits importierte Referenzen, aber ein paralleler Import
+    derselben Datei kann dazwischenkommen. Dann schlägt der Unique-Constraint an:
+    die inzwischen vergebenen Referenzen werden aussortiert und der Rest erneut
+    angelegt. (``ignore_conflicts`` ginge ohne zweiten Versuch, liefert aber keine
+    IDs – die brauchen die Bestätigungen.)
+    """
+    while payments:
+        try:
+            with transaction.atomic():
+                return Payment.objects.bulk_create(payments, batch_size=500)
+        except IntegrityError:
+            taken = set(Payment.objects.filter(
+                bank_reference__in=[payment.bank_reference for payment in payments]
+            ).values_list("bank_reference", flat=True))
+            if not taken:
+                raise
+            logger.info(f"🏦 {len(taken)} Zahlung(en) wurden parallel schon importiert – übersprungen")
+            payments = [payment for payment in payments if payment.bank_reference not in taken]
+            for payment in payments:  # IDs aus zurückgerollten Batches verwerfen
+                payment.pk = None
+                payment._state.adding = True
+    return payments
+
+
+def _enqueue_confirmations(payments, notify):
+    if notify == "none":
+        return 0
+    balances = dict(
+        Lender.objects.filter(pk__in={payment.lender_id for payment in payments})
+        .values_list("pk", "ledger__balance")
+    )
+    messages = []
+    if notify == "each":
+        for payment in payments:
+            try:
+                messages.append(outbox.payment_confirmation(payment, balance=balances[payment.lender_id]))
+            except Exception as e:
+                logger.warning(f"❌ Zahlungs-E-Mail an {payment.lender.email} konnte nicht erstellt werden: {e}")
+    else:
+        by_lender = defaultdict(list)
+        for payment in payments:
+            by_lender[payment.lender_id].append(payment)
+        for lender_payments in by_lender.values():
+            lender = lender_payments[0].lender
+            try:
+                messages.append(outbox.payment_digest(lender, lender_payments, balances[lender.pk]))
+            except Exception as e:
+                logger.warning(f"❌ Sammel-E-Mail an {lender.email} konnte nicht erstellt werden: {e}")
+    return len(outbox.enqueue_many(messages))
+
+
+def import_file(fh, filename="", fmt=None, dry_run=False, notify="digest"):
+    """Kompletter Import einer Datei.
+
+    Returns:
+        dict mit ``payments``, ``skipped``, ``created`` und ``emails``.
+    """
+    result = plan(parse(fh, filename, fmt))
+    result.update(created=0, emails=0)
+    if not dry_run:
+        result.update(execute(result["payments"], notify=notify))
+    return result
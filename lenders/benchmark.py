@@ -0,0 +1,216 @@
+# lenders/benchmark.py
+"""
+Benchmark-Suite für die lenders-App.
+
+``run()`` erzeugt pro Größenordnung synthetische Daten (``demo_data``) und misst
+die typischen Pfade: Saldo, Buchungskosten, Reports, Kalender-Feed, Ajax-Prüfung
+und die Admin-Listen – jeweils Laufzeit (min/median/max) und Anzahl SQL-Abfragen.
+
+Achtung: ``run()`` leert die Datenbank vor jeder Größenordnung. Deshalb nur
+über ``manage.py benchmark`` (legt eine Wegwerf-Testdatenbank an) oder aus Tests
+heraus aufrufen.
+"""
+import platform
+import statistics
+import subprocess
+import time
+from datetime import timedelta
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .demo_data import generate
+from .models import VILLA_NAME, Apartment, Booking, Lender
+
+DEFAULT_SCALES = (50, 200, 1000)
+
+# Stichprobengrößen für die Einzelaufrufe
+BALANCE_SAMPLE = 100
+LIVE_BALANCE_SAMPLE = 20
+COST_SAMPLE = 200
+
+CHANGELISTS = ("lender", "payment", "booking", "apartment", "seasonalrate", "sentconfirmation", "emailoutbox")
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def apartments_for(lenders):
+    """Mehr Lender → mehr Apartments, damit die Buchungen realistisch verteilt bleiben."""
+    return min(max(6, lenders // 100), 60)
+
+
+# -----------------------
+# 🧪 Szenarien
+# -----------------------
+
+def _get(client, url, **params):
+    response = client.get(url, params)
+    if response.status_code != 200:
+        raise BenchmarkError(f"GET {url} lieferte {response.status_code}")
+    return response
+
+
+def _post(client, url, data):
+    response = client.post(url, data)
+    if response.status_code != 200:
+        raise BenchmarkError(f"POST {url} lieferte {response.status_code}")
+    return response
+
+
+def scenarios(client):
+    """Liste von (Name, Vorbereitung, Messfunktion). Die Vorbereitung läuft ungemessen."""
+    lenders = list(Lender.objects.order_by("pk")[:BALANCE_SAMPLE])
+    live_lenders = lenders[:LIVE_BALANCE_SAMPLE]
+    bookings = list(Booking.objects.select_related("apartment", "lender").order_by("pk")[:COST_SAMPLE])
+    middle = Booking.objects.order_by("start_date")[Booking.objects.count() // 2]
+    window = {
+        "start": middle.start_date.isoformat(),
+        "end": (middle.start_date + timedelta(days=42)).isoformat(),
+    }
+    villa = Apartment.objects.filter(name=VILLA_NAME).first()
+    regular = Apartment.objects.exclude(name=VILLA_NAME).first()
+
+    def warning_payload(apartment):
+        return {
+            "apartment": apartment.pk,
+            "lender": lenders[0].pk,
+            "start_date": middle.start_date.isoformat(),
+            "end_date": (middle.start_date + timedelta(days=7)).isoformat(),
+        }
+
+    def fresh_lenders():
+        # Ohne vorgeladenen Ledger, wie beim ersten Zugriff im Request
+        for lender in lenders:
+            lender._state.fields_cache.clear()
+
+    result = [
+        ("current_balance", fresh_lenders, lambda: [lender.current_balance() for lender in lenders]),
+        ("calculate_balance_live", None, lambda: [lender.calculate_balance() for lender in live_lenders]),
+        ("total_cost", None, lambda: [booking.total_cost() for booking in bookings]),
+        ("report_with_usage_cold", cache.clear, lambda: _get(client, reverse("lenders:report_payments_with_usage"))),
+        ("report_with_usage_warm", None, lambda: _get(client, reverse("lenders:report_payments_with_usage"))),
+        ("admin_report_with_usage_cold", cache.clear, lambda: _get(client, reverse("admin:payment_list_with_usage"))),
+        ("booking_events_cold", cache.clear, lambda: _get(client, reverse("lenders:booking_events"), **window)),
+        ("booking_events_warm", None, lambda: _get(client, reverse("lenders:booking_events"), **window)),
+        ("check_booking_warnings", None,
+         lambda: _post(client, reverse("lenders:check_booking_warnings"), warning_payload(regular))),
+    ]
+    if villa is not None:
+        result.append((
+            "check_booking_warnings_villa", None,
+            lambda: _post(client, reverse("lenders:check_booking_warnings"), warning_payload(villa)),
+        ))
+    for model_name in CHANGELISTS:
+        url = reverse(f"admin:lenders_{model_name}_changelist")
+        result.append((f"changelist_{model_name}", None, lambda url=url: _get(client, url)))
+    return result
+
+
+def measure(setup, func, repeat):
+    """Führt ``func`` ``repeat``-mal aus; SQL-Abfragen werden beim ersten Lauf gezählt."""
+    timings = []
+    queries = None
+    for i in range(repeat):
+        if setup:
+            setup()
+        if i == 0:
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - started)
+            queries = len(ctx.captured_queries)
+        else:
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+    return {
+        "min_ms": round(min(timings) * 1000, 2),
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "max_ms": round(max(timings) * 1000, 2),
+        "queries": queries,
+    }
+
+
+# -----------------------
+# ▶️ Ablauf
+# -----------------------
+
+def reset_database():
+    call_command("flush", interactive=False, verbosity=0)
+    cache.clear()
+
+
+def run_scale(lenders, repeat=5, seed=1, log=None):
+    reset_database()
+    started = time.perf_counter()
+    counts = generate(lenders=lenders, apartments=apartments_for(lenders), seed=seed)
+    generate_seconds = time.perf_counter() - started
+
+    user = User.objects.create_superuser("benchmark", "benchmark@example.org", "benchmark")
+    client = Client()
+    client.force_login(user)
+
+    results = {}
+    for name, setup, func in scenarios(client):
+        results[name] = measure(setup, func, repeat)
+        if log:
+            log(f"  {name:<32} median {results[name]['median_ms']:>9.2f} ms  SQL {results[name]['queries']:>5}")
+    return {
+        "lenders": lenders,
+        "counts": counts,
+        "generate_seconds": round(generate_seconds, 2),
+        "results": results,
+    }
+
+
+def run(scales=DEFAULT_SCALES, repeat=5, seed=1, log=None):
+    """Misst alle Szenarien für jede Größenordnung und liefert ein JSON-fähiges dict."""
+    report = {"meta": metadata(repeat, seed), "scales": []}
+    for lenders in scales:
+        if log:
+            log(f"📏 {lenders} Lender")
+        report["scales"].append(run_scale(lenders, repeat=repeat, seed=seed, log=log))
+    return report
+
+
+def metadata(repeat, seed):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "timestamp": timezone.now().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "seed": seed,
+    }
+
+
+def compare(previous, current):
+    """Vergleicht die Mediane zweier Läufe: Liste von (lenders, szenario, vorher, nachher, faktor)."""
+    before = {
+        (scale["lenders"], name): values["median_ms"]
+        for scale in previous["scales"] for name, values in scale["results"].items()
+    }
+    rows = []
+    for scale in current["scales"]:
+        for name, values in scale["results"].items():
+            old = before.get((scale["lenders"], name))
+            if old:
+                rows.append((scale["lenders"], name, old, values["median_ms"], values["median_ms"] / old))
+    return rows
@@ -0,0 +1,153 @@
+# lenders/cache.py
+"""
+Versionszähler pro Model und versionierte Fragmente im Django-Cache.
+
+Jede Änderung an einem beobachteten Model erhöht dessen Version (siehe
+signals.py). Daraus lassen sich ETags und Cache-Schlüssel ableiten, ohne die
+Daten selbst anzufassen: ein ``CachedFragment`` speichert sein Ergebnis unter
+den aktuellen Versionen seiner Models – nach einer Änderung wird der Schlüssel
+einfach nicht mehr getroffen.
+
+Funktioniert mit jedem Cache-Backend (LocMem, FileBased, …); damit mehrere
+Worker-Prozesse dieselben Versionen sehen, muss das Backend geteilt sein
+(z. B. FileBasedCache, siehe ``CACHE_DIR`` in den Settings).
+"""
+import time
+from datetime import datetime, timezone
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = "lenders:version:{}"
+MODIFIED_KEY = "lenders:modified:{}"
+FRAGMENT_KEY = "lenders:fragment:{}:{}:{}"
+STATS_KEY = "lenders:stats:{}:{}"
+
+
+def _initial_version():
+    # Startwert in Millisekunden: geht der Zähler verloren (Cache geleert),
+    # springt er nach vorn statt alte Versionen – und damit alte ETags – zu wiederholen.
+    return int(time.time() * 1000)
+
+
+def get_version(name):
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    key = VERSION_KEY.format(name)
+    try:
+        version = cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    cache.set(MODIFIED_KEY.format(name), time.time(), timeout=None)
+    return version
+
+
+def bump_version_on_commit(name):
+    """``bump_version``, sobald die laufende Transaktion committet ist (ohne Transaktion sofort).
+
+    Vorher gezählt, könnte ein anderer Worker die neue Version schon sehen, aber
+    noch die alten Zeilen lesen – und veraltete Daten unter der neuen Version cachen.
+    """
+    transaction.on_commit(partial(bump_version, name))
+
+
+def get_versions(*names):
+    """Kombinierte Version mehrerer Models, z. B. für ETags: ``"12-7-3"``."""
+    return "-".join(str(get_version(name)) for name in names)
+
+
+def last_modified(*names):
+    """Zeitpunkt der letzten Änderung an einem der Models (UTC)."""
+    stamps = []
+    for name in names:
+        key = MODIFIED_KEY.format(name)
+        stamp = cache.get(key)
+        if stamp is None:
+            # Unbekannt (Cache neu): konservativ „jetzt“ annehmen.
+            stamp = time.time()
+            cache.add(key, stamp, timeout=None)
+        stamps.append(stamp)
+    return datetime.fromtimestamp(max(stamps), tz=timezone.utc)
+
+
+def _count(name, kind):
+    key = STATS_KEY.format(name, kind)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+class CachedFragment:
+    """Ein gecachtes Ergebnis (HTML-Fragment, JSON …), abhängig von Model-Versionen.
+
+    >>> USAGE = CachedFragment("payment_usage", depends_on=("lender", "payment"))
+    >>> html = USAGE.get_or_build(lambda: render_to_string(...))
+    """
+    registry = {}
+
+    def __init__(self, name, depends_on, timeout=None):
+        self.name = name
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        CachedFragment.registry[name] = self
+
+    def key(self, *parts):
+        suffix = ":".join(str(part) for part in parts)
+        return FRAGMENT_KEY.format(self.name, get_versions(*self.depends_on), suffix)
+
+    def get_or_build(self, builder, *parts):
+        """Liefert den Cache-Inhalt oder baut ihn mit ``builder()`` neu auf."""
+        key = self.key(*parts)
+        value = cache.get(key)
+        if value is not None:
+            _count(self.name, "hits")
+            return value
+        _count(self.name, "misses")
+        value = builder()
+        timeout = self.timeout or getattr(settings, "LENDERS_CACHE_TIMEOUT", 60 * 60 * 24)
+        cache.set(key, value, timeout=timeout)
+        return value
+
+    def stats(self):
+        hits = cache.get(STATS_KEY.format(self.name, "hits"), 0)
+        misses = cache.get(STATS_KEY.format(self.name, "misses"), 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else None,
+        }
+
+    def reset_stats(self):
+        cache.delete_many([STATS_KEY.format(self.name, "hits"), STATS_KEY.format(self.name, "misses")])
+
+
+def cache_stats():
+    """Treffer/Fehlschläge aller registrierten Fragmente, z. B. zum Tuning der Timeouts."""
+    return {name: fragment.stats() for name, fragment in sorted(CachedFragment.registry.items())}
+
+
+# -----------------------
+# 📦 Gecachte Fragmente (Abhängigkeiten = Models, deren Änderung sie ungültig macht)
+# -----------------------
+
+CALENDAR_EVENTS = CachedFragment("calendar_events", ("booking", "apartment", "lender"))
+REPORT_PAYMENTS_RAW = CachedFragment("report_payments_raw", ("payment", "lender"))
+REPORT_PAYMENT_USAGE = CachedFragment(
+    "report_payment_usage", ("lender", "payment", "booking", "apartment", "seasonalrate")
+)
+REPORT_APARTMENT_PRICES = CachedFragment("report_apartment_prices", ("apartment", "seasonalrate"))
+REPORT_OCCUPANCY = CachedFragment("report_occupancy", ("booking", "apartment", "seasonalrate", "lender"))
+EXCHANGE_RATES = CachedFragment("exchange_rates", ("exchangerate",))
@@ -0,0 +1,176 @@
+# lenders/demo_data.py
+"""
+Synthetische, aber realistische Testdaten für Entwicklung und Benchmarks.
+
+Alles wird per ``bulk_create`` angelegt – Signale (E-Mails, Ledger-Deltas)
+laufen dabei nicht. Ledger, Versionszähler und Belegungsindex werden am Ende
+einmal gesammelt nachgezogen.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from . import ledger, occupancy
+from .cache import bump_version_on_commit
+from .models import (
+    VILLA_NAME, Apartment, APARTMENT_COLORS, Booking, Lender, Loan, Payment, SeasonalRate,
+)
+
+FIRST_NAMES = [
+    "Anna", "Ben", "Clara", "David", "Eva", "Felix", "Greta", "Hannes", "Ida", "Jonas",
+    "Karla", "Lukas", "Marie", "Noah", "Olivia", "Paul", "Ruth", "Simon", "Tina", "Ulrich",
+]
+LAST_NAMES = [
+    "Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker",
+    "Hoffmann", "Koch", "Richter", "Klein", "Wolf", "Neumann", "Smith", "Johnson",
+]
+CITIES = [("Berlin", "10115", "DE"), ("Hamburg", "20095", "DE"), ("München", "80331", "DE"),
+          ("Wien", "1010", "AT"), ("Zürich", "8001", "CH"), ("New York", "10001", "US")]
+APARTMENT_NAMES = ["Casa Sol", "Casa Mar", "Casa Luna", "Casa Verde", "Casa Azul", "Casa Roja",
+                   "Casa Brisa", "Casa Olivo", "Casa Faro", "Casa Pino"]
+
+# Saisons pro Jahr: (Start, Ende, Aufschlag %) – bewusst überschneidungsfrei.
+SEASONS = [
+    ((1, 1), (1, 6), Decimal("15")),
+    ((4, 1), (4, 20), Decimal("10")),
+    ((7, 1), (8, 31), Decimal("25")),
+    ((11, 1), (11, 30), Decimal("-10")),
+    ((12, 20), (12, 31), Decimal("15")),
+]
+
+
+def generate(lenders=100, apartments=6, bookings=None, payments=None, start=date(2024, 1, 1),
+             villa=True, seed=None):
+    """Legt Lender, Zahlungen (EUR/USD), Buchungen und Saisonpreise an.
+
+    Args:
+        lenders (int): Anzahl Lender.
+        apartments (int): Anzahl Apartments (ohne Villa).
+        bookings (int): Anzahl Buchungen, Standard 2 pro Lender. Sie werden lückenlos
+            überschneidungsfrei auf die Apartments verteilt; der Zeitraum wächst mit.
+        payments (int): Anzahl Zahlungen, Standard 4 pro Lender.
+        start (date): erster möglicher Buchungs-/Zahlungstag.
+        villa (bool): zusätzlich „La Villa Complete“ mit Pauschalpreisen anlegen.
+        seed: für reproduzierbare Daten.
+
+    Returns:
+        dict mit den Anzahlen pro Model.
+    """
+    rng = random.Random(seed)
+    bookings = lenders * 2 if bookings is None else bookings
+    payments = lenders * 4 if payments is None else payments
+
+    with transaction.atomic():
+        apartment_objs = Apartment.objects.bulk_create([
+            Apartment(
+                name=_apartment_name(i),
+                price_per_night=Decimal(rng.randrange(60, 220, 5)),
+                color=APARTMENT_COLORS[i % len(APARTMENT_COLORS)],
+            )
+            for i in range(apartments)
+        ])
+        if villa:
+            apartment_objs += Apartment.objects.bulk_create([
+                Apartment(name=VILLA_NAME, price_per_night=Decimal("650.00"), color="#333333"),
+            ])
+
+        lender_objs = Lender.objects.bulk_create([
+            _lender(rng, i) for i in range(lenders)
+        ], batch_size=500)
+
+        # Buchungen: je Apartment fortlaufend, zufällige Länge und Lücke.
+        cursors = {apartment.pk: start + timedelta(days=rng.randint(0, 14)) for apartment in apartment_objs}
+        booking_objs = []
+        for i in range(bookings):
+            apartment = apartment_objs[i % len(apartment_objs)]
+            nights = rng.randint(2, 14)
+            begin = cursors[apartment.pk]
+            end = begin + timedelta(days=nights)
+            cursors[apartment.pk] = end + timedelta(days=rng.randint(0, 10))
+            booking_objs.append(Booking(
+                lender=rng.choice(lender_objs),
+                apartment=apartment,
+                start_date=begin,
+                end_date=end,
+                custom_total_price=(
+                    Decimal(rng.randrange(1500, 6000, 100))
+                    if apartment.name == VILLA_NAME and rng.random() < 0.5 else None
+                ),
+            ))
+        Booking.objects.bulk_create(booking_objs, batch_size=500)
+
+        last_day = max(cursors.values())
+        rate_objs = [
+            SeasonalRate(
+                apartment=apartment,
+                start_date=date(year, *season_start),
+                end_date=date(year, *season_end),
+                percentage_adjustment=adjustment,
+            )
+            for apartment in apartment_objs
+            for year in range(start.year, last_day.year + 1)
+            for season_start, season_end, adjustment in SEASONS
+        ]
+        SeasonalRate.objects.bulk_create(rate_objs, batch_size=500)
+
+        # Zahlungen: flexible hängen an einem Darlehen pro Lender, Fixbeträge ohne.
+        loans = Loan.objects.bulk_create([
+            Loan(lender=lender, loan_type="flexible") for lender in lender_objs
+        ], batch_size=500)
+        loan_by_lender = {loan.lender_id: loan for loan in loans}
+        span = max((last_day - start).days, 1)
+        payment_objs = []
+        for _ in range(payments):
+            lender = rng.choice(lender_objs)
+            is_fixed = rng.random() < 0.1
+            usd = rng.random() < 0.2
+            payment = Payment(
+                lender=lender,
+                date=start + timedelta(days=rng.randrange(span)),
+                original_amount=Decimal(rng.randrange(100, 10000, 50)),
+                currency="USD" if usd else "EUR",
+                exchange_rate=Decimal(f"0.{rng.randint(8500, 9500)}") if usd else Decimal("1.0"),
+                is_fixed=is_fixed,
+                loan=None if is_fixed else loan_by_lender[lender.pk],
+            )
+            payment.amount_eur = payment.calculate_amount_eur()
+            payment_objs.append(payment)
+        Payment.objects.bulk_create(payment_objs, batch_size=500)
+
+        ledger.rebuild_ledgers(Lender.objects.filter(pk__in=[lender.pk for lender in lender_objs]))
+
+    for name in ("lender", "apartment", "booking", "payment", "seasonalrate"):
+        bump_version_on_commit(name)
+    transaction.on_commit(occupancy.invalidate)
+
+    return {
+        "lenders": len(lender_objs),
+        "apartments": len(apartment_objs),
+        "bookings": len(booking_objs),
+        "payments": len(payment_objs),
+        "seasonal_rates": len(rate_objs),
+    }
+
+
+def _apartment_name(i):
+    name = APARTMENT_NAMES[i % len(APARTMENT_NAMES)]
+    return name if i < len(APARTMENT_NAMES) else f"{name} {i // len(APARTMENT_NAMES) + 1}"
+
+
+def _lender(rng, i):
+    city, postal_code, country = rng.choice(CITIES)
+    first_name = rng.choice(FIRST_NAMES)
+    last_name = rng.choice(LAST_NAMES)
+    return Lender(
+        first_name=first_name,
+        last_name=f"{last_name}-{i}",
+        address=f"Hauptstraße {rng.randint(1, 200)}",
+        postal_code=postal_code,
+        city=city,
+        country=country,
+        email=f"{first_name.lower()}.{i}@example.org",
+        language="en" if country == "US" or rng.random() < 0.2 else "de",
+        discount_percent=rng.choice([Decimal("0"), Decimal("0"), Decimal("5"), Decimal("10")]),
+    )
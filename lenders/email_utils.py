@@ -1,12 +1,36 @@
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import get_template, render_to_string
 from django.utils.html import strip_tags
-from django.utils.translation import activate
+from django.utils.translation import activate, override
 from django.conf import settings
 import logging
+from itertools import islice
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_LANGUAGE = "de"
+
+
+def email_language(language, available):
+    """Sprache einer E-Mail: ``language``, wenn es sie gibt, sonst Deutsch.
+
+    Betreff und Template werden beide mit dem Ergebnis gewählt – so passen sie
+    auch bei leerer oder unbekannter Sprache (Altdaten) zusammen.
+    """
+    return language if language in available else DEFAULT_LANGUAGE
+
+
+def render_email(template_name, context=None, language="de"):
+    """Rendert ein E-Mail-Template in der gewünschten Sprache.
+
+    Returns:
+        (html_content, text_content)
+    """
+    with override(language):
+        html_content = render_to_string(template_name, context or {})
+    return html_content, strip_tags(html_content)
+
+
 def send_custom_email(
     recipient,
     subject,
@@ -34,8 +58,7 @@ def send_custom_email(
     context = context or {}
 
     try:
-        html_content = render_to_string(template_name, context)
-        text_content = strip_tags(html_content)
+        html_content, text_content = render_email(template_name, context, language)
 
         email = EmailMultiAlternatives(
             subject=subject,
@@ -51,3 +74,87 @@ def send_custom_email(
     except Exception as e:
         logger.error(f"❌ Fehler beim E-Mail-Versand an {recipient}: {e}")
         return False
+
+
+def send_bulk_email(messages, subject, template_name, context=None, chunk_size=None, connection=None):
+    """
+    Sendet viele personalisierte E-Mails über eine einzige SMTP-Verbindung.
+
+    Das Template wird pro Sprache nur einmal geladen und kompiliert; pro
+    Empfänger wird lediglich gerendert. Versendet wird mit ``send_messages``
+    in Paketen von ``chunk_size`` Nachrichten (Standard:
+    ``LENDERS_BULK_EMAIL_CHUNK_SIZE``), gerendert wird paketweise.
+
+    Args:
+        messages: Iterable aus (recipient, language, context) – der Kontext
+            ergänzt bzw. überschreibt ``context``.
+        subject (str | dict): Betreff oder {Sprache: Betreff}.
+        template_name (str): Pfad zum HTML-Template, ``{language}`` wird ersetzt
+            (z. B. ``"emails/broadcast_{language}.html"``).
+        context (dict): gemeinsame Kontextdaten für alle Empfänger.
+        chunk_size (int): Nachrichten pro ``send_messages``-Aufruf.
+        connection: optional eine bestehende Mail-Verbindung.
+
+    Returns:
+        dict mit ``sent`` und ``failed``.
+    """
+    context = context or {}
+    chunk_size = chunk_size or getattr(settings, "LENDERS_BULK_EMAIL_CHUNK_SIZE", 100)
+    templates = {}
+
+    def build_emails():
+        for recipient, language, extra_context in messages:
+            if not recipient:
+                logger.warning("⚠️ Serien-E-Mail ohne Empfängeradresse übersprungen.")
+                continue
+            if isinstance(subject, dict):
+                language = email_language(language, subject)
+                language_subject = subject.get(language) or next(iter(subject.values()))
+            else:
+                language = language or DEFAULT_LANGUAGE
+                language_subject = subject
+            if language not in templates:
+                templates[language] = get_template(template_name.format(language=language))
+
+            with override(language):
+                html_content = templates[language].render({
+                    **context,
+                    "subject": language_subject,
+                    "language": language,
+                    "recipient": recipient,
+                    **extra_context,
+                })
+            email = EmailMultiAlternatives(
+                subject=language_subject,
+                body=strip_tags(html_content),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[recipient],
+                connection=connection,
+            )
+            email.attach_alternative(html_content, "text/html")
+            yield email
+
+    result = {"sent": 0, "failed": 0}
+    emails = build_emails()
+    # fail_silently: ein abgelehnter Empfänger bricht den Rest des Pakets nicht ab.
+    own_connection = connection is None
+    connection = connection or get_connection(fail_silently=True)
+    opened = connection.open()  # eine Verbindung (ein TLS-Handshake) für alle Pakete
+    try:
+        while True:
+            chunk = list(islice(emails, chunk_size))
+            if not chunk:
+                break
+            try:
+                sent = connection.send_messages(chunk) or 0
+            except Exception as e:
+                logger.error(f"❌ Fehler beim Serienversand ({len(chunk)} Nachrichten): {e}")
+                sent = 0
+            result["sent"] += sent
+            result["failed"] += len(chunk) - sent
+    finally:
+        if own_connection or opened:
+            connection.close()
+
+    logger.info(f"📧 Serien-E-Mail: {result['sent']} gesendet, {result['failed']} fehlgeschlagen")
+    return result
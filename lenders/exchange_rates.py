@@ -0,0 +1,100 @@
+# lenders/exchange_rates.py
+"""
+Wechselkurse aus der EZB-Referenzkurstabelle.
+
+``load_ecb_csv()`` liest die CSV-Dateien der EZB (``eurofxref-hist.csv`` bzw.
+den Tageskurs ``eurofxref.csv``) zeilenweise ein und speichert sie per Upsert
+in ``ExchangeRate``. ``eur_rate()`` liefert den Kurs für eine Zahlung –
+gecacht pro Währung und Tag; nach einem neuen Import greifen die neuen Kurse
+sofort (Versionszähler „exchangerate“).
+"""
+import csv
+import io
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from .cache import EXCHANGE_RATES, bump_version_on_commit
+from .models import ExchangeRate
+
+# An Wochenenden und Feiertagen gibt es keinen Referenzkurs – dann gilt der
+# letzte veröffentlichte, höchstens eine Woche zurück.
+MAX_AGE = timedelta(days=7)
+BATCH_SIZE = 1000
+
+
+def _parse_date(value):
+    value = value.strip()
+    for fmt in ("%Y-%m-%d", "%d %B %Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Ungültiges Datum in der EZB-Datei: {value!r}")
+
+
+def load_ecb_csv(fh, currencies=("USD",)):
+    """Importiert EZB-Referenzkurse; ``currencies=None`` übernimmt alle Spalten.
+
+    Returns:
+        Anzahl gespeicherter Kurse.
+    """
+    if not isinstance(fh, io.TextIOBase):
+        fh = io.TextIOWrapper(fh, encoding="utf-8-sig", newline="")
+    reader = csv.reader(fh)
+    header = [column.strip() for column in next(reader)]
+    wanted = [
+        (index, column) for index, column in enumerate(header[1:], start=1)
+        if column and (currencies is None or column in currencies)
+    ]
+    count = 0
+    batch = []
+    for row in reader:
+        if not row or not row[0].strip():
+            continue
+        day = _parse_date(row[0])
+        for index, currency in wanted:
+            value = row[index].strip() if index < len(row) else ""
+            try:
+                rate = Decimal(value)
+            except InvalidOperation:
+                continue  # "N/A" für Tage ohne Kurs
+            batch.append(ExchangeRate(currency=currency, date=day, rate=rate, source="ECB"))
+        if len(batch) >= BATCH_SIZE:
+            count += _save(batch)
+            batch = []
+    count += _save(batch)
+    bump_version_on_commit("exchangerate")
+    return count
+
+
+def _save(rates):
+    if not rates:
+        return 0
+    ExchangeRate.objects.bulk_create(
+        rates,
+        update_conflicts=True,
+        unique_fields=["currency", "date"],
+        update_fields=["rate", "source"],
+    )
+    return len(rates)
+
+
+def ecb_rate(currency, day):
+    """Letzter EZB-Kurs (1 EUR = x ``currency``) am oder vor ``day``; ``None``, wenn keiner vorliegt."""
+    def build():
+        rate = (
+            ExchangeRate.objects.filter(currency=currency, date__lte=day, date__gt=day - MAX_AGE)
+            .order_by("-date").values_list("rate", flat=True).first()
+        )
+        return "" if rate is None else str(rate)  # auch „kein Kurs“ wird gecacht
+
+    value = EXCHANGE_RATES.get_or_build(build, currency, day.isoformat())
+    return Decimal(value) if value else None
+
+
+def eur_rate(currency, day):
+    """Kurs im Format von ``Payment.exchange_rate``: EUR pro Einheit, 4 Nachkommastellen."""
+    rate = ecb_rate(currency, day)
+    if not rate:
+        return None
+    return (Decimal(1) / rate).quantize(Decimal("0.0001"))
@@ -0,0 +1,329 @@
+# lenders/exports.py
+"""
+Streaming-Exporte (CSV und XLSX) für Zahlungen, Buchungen und Salden.
+
+Die Daten kommen per ``.values_list().iterator(chunk_size=…)`` aus der
+Datenbank und werden zeilenweise in die Antwort geschrieben – der
+Speicherbedarf bleibt unabhängig von der Tabellengröße konstant.
+
+* CSV: für deutsches Excel (Semikolon, Dezimalkomma, UTF-8 mit BOM).
+* XLSX: minimale Arbeitsmappe, direkt mit ``zipfile`` gestreamt
+  (keine zusätzliche Abhängigkeit).
+"""
+import csv
+import io
+import zipfile
+from datetime import date
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .expressions import DaysBetween
+from .models import Booking, Lender, Payment, round_eur
+
+CHUNK_SIZE = 2000
+
+# Spaltenarten: text, int, eur, rate, date, bool
+DATASETS = {
+    "payments": {
+        "title": "Zahlungen",
+        "columns": [
+            ("ID", "int"), ("Datum", "date"), ("Lender", "text"), ("E-Mail", "text"),
+            ("Währung", "text"), ("Betrag (Original)", "eur"), ("Wechselkurs", "rate"),
+            ("Betrag (EUR)", "eur"), ("Fixbetrag", "bool"),
+        ],
+    },
+    "bookings": {
+        "title": "Buchungen",
+        "columns": [
+            ("ID", "int"), ("Lender", "text"), ("Apartment", "text"), ("Anreise", "date"),
+            ("Abreise", "date"), ("Nächte", "int"), ("Pauschalpreis", "eur"), ("Kosten (EUR)", "eur"),
+        ],
+    },
+    "balances": {
+        "title": "Salden",
+        "columns": [
+            ("ID", "int"), ("Lender", "text"), ("E-Mail", "text"), ("Sprache", "text"),
+            ("Zahlungen (EUR)", "eur"), ("Abgewohnt (EUR)", "eur"), ("Saldo (EUR)", "eur"),
+        ],
+    },
+}
+FORMATS = ("csv", "xlsx")
+
+LENDER_NAME = Concat(F("lender__first_name"), Value(" "), F("lender__last_name"))
+
+
+# -----------------------
+# 🔎 Abfragen
+# -----------------------
+
+def payment_rows(queryset=None, date_from=None, date_to=None, lender=None, apartment=None):
+    queryset = Payment.objects.all() if queryset is None else queryset
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    if lender:
+        queryset = queryset.filter(lender=lender)
+    # Zahlungen haben kein Apartment – der Filter gilt hier nicht.
+    return queryset.annotate(lender_name=LENDER_NAME).order_by("date", "pk").values_list(
+        "pk", "date", "lender_name", "lender__email", "currency", "original_amount", "exchange_rate", "amount_eur",
+        "is_fixed",
+    )
+
+
+def booking_rows(queryset=None, date_from=None, date_to=None, lender=None, apartment=None):
+    queryset = Booking.objects.all() if queryset is None else queryset
+    # Zeitraum: alle Buchungen, die ihn berühren
+    if date_from:
+        queryset = queryset.filter(end_date__gt=date_from)
+    if date_to:
+        queryset = queryset.filter(start_date__lte=date_to)
+    if lender:
+        queryset = queryset.filter(lender=lender)
+    if apartment:
+        queryset = queryset.filter(apartment=apartment)
+    return queryset.with_cost().annotate(
+        lender_name=LENDER_NAME,
+        nights=DaysBetween("start_date", "end_date"),
+    ).order_by("start_date", "pk").values_list(
+        "pk", "lender_name", "apartment__name", "start_date", "end_date", "nights", "custom_total_price", "cost",
+    )
+
+
+def balance_rows(queryset=None, date_from=None, date_to=None, lender=None, apartment=None):
+    queryset = Lender.objects.all() if queryset is None else queryset
+    if lender:
+        queryset = queryset.filter(pk=getattr(lender, "pk", lender))
+    if apartment:
+        queryset = queryset.filter(bookings__apartment=apartment).distinct()
+    # Salden sind immer der aktuelle Stand; ein Zeitraum wird nicht angewendet.
+    return queryset.with_balance().annotate(
+        full_name=Concat(F("first_name"), Value(" "), F("last_name")),
+    ).order_by("last_name", "first_name", "pk").values_list(
+        "pk", "full_name", "email", "language", "total_payments", "total_used", "balance",
+    )
+
+
+ROW_BUILDERS = {
+    "payments": payment_rows,
+    "bookings": booking_rows,
+    "balances": balance_rows,
+}
+
+
+def rows(dataset, queryset=None, **filters):
+    """Iterator über die Zeilen eines Exports (Werte in Spaltenreihenfolge)."""
+    columns = DATASETS[dataset]["columns"]
+    for row in ROW_BUILDERS[dataset](queryset, **filters).iterator(chunk_size=CHUNK_SIZE):
+        yield [_normalize(value, kind) for value, (_header, kind) in zip(row, columns)]
+
+
+def _normalize(value, kind):
+    if value is None:
+        return None
+    if kind == "eur":
+        # SQLite liefert berechnete Beträge ungerundet zurück
+        return round_eur(Decimal(value))
+    if kind == "rate":
+        return Decimal(value).quantize(Decimal("0.0001"))
+    if kind == "int":
+        return int(value)
+    return value
+
+
+# -----------------------
+# 📄 CSV
+# -----------------------
+
+class _Echo:
+    """Pseudo-Datei für csv.writer: gibt jede Zeile direkt zurück."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "ja" if value else "nein"
+    if isinstance(value, Decimal):
+        return str(value).replace(".", ",")
+    if isinstance(value, date):
+        return value.strftime("%d.%m.%Y")
+    return value
+
+
+def stream_csv(dataset, row_iter):
+    writer = csv.writer(_Echo(), delimiter=";")
+    yield "﻿" + writer.writerow([header for header, _kind in DATASETS[dataset]["columns"]])
+    for row in row_iter:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+# -----------------------
+# 📊 XLSX
+# -----------------------
+
+class _ZipStream(io.RawIOBase):
+    """Nicht-seekbares Ziel für ZipFile; gesammelte Bytes werden stückweise abgeholt."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Stile: 0 Standard, 1 Datum, 2 Betrag, 3 Kopfzeile (fett), 4 Kurs
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="2"><numFmt numFmtId="164" formatCode="dd.mm.yyyy"/>'
+        '<numFmt numFmtId="165" formatCode="0.0000"/></numFmts>'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="5">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '</cellXfs>'
+        '</styleSheet>'
+    ),
+}
+EXCEL_EPOCH = date(1899, 12, 30)
+XLSX_STYLES = {"date": 1, "eur": 2, "rate": 4}
+
+
+def _workbook_xml(title):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(title)}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _text(value):
+    # Steuerzeichen sind in XML 1.0 nicht erlaubt
+    value = "".join(ch for ch in str(value) if ch in "\t\n\r" or ch >= " ")
+    return escape(value)
+
+
+def _xlsx_cell(value, kind, style=None):
+    if value is None:
+        return "<c/>"
+    if style is not None:
+        return f'<c t="inlineStr" s="{style}"><is><t>{_text(value)}</t></is></c>'
+    if kind == "bool":
+        return f'<c t="inlineStr"><is><t>{"ja" if value else "nein"}</t></is></c>'
+    if kind == "date":
+        return f'<c s="1"><v>{(value - EXCEL_EPOCH).days}</v></c>'
+    if kind in ("eur", "rate", "int"):
+        style_attr = f' s="{XLSX_STYLES[kind]}"' if kind in XLSX_STYLES else ""
+        return f"<c{style_attr}><v>{value}</v></c>"
+    return f'<c t="inlineStr"><is><t>{_text(value)}</t></is></c>'
+
+
+def stream_xlsx(dataset, row_iter, flush_every=500):
+    meta = DATASETS[dataset]
+    kinds = [kind for _header, kind in meta["columns"]]
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC.items():
+            archive.writestr(name, content)
+        archive.writestr("xl/workbook.xml", _workbook_xml(meta["title"]))
+        yield stream.pop()
+
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" state="frozen"/>'
+                b'</sheetView></sheetViews><sheetData>'
+            )
+            header = "".join(_xlsx_cell(title, "text", style=3) for title, _kind in meta["columns"])
+            sheet.write(f"<row>{header}</row>".encode())
+            for count, row in enumerate(row_iter, start=1):
+                cells = "".join(_xlsx_cell(value, kind) for value, kind in zip(row, kinds))
+                sheet.write(f"<row>{cells}</row>".encode())
+                if count % flush_every == 0:
+                    yield stream.pop()
+            sheet.write(b"</sheetData></worksheet>")
+    yield stream.pop()
+
+
+# -----------------------
+# 🚚 Antwort
+# -----------------------
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def export_response(dataset, fmt, queryset=None, **filters):
+    """``StreamingHttpResponse`` mit dem Export als Download."""
+    if dataset not in DATASETS or fmt not in FORMATS:
+        raise ValueError(f"Unbekannter Export: {dataset}.{fmt}")
+    row_iter = rows(dataset, queryset, **filters)
+    content = stream_csv(dataset, row_iter) if fmt == "csv" else stream_xlsx(dataset, row_iter)
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[fmt])
+    filename = f"{dataset}_{timezone.localdate():%Y-%m-%d}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,75 @@
+# lenders/expressions.py
+"""
+Datenbankfunktionen für Geldbeträge und Datumsdifferenzen.
+
+Die Ausdrücke laufen auf SQLite und PostgreSQL und liefern dieselben Cent-Werte
+wie die Python-Methoden an den Models (kaufmännische Rundung, ROUND_HALF_UP).
+"""
+from django.db.models import DecimalField, Func, IntegerField
+
+
+class RoundCents(Func):
+    """ROUND(x, 2) – kaufmännisch auf Cent gerundet."""
+    function = "ROUND"
+    template = "%(function)s(%(expressions)s, 2)"
+    output_field = DecimalField(max_digits=12, decimal_places=2)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite rechnet Dezimalfelder als REAL: 1.085 liegt binär knapp unter
+        # der Hälfte. Der minimale relative Schubs stellt ROUND_HALF_UP her.
+        return self.as_sql(
+            compiler, connection,
+            template="%(function)s(%(expressions)s * 1.0000000000001, 2)",
+            **extra_context,
+        )
+
+
+class ApplyPercent(Func):
+    """ROUND(wert × (1 ± prozent / 100), 2) – Saisonaufschlag bzw. Rabatt.
+
+    Ein fehlender Prozentwert (NULL) zählt als 0 %. Bewusst als eine Funktion
+    statt verschachtelter Ausdrücke, damit das SQL auf SQLite flach bleibt.
+    """
+    arity = 2
+    output_field = DecimalField(max_digits=12, decimal_places=2)
+
+    def __init__(self, value, percent, sign="+", **extra):
+        if sign not in ("+", "-"):
+            raise ValueError("sign muss '+' oder '-' sein")
+        self.sign = sign
+        super().__init__(value, percent, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        value_sql, value_params = compiler.compile(self.source_expressions[0])
+        percent_sql, percent_params = compiler.compile(self.source_expressions[1])
+        nudge = " * 1.0000000000001" if connection.vendor == "sqlite" else ""
+        sql = f"ROUND({value_sql} * (1 {self.sign} COALESCE({percent_sql}, 0) * 0.01){nudge}, 2)"
+        return sql, (*value_params, *percent_params)
+
+    as_sqlite = as_sql
+
+
+class DaysBetween(Func):
+    """Anzahl Tage von ``start`` bis ``end`` (wie ``(end - start).days``)."""
+    arity = 2
+    output_field = IntegerField()
+
+    def __init__(self, start, end, **extra):
+        super().__init__(end, start, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: date - date ergibt direkt einen integer
+        return super().as_sql(
+            compiler, connection, template="(%(expressions)s)", arg_joiner=" - ", **extra_context
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template="CAST(JULIANDAY(%(expressions)s) AS INTEGER)",
+            arg_joiner=") - JULIANDAY(",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template="DATEDIFF(%(expressions)s)", **extra_context)
@@ -1,6 +1,8 @@
 from django import forms
 from django.utils.safestring import mark_safe
 from .models import Booking, Lender, Apartment
+from .pricing import PriceBook
+from .bank_import import NOTIFY_CHOICES
 from datetime import datetime
 from decimal import Decimal
 
@@ -21,6 +23,7 @@ class BookingAdminForm(forms.ModelForm):
             apartment_id = self.data.get("apartment") or getattr(self.instance, "apartment_id", None)
             start = self.data.get("start_date") or getattr(self.instance, "start_date", None)
             end = self.data.get("end_date") or getattr(self.instance, "end_date", None)
+            custom_price = self.data.get("custom_total_price") or getattr(self.instance, "custom_total_price", None)
 
             if not (lender_id and apartment_id and start and end):
                 self.warning_html = mark_safe(
@@ -41,9 +44,10 @@ class BookingAdminForm(forms.ModelForm):
                 end = datetime.strptime(end, "%Y-%m-%d").date()
 
             nights = (end - start).days
-            rabatt = lender.discount_percent or Decimal('0')
-            preis = apartment.price_per_night
-            kosten = (Decimal(nights) * preis * (Decimal('1') - rabatt / Decimal('100'))).quantize(Decimal('0.01'))
+            kosten = PriceBook([apartment]).quote(
+                apartment, start, end, lender.discount_percent,
+                Decimal(custom_price) if custom_price else None,
+            )
             saldo = lender.current_balance()
 
             # ⚠️ Guthabenwarnung
@@ -110,4 +114,60 @@ class AdminEmailForm(forms.Form):
 
         if not lender and not custom_email:
             raise ValidationError("Bitte entweder einen Lender auswählen oder eine E-Mail-Adresse eingeben.")
-        return cleaned_data
\ No newline at end of file
+        return cleaned_data
+
+class ExportFilterForm(forms.Form):
+    date_from = forms.DateField(label="Von", required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    date_to = forms.DateField(label="Bis", required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    lender = forms.ModelChoiceField(
+        queryset=Lender.objects.order_by("last_name", "first_name"),
+        label="Lender",
+        required=False,
+    )
+    apartment = forms.ModelChoiceField(
+        queryset=Apartment.objects.order_by("name"),
+        label="Apartment",
+        required=False,
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get("date_from"), cleaned_data.get("date_to")
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("❌ „Von“ darf nicht nach „Bis“ liegen.")
+        return cleaned_data
+
+
+class PaymentReportFilterForm(ExportFilterForm):
+    apartment = None
+    currency = forms.ChoiceField(
+        label="Währung", required=False, choices=[("", "Alle"), ("EUR", "Euro"), ("USD", "US Dollar")],
+    )
+    payment_type = forms.ChoiceField(
+        label="Typ", required=False, choices=[("", "Alle"), ("fixed", "Fixbetrag"), ("flexible", "Flexibel")],
+    )
+
+
+class BankImportForm(forms.Form):
+    file = forms.FileField(label="Kontoauszug (CSV oder CAMT.053-XML)")
+    notify = forms.ChoiceField(label="Bestätigungen", initial="digest", choices=NOTIFY_CHOICES)
+    dry_run = forms.BooleanField(label="Nur Vorschau (nichts speichern)", required=False, initial=True)
+
+
+class AvailabilityForm(forms.Form):
+    start_date = forms.DateField(label="Anreise")
+    end_date = forms.DateField(label="Abreise")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get("start_date"), cleaned_data.get("end_date")
+        if start and end and end <= start:
+            raise forms.ValidationError("❌ Die Abreise muss nach der Anreise liegen.")
+        return cleaned_data
+
+
+class FreeWindowForm(forms.Form):
+    apartment = forms.ModelChoiceField(queryset=Apartment.objects.filter(is_active=True), label="Apartment")
+    nights = forms.IntegerField(label="Nächte", min_value=1, max_value=365)
+    after = forms.DateField(label="Frühestens ab", required=False)
+    limit = forms.IntegerField(label="Anzahl", min_value=1, max_value=50, required=False)
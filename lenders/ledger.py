@@ -0,0 +1,180 @@
+# lenders/ledger.py
+"""
+Persistenter Saldo pro Lender.
+
+Zahlungen und Buchungen verändern den Ledger inkrementell (Delta per
+``F()``-Update), damit ``Lender.current_balance()`` nur noch eine Zeile liest.
+Änderungen, die viele Buchungen gleichzeitig betreffen (Rabatt des Lenders,
+Apartmentpreis, Saisonpreise), lösen nach dem Commit einen Neuaufbau der
+betroffenen Lender aus.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Booking, Lender, LenderLedger, Payment, round_eur
+
+import logging
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0.00")
+
+
+def contribution(instance):
+    """Beitrag einer Zahlung/Buchung als Tupel (zahlungen, buchungen) in EUR."""
+    if isinstance(instance, Payment):
+        return instance.amount_eur, ZERO
+    if isinstance(instance, Booking):
+        return ZERO, instance.total_cost()
+    raise TypeError(f"Kein Ledger-Beitrag für {type(instance).__name__}")
+
+
+def rebuild_ledger(lender):
+    """Berechnet den Ledger eines Lenders komplett neu aus den Live-Daten."""
+    total_payments, total_bookings = lender.calculate_totals()
+    ledger, _ = LenderLedger.objects.update_or_create(
+        lender=lender,
+        defaults={
+            "total_payments": total_payments,
+            "total_bookings": total_bookings,
+            "balance": round_eur(total_payments - total_bookings),
+        },
+    )
+    return ledger
+
+
+def rebuild_ledgers(lenders=None):
+    """Baut die Ledger vieler Lender auf einmal neu auf (eine Abfrage + ein Upsert).
+
+    Für Massenimporte und Testdaten, bei denen keine Signale laufen.
+    """
+    lenders = (lenders if lenders is not None else Lender.objects.all()).with_balance()
+    now = timezone.now()
+    ledgers = [
+        LenderLedger(
+            lender_id=lender.pk,
+            total_payments=round_eur(lender.total_payments),
+            total_bookings=round_eur(lender.total_used),
+            balance=round_eur(lender.total_payments) - round_eur(lender.total_used),
+            updated_at=now,
+        )
+        for lender in lenders.select_related(None).order_by().only("pk")
+    ]
+    LenderLedger.objects.bulk_create(
+        ledgers,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["lender"],
+        update_fields=["total_payments", "total_bookings", "balance", "updated_at"],
+    )
+    return len(ledgers)
+
+
+def get_ledger(lender):
+    """Liefert den Ledger; fehlt er noch, wird er einmalig aufgebaut."""
+    try:
+        return lender.ledger
+    except LenderLedger.DoesNotExist:
+        return rebuild_ledger(lender)
+
+
+def apply_delta(lender_id, payments=ZERO, bookings=ZERO):
+    """Addiert ein Delta atomar auf den gespeicherten Ledger.
+
+    Existiert noch kein Ledger, passiert nichts – er wird beim nächsten Lesen
+    aus den Live-Daten aufgebaut und ist dann automatisch korrekt.
+    """
+    if not payments and not bookings:
+        return
+    LenderLedger.objects.filter(lender_id=lender_id).update(
+        total_payments=F("total_payments") + payments,
+        total_bookings=F("total_bookings") + bookings,
+        balance=F("balance") + payments - bookings,
+        updated_at=timezone.now(),
+    )
+
+
+def forget_cached_ledger(instance):
+    """Verwirft einen evtl. per select_related geladenen Ledger am Lender."""
+    lender = instance._state.fields_cache.get("lender")
+    if lender is not None:
+        lender._state.fields_cache.pop("ledger", None)
+
+
+def remember_previous(instance):
+    """Merkt sich vor dem Speichern den bisherigen Beitrag zum Saldo."""
+    instance._ledger_previous = None
+    if not instance.pk:
+        return
+    manager = type(instance)._default_manager
+    if isinstance(instance, Booking):
+        manager = manager.select_related("apartment", "lender")
+    previous = manager.filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._ledger_previous = (previous.lender_id, *contribution(previous))
+
+
+def record_saved(instance):
+    previous = getattr(instance, "_ledger_previous", None)
+    instance._ledger_previous = None
+    if previous:
+        lender_id, payments, bookings = previous
+        apply_delta(lender_id, -payments, -bookings)
+    apply_delta(instance.lender_id, *contribution(instance))
+    forget_cached_ledger(instance)
+
+
+def remember_deleted(instance):
+    """Der Beitrag muss vor dem Löschen berechnet werden (Kaskaden!)."""
+    instance._ledger_previous = (instance.lender_id, *contribution(instance))
+
+
+def record_deleted(instance):
+    previous = getattr(instance, "_ledger_previous", None)
+    instance._ledger_previous = None
+    if previous:
+        lender_id, payments, bookings = previous
+        apply_delta(lender_id, -payments, -bookings)
+
+
+def schedule_rebuild(lender_ids):
+    """Baut die Ledger der angegebenen Lender nach dem Commit neu auf."""
+    lender_ids = set(lender_ids)
+    if not lender_ids:
+        return
+
+    def _rebuild():
+        for lender in Lender.objects.filter(pk__in=lender_ids):
+            rebuild_ledger(lender)
+        logger.debug(f"📒 Ledger neu aufgebaut für {len(lender_ids)} Lender")
+
+    transaction.on_commit(_rebuild)
+
+
+def lender_ids_for_apartment(apartment_id):
+    return Booking.objects.filter(apartment_id=apartment_id).values_list("lender_id", flat=True).distinct()
+
+
+def verify_ledgers(lenders=None):
+    """Vergleicht gespeicherte Ledger mit der Live-Berechnung.
+
+    Liefert eine Liste von (lender, gespeichert, live) für alle Abweichungen,
+    jeweils als Tupel (zahlungen, buchungen, saldo); fehlende Ledger werden mit
+    ``None`` als gespeichertem Wert gemeldet.
+    """
+    if lenders is None:
+        lenders = Lender.objects.select_related("ledger").order_by("pk")
+    mismatches = []
+    for lender in lenders:
+        total_payments, total_bookings = lender.calculate_totals()
+        live = (total_payments, total_bookings, round_eur(total_payments - total_bookings))
+        try:
+            ledger = lender.ledger
+            stored = (ledger.total_payments, ledger.total_bookings, ledger.balance)
+        except LenderLedger.DoesNotExist:
+            stored = None
+        if stored != live:
+            mismatches.append((lender, stored, live))
+    return mismatches
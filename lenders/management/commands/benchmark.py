@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from lenders import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Misst Saldo, Buchungskosten, Reports, Kalender-Feed und Admin-Listen bei verschiedenen "
+        "Datenmengen. Läuft in einer eigenen Testdatenbank – die echte Datenbank bleibt unberührt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales", default=",".join(str(s) for s in benchmark.DEFAULT_SCALES),
+            help="Anzahl Lender pro Durchgang, kommagetrennt (Standard: %(default)s).",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Wiederholungen pro Messung (Standard: 5).")
+        parser.add_argument("--seed", type=int, default=1, help="Zufallsstartwert der Testdaten.")
+        parser.add_argument("--output", default="benchmark.json", help="Ergebnisdatei (JSON).")
+        parser.add_argument("--compare", help="Früheres Ergebnis (JSON), mit dem verglichen wird.")
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(value) for value in options["scales"].split(",") if value.strip()]
+        except ValueError:
+            raise CommandError("--scales erwartet ganze Zahlen, z. B. 50,200,1000")
+
+        previous = None
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as fh:
+                previous = json.load(fh)
+
+        report = self.run_isolated(scales, options["repeat"], options["seed"])
+
+        with open(options["output"], "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"💾 Ergebnisse gespeichert in {options['output']}"))
+
+        if previous:
+            self.stdout.write("📊 Vergleich (Median):")
+            for lenders, name, before, after, factor in benchmark.compare(previous, report):
+                marker = "🔴" if factor > 1.2 else "🟢" if factor < 0.8 else "⚪️"
+                self.stdout.write(
+                    f"  {marker} {lenders:>6} {name:<32} {before:>9.2f} → {after:>9.2f} ms  (×{factor:.2f})"
+                )
+
+    def run_isolated(self, scales, repeat, seed):
+        # SQLite-Testdatenbanken liegen sonst im Speicher – für realistische
+        # Zahlen eine temporäre Datei verwenden.
+        db_file = None
+        test_settings = settings.DATABASES["default"].setdefault("TEST", {})
+        if settings.DATABASES["default"]["ENGINE"].endswith("sqlite3") and not test_settings.get("NAME"):
+            db_file = os.path.join(tempfile.mkdtemp(prefix="cbv-benchmark-"), "benchmark.sqlite3")
+            test_settings["NAME"] = db_file
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(
+                CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "benchmark"}},
+                LENDERS_METRICS_ENABLED=False,
+            ):
+                return benchmark.run(scales, repeat=repeat, seed=seed, log=self.stdout.write)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            if db_file:
+                test_settings.pop("NAME", None)
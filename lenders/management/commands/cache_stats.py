@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from lenders.cache import CachedFragment, cache_stats
+
+
+class Command(BaseCommand):
+    help = "Zeigt Treffer/Fehlschläge der gecachten Reports und des Kalender-Feeds."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Zähler nach der Ausgabe zurücksetzen.")
+
+    def handle(self, *args, **options):
+        for name, stats in cache_stats().items():
+            rate = f"{stats['hit_rate']:.1%}" if stats["hit_rate"] is not None else "–"
+            self.stdout.write(f"{name:<28} Treffer {stats['hits']:>7}  Fehlschläge {stats['misses']:>7}  Quote {rate}")
+
+        if options["reset"]:
+            for fragment in CachedFragment.registry.values():
+                fragment.reset_stats()
+            self.stdout.write(self.style.SUCCESS("🧹 Zähler zurückgesetzt."))
@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lenders.demo_data import generate
+from lenders.models import Lender
+
+
+class Command(BaseCommand):
+    help = "Erzeugt synthetische Lender, Zahlungen, Buchungen und Saisonpreise (z. B. für Benchmarks)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lenders", type=int, default=100, help="Anzahl Lender (Standard: 100).")
+        parser.add_argument("--apartments", type=int, default=6, help="Anzahl Apartments ohne Villa (Standard: 6).")
+        parser.add_argument("--bookings", type=int, help="Anzahl Buchungen (Standard: 2 pro Lender).")
+        parser.add_argument("--payments", type=int, help="Anzahl Zahlungen (Standard: 4 pro Lender).")
+        parser.add_argument("--start", type=date.fromisoformat, default=date(2024, 1, 1), help="Erster Tag (JJJJ-MM-TT).")
+        parser.add_argument("--no-villa", action="store_true", help="Keine 'La Villa Complete' anlegen.")
+        parser.add_argument("--seed", type=int, help="Zufallsstartwert für reproduzierbare Daten.")
+        parser.add_argument(
+            "--append",
+            action="store_true",
+            help="Auch in eine Datenbank schreiben, die bereits Lender enthält.",
+        )
+
+    def handle(self, *args, **options):
+        if Lender.objects.exists() and not options["append"]:
+            raise CommandError("Die Datenbank enthält bereits Lender. Mit --append trotzdem Testdaten hinzufügen.")
+
+        counts = generate(
+            lenders=options["lenders"],
+            apartments=options["apartments"],
+            bookings=options["bookings"],
+            payments=options["payments"],
+            start=options["start"],
+            villa=not options["no_villa"],
+            seed=options["seed"],
+        )
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"🧪 Testdaten angelegt: {summary}"))
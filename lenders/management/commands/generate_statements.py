@@ -0,0 +1,51 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lenders import statements
+
+
+class Command(BaseCommand):
+    help = (
+        "Erzeugt Jahres-Kontoauszüge (Zahlungen, Buchungen, laufender Saldo) für alle Lender – "
+        "als HTML und, falls WeasyPrint oder wkhtmltopdf installiert ist, als PDF."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, default=date.today().year - 1, help="Jahr (Standard: Vorjahr).")
+        parser.add_argument(
+            "--output", help="Zielverzeichnis oder ZIP-Datei (Standard: statements_<jahr>.zip).",
+        )
+        parser.add_argument("--lender", type=int, action="append", dest="lenders", help="Nur diese Lender-ID (mehrfach möglich).")
+        parser.add_argument("--workers", type=int, help="Anzahl Render-Prozesse (Standard: Anzahl CPUs).")
+        parser.add_argument("--no-pdf", action="store_true", help="Nur HTML erzeugen.")
+
+    def handle(self, *args, **options):
+        year = options["year"]
+        output = options["output"] or f"statements_{year}.zip"
+        if options["workers"] is not None and options["workers"] < 1:
+            raise CommandError("--workers muss mindestens 1 sein.")
+
+        step = {"next": 0}
+
+        def progress(done, total):
+            # etwa alle 10 % eine Zeile, dazu die letzte
+            if done >= step["next"] or done == total:
+                self.stdout.write(f"  🖨 {done}/{total} Auszüge")
+                step["next"] = done + max(total // 10, 1)
+
+        try:
+            result = statements.generate_annual_statements(
+                year, output,
+                lender_ids=options["lenders"],
+                workers=options["workers"],
+                pdf=not options["no_pdf"],
+                progress=progress,
+            )
+        except OSError as e:
+            raise CommandError(f"❌ Auszüge konnten nicht geschrieben werden: {e}")
+
+        pdf_note = f"mit PDF ({result['pdf']})" if result["pdf"] else "nur HTML"
+        self.stdout.write(self.style.SUCCESS(
+            f"📄 {result['statements']} Auszug/Auszüge {year} erzeugt, {result['files']} Datei(en), {pdf_note} → {output}"
+        ))
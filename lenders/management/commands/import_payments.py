@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lenders import bank_import
+
+
+class Command(BaseCommand):
+    help = "Importiert Zahlungseingänge aus einem Kontoauszug (CSV oder CAMT.053-XML)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Pfad zur CSV- oder XML-Datei.")
+        parser.add_argument(
+            "--format", choices=["csv", "camt"], dest="fmt",
+            help="Dateiformat (Standard: nach Endung, .xml = CAMT).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Nur Vorschau anzeigen, nichts speichern.")
+        parser.add_argument(
+            "--notify", choices=[value for value, _label in bank_import.NOTIFY_CHOICES], default="digest",
+            help="Bestätigungs-E-Mails: digest (eine pro Lender), each (eine pro Zahlung) oder none.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["file"], "rb") as fh:
+                result = bank_import.import_file(
+                    fh, options["file"], fmt=options["fmt"], dry_run=options["dry_run"], notify=options["notify"],
+                )
+        except (OSError, bank_import.ImportFormatError) as e:
+            raise CommandError(f"❌ Import fehlgeschlagen: {e}")
+
+        for payment in result["payments"]:
+            self.stdout.write(
+                f"  ➕ {payment.date} {payment.original_amount:>10} {payment.currency}  {payment.lender}"
+            )
+        for tx, reason in result["skipped"]:
+            self.stdout.write(self.style.WARNING(
+                f"  ⏭ Zeile {tx.line}: {tx.date} {tx.amount} {tx.currency} {tx.name!r} – {reason}"
+            ))
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"🔎 Vorschau: {len(result['payments'])} Zahlung(en) würden angelegt, "
+                f"{len(result['skipped'])} übersprungen."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"🏦 {result['created']} Zahlung(en) angelegt, {len(result['skipped'])} übersprungen, "
+                f"{result['emails']} E-Mail(s) eingereiht."
+            ))
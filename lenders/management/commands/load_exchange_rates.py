@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lenders import exchange_rates
+
+
+class Command(BaseCommand):
+    help = (
+        "Lädt EZB-Referenzkurse (eurofxref.csv oder eurofxref-hist.csv) in die Wechselkurstabelle. "
+        "USD-Zahlungen ohne eigenen Kurs rechnen danach mit dem Tageskurs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Pfad zur EZB-CSV-Datei.")
+        parser.add_argument(
+            "--currency", action="append", dest="currencies",
+            help="Währung übernehmen (mehrfach möglich, Standard: USD).",
+        )
+        parser.add_argument("--all", action="store_true", help="Alle Währungen der Datei übernehmen.")
+
+    def handle(self, *args, **options):
+        currencies = None if options["all"] else tuple(options["currencies"] or ("USD",))
+        try:
+            with open(options["file"], "rb") as fh:
+                count = exchange_rates.load_ecb_csv(fh, currencies=currencies)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"❌ Import fehlgeschlagen: {e}")
+        self.stdout.write(self.style.SUCCESS(f"💱 {count} Kurs(e) gespeichert."))
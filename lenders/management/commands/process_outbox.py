@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lenders.outbox import process_outbox
+
+
+class Command(BaseCommand):
+    help = "Versendet fällige E-Mails aus dem Ausgang (EmailOutbox)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Nachrichten pro Stapel (Standard: LENDERS_OUTBOX_BATCH_SIZE).")
+        parser.add_argument("--loop", action="store_true", help="Als Worker weiterlaufen statt nach einem Durchgang zu beenden.")
+        parser.add_argument("--interval", type=float, default=10, help="Pause in Sekunden, wenn nichts zu tun ist (mit --loop).")
+
+    def handle(self, *args, **options):
+        while True:
+            result = process_outbox(batch_size=options["batch_size"])
+            if result["sent"] or result["failed"] or result["dead"]:
+                self.stdout.write(
+                    f"📤 {result['sent']} gesendet, {result['failed']} verschoben, {result['dead']} aufgegeben"
+                )
+            if not options["loop"]:
+                break
+            # Volle Stapel sofort weiter abarbeiten, sonst warten.
+            if not any(result.values()):
+                time.sleep(options["interval"])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from lenders.metrics import prune
+
+
+class Command(BaseCommand):
+    help = "Löscht gespeicherte Request-Metriken, die älter als --days Tage sind."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Aufbewahrungsdauer in Tagen (Standard: 30).")
+
+    def handle(self, *args, **options):
+        deleted = prune(options["days"])
+        self.stdout.write(self.style.SUCCESS(f"🧹 {deleted} Metrik-Zeilen gelöscht."))
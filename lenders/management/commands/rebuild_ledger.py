@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lenders.ledger import rebuild_ledgers, verify_ledgers
+from lenders.models import Lender
+
+
+class Command(BaseCommand):
+    help = "Baut den gespeicherten Saldo-Ledger neu auf oder prüft ihn gegen die Live-Berechnung."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Nur prüfen, nichts schreiben. Beendet sich mit Fehler, wenn Abweichungen gefunden werden.",
+        )
+        parser.add_argument(
+            "--lender",
+            type=int,
+            action="append",
+            dest="lender_ids",
+            help="Nur diesen Lender (ID) bearbeiten. Mehrfach angebbar.",
+        )
+
+    def handle(self, *args, **options):
+        lenders = Lender.objects.select_related("ledger").order_by("pk")
+        if options["lender_ids"]:
+            lenders = lenders.filter(pk__in=options["lender_ids"])
+
+        if options["verify"]:
+            mismatches = verify_ledgers(lenders)
+            for lender, stored, live in mismatches:
+                self.stdout.write(
+                    self.style.WARNING(f"❌ {lender} (ID {lender.pk}): gespeichert {stored}, live {live}")
+                )
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} Ledger weichen von der Live-Berechnung ab.")
+            self.stdout.write(self.style.SUCCESS(f"✅ {lenders.count()} Ledger stimmen mit der Live-Berechnung überein."))
+            return
+
+        count = rebuild_ledgers(lenders)
+        self.stdout.write(self.style.SUCCESS(f"📒 {count} Ledger neu aufgebaut."))
@@ -0,0 +1,271 @@
+# lenders/matching.py
+"""
+Unscharfe Zuordnung von Kontobewegungen zu Lendern.
+
+Ein In-Memory-Index über Namen, E-Mail-Adressen und Orte aller Lender:
+Namen werden in Zeichen-Trigramme zerlegt („Müller“ → $mu, mue, uel, …),
+dazu kommen ganze Wörter, E-Mail-Adressen und Orte als Merkmale. Jedes
+Merkmal zeigt auf die Lender, die es haben (invertierter Index). Für eine
+Buchung werden nur die Lender bewertet, die mindestens ein Merkmal teilen –
+der Aufwand hängt also kaum von der Gesamtzahl der Lender ab.
+
+Seltene Merkmale zählen mehr als häufige (IDF-Gewichtung): ein Treffer auf
+„Wojciechowski“ sagt mehr als einer auf „Anna“.
+
+Der Index lebt pro Prozess und wird bei Lender-Änderungen inkrementell
+angepasst (siehe signals.py). Ändert ein anderer Prozess Lender, merkt das
+der Versionszähler – dann wird beim nächsten Zugriff neu aufgebaut.
+"""
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict, namedtuple
+
+from .cache import get_version
+from .models import Lender
+
+Suggestion = namedtuple("Suggestion", "lender_id confidence reason")
+
+# Merkmale, die bei mehr als diesem Anteil der Lender vorkommen, werden bei
+# der Kandidatensuche übersprungen (z. B. die Domain „example“ oder „-in“).
+MAX_DOCUMENT_FREQUENCY = 0.2
+MAX_CANDIDATES = 50
+WORD_BOOST = 5
+
+# Gewichtung der Teilergebnisse für die Konfidenz (Summe 1)
+NAME_WEIGHT = 0.75
+TOKEN_WEIGHT = 0.2
+CITY_WEIGHT = 0.05
+# Mindestkonfidenz, wenn der vollständige Name im Verwendungszweck steht
+PURPOSE_CONFIDENCE = 0.85
+
+UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+
+# -----------------------
+# 🔤 Normalisierung
+# -----------------------
+
+def normalize(text):
+    """Kleinbuchstaben, Umlaute ausgeschrieben, Akzente entfernt: „Müller-Lüdenscheidt“ → „mueller luedenscheidt“."""
+    text = (text or "").casefold().translate(UMLAUTS)
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+def tokens(text):
+    # Einzelne Buchstaben (Initialen, „u.“) tragen kaum Information
+    return [token for token in normalize(text).split() if len(token) > 1 or token.isdigit()]
+
+
+def trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def name_grams(text):
+    grams = set()
+    for token in tokens(text):
+        grams |= trigrams(token)
+    return grams
+
+
+def emails(text):
+    return {email.casefold().rstrip(".") for email in EMAIL_RE.findall(text or "")}
+
+
+# -----------------------
+# 🗂 Index
+# -----------------------
+
+class LenderIndex:
+    def __init__(self, lenders=(), version=None):
+        self.version = version
+        self.docs = {}                      # lender_id -> Merkmale
+        self.postings = defaultdict(set)    # Merkmal -> {lender_id}
+        self._lock = threading.RLock()
+        for lender in lenders:
+            self.add(lender)
+
+    @classmethod
+    def build(cls):
+        """Lädt alle Lender – eine Abfrage."""
+        version = get_version("lender")
+        lenders = Lender.objects.only("first_name", "last_name", "email", "city")
+        return cls(lenders, version=version)
+
+    def __len__(self):
+        return len(self.docs)
+
+    @staticmethod
+    def features(lender):
+        name = f"{lender.first_name} {lender.last_name}"
+        email = (lender.email or "").casefold()
+        return {
+            "grams": frozenset(name_grams(name)),
+            "tokens": frozenset(tokens(name)),
+            "email_tokens": frozenset(tokens(email.split("@")[0])),
+            "email": email,
+            "city": frozenset(tokens(lender.city)),
+        }
+
+    @staticmethod
+    def _keys(doc):
+        keys = {f"g:{gram}" for gram in doc["grams"]}
+        keys |= {f"t:{token}" for token in doc["tokens"] | doc["email_tokens"]}
+        keys |= {f"c:{token}" for token in doc["city"]}
+        if doc["email"]:
+            keys.add(f"e:{doc['email']}")
+        return keys
+
+    def add(self, lender):
+        """Nimmt einen Lender auf oder aktualisiert ihn."""
+        with self._lock:
+            self.remove(lender.pk)
+            doc = self.features(lender)
+            self.docs[lender.pk] = doc
+            for key in self._keys(doc):
+                self.postings[key].add(lender.pk)
+
+    def remove(self, lender_id):
+        with self._lock:
+            doc = self.docs.pop(lender_id, None)
+            if doc is None:
+                return
+            for key in self._keys(doc):
+                ids = self.postings.get(key)
+                if ids is not None:
+                    ids.discard(lender_id)
+                    if not ids:
+                        del self.postings[key]
+
+    def idf(self, key):
+        return math.log(1 + len(self.docs) / (1 + len(self.postings.get(key, ()))))
+
+    def suggest(self, name="", text="", limit=5):
+        """Rangliste passender Lender für Zahlername und Freitext (Verwendungszweck, Referenz).
+
+        Returns:
+            Liste von ``Suggestion(lender_id, confidence, reason)``, beste zuerst;
+            ``confidence`` zwischen 0 und 1.
+        """
+        with self._lock:
+            return self._suggest(name, text, limit)
+
+    def _suggest(self, name, text, limit):
+        if not self.docs:
+            return []
+
+        # 1) E-Mail-Adresse im Text ist eindeutig
+        for email in emails(f"{name} {text}"):
+            ids = self.postings.get(f"e:{email}")
+            if ids and len(ids) == 1:
+                return [Suggestion(next(iter(ids)), 1.0, "E-Mail-Adresse")]
+
+        query_grams = name_grams(name)
+        query_tokens = set(tokens(f"{name} {text}"))
+        max_postings = max(MAX_DOCUMENT_FREQUENCY * len(self.docs), 10)
+
+        # 2) Kandidaten über den invertierten Index sammeln
+        weights = {}
+        scores = defaultdict(float)
+        # Ganze Wörter zählen mehr als einzelne Trigramme – sonst verdrängt ein
+        # fremder Zahlername den im Verwendungszweck genannten Lender.
+        keys = [(f"g:{gram}", 1) for gram in query_grams] + [(f"t:{token}", WORD_BOOST) for token in query_tokens]
+        for key, boost in keys:
+            ids = self.postings.get(key)
+            if not ids or len(ids) > max_postings:
+                continue
+            weight = weights[key] = self.idf(key)
+            for lender_id in ids:
+                scores[lender_id] += weight * boost
+        if not scores:
+            return []
+        candidates = sorted(scores, key=scores.get, reverse=True)[:MAX_CANDIDATES]
+
+        # 3) Kandidaten genauer bewerten
+        def gram_idf(gram):
+            key = f"g:{gram}"
+            if key not in weights:
+                weights[key] = self.idf(key)
+            return weights[key]
+
+        query_gram_weight = sum(gram_idf(gram) for gram in query_grams)
+        query_city = {token for token in query_tokens if f"c:{token}" in self.postings}
+        results = []
+        for lender_id in candidates:
+            doc = self.docs[lender_id]
+            # Gewichteter Dice-Koeffizient der Namens-Trigramme
+            shared = query_grams & doc["grams"]
+            doc_weight = sum(gram_idf(gram) for gram in doc["grams"])
+            name_score = (
+                2 * sum(gram_idf(gram) for gram in shared) / (query_gram_weight + doc_weight)
+                if shared else 0.0
+            )
+            # Anteil der Namenswörter, die wörtlich im Text vorkommen
+            token_score = len(doc["tokens"] & query_tokens) / len(doc["tokens"]) if doc["tokens"] else 0.0
+            city_score = 1.0 if doc["city"] and doc["city"] <= query_city else 0.0
+            confidence = NAME_WEIGHT * name_score + TOKEN_WEIGHT * token_score + CITY_WEIGHT * city_score
+            if token_score == 1.0 and len(doc["tokens"]) > 1:
+                # Vor- und Nachname stehen vollständig im Text, auch wenn jemand anderes zahlt
+                confidence = max(confidence, PURPOSE_CONFIDENCE)
+            reason = "Name" if name_score >= token_score else "Verwendungszweck"
+            results.append(Suggestion(lender_id, round(min(confidence, 1.0), 3), reason))
+
+        results.sort(key=lambda suggestion: (-suggestion.confidence, suggestion.lender_id))
+        return results[:limit]
+
+
+# -----------------------
+# 🗄 Prozessweiter Index, inkrementell gepflegt
+# -----------------------
+
+_lock = threading.Lock()
+_index = None
+
+
+def get_index():
+    """Aktueller Index; wird neu aufgebaut, wenn ein anderer Prozess Lender geändert hat."""
+    global _index
+    version = get_version("lender")
+    with _lock:
+        index = _index
+    if index is not None and index.version == version:
+        return index
+    index = LenderIndex.build()
+    with _lock:
+        _index = index
+    return index
+
+
+def _apply(change, version):
+    """Änderung eines Prozesses in den eigenen Index übernehmen.
+
+    ``version``: die Lender-Version, die genau diese Änderung erzeugt hat
+    (Rückgabe von ``bump_version``, nach dem Commit – siehe signals.py). War der
+    Index bis unmittelbar davor aktuell, gilt er danach wieder als aktuell –
+    sonst bleibt er veraltet und wird beim nächsten ``get_index()`` neu gebaut.
+    """
+    with _lock:
+        index = _index
+    if index is None:
+        return
+    change(index)
+    if index.version == version - 1:
+        index.version = version
+
+
+def lender_saved(lender, version):
+    _apply(lambda index: index.add(lender), version)
+
+
+def lender_deleted(lender_id, version):
+    _apply(lambda index: index.remove(lender_id), version)
+
+
+def invalidate():
+    global _index
+    with _lock:
+        _index = None
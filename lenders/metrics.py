@@ -0,0 +1,222 @@
+# lenders/metrics.py
+"""
+Laufzeit- und SQL-Messung pro View.
+
+``RequestMetricsMiddleware`` misst jeden Request (Gesamtzeit, Anzahl und
+Dauer der SQL-Abfragen über ``connection.execute_wrapper``) und zählt die
+Werte pro URL-Name in feste Histogramm-Buckets. Das kostet pro Request ein
+paar Mikrosekunden und eine Sperre; alle ``LENDERS_METRICS_FLUSH_INTERVAL``
+Sekunden schreibt jeder Prozess seine Zähler als neue ``RequestMetric``-Zeilen
+(nur einfügen, nie aktualisieren – mehrere Worker kommen sich nicht in die Quere).
+
+Perzentile werden aus den Buckets geschätzt: angegeben ist jeweils die
+Obergrenze des Buckets, in den das Perzentil fällt.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Bucket-Obergrenzen; der letzte Bucket ist „darüber“.
+WALL_MS_BOUNDS = (5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000)
+SQL_MS_BOUNDS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000, 2000, 5000)
+QUERY_BOUNDS = (0, 1, 2, 3, 5, 8, 10, 15, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000)
+
+METRICS = {
+    "wall_ms": WALL_MS_BOUNDS,
+    "sql_ms": SQL_MS_BOUNDS,
+    "queries": QUERY_BOUNDS,
+}
+
+
+def _empty():
+    return {
+        "count": 0,
+        "totals": {name: 0.0 for name in METRICS},
+        "buckets": {name: [0] * (len(bounds) + 1) for name, bounds in METRICS.items()},
+    }
+
+
+def merge(target, source):
+    """Addiert die Zähler von ``source`` auf ``target`` (gleiche Struktur wie ``_empty``)."""
+    target["count"] += source["count"]
+    for name in METRICS:
+        target["totals"][name] += source["totals"][name]
+        target["buckets"][name] = [a + b for a, b in zip(target["buckets"][name], source["buckets"][name])]
+    return target
+
+
+def percentile(buckets, bounds, q):
+    """Obergrenze des Buckets, in dem das q-Perzentil liegt (None = über der letzten Grenze)."""
+    total = sum(buckets)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for index, count in enumerate(buckets):
+        seen += count
+        if seen >= rank:
+            return bounds[index] if index < len(bounds) else None
+    return None
+
+
+# -----------------------
+# 📈 Prozessweiter Sammler
+# -----------------------
+
+class Collector:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._last_flush = time.monotonic()
+
+    def record(self, view_name, wall_ms, sql_ms, queries):
+        values = {"wall_ms": wall_ms, "sql_ms": sql_ms, "queries": queries}
+        with self._lock:
+            stats = self._stats.get(view_name)
+            if stats is None:
+                stats = self._stats[view_name] = _empty()
+            stats["count"] += 1
+            for name, bounds in METRICS.items():
+                value = values[name]
+                stats["totals"][name] += value
+                stats["buckets"][name][bisect_left(bounds, value)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {name: merge(_empty(), stats) for name, stats in self._stats.items()}
+
+    def take(self):
+        """Gibt die gesammelten Zähler zurück und beginnt von vorn."""
+        with self._lock:
+            stats, self._stats = self._stats, {}
+            self._last_flush = time.monotonic()
+        return stats
+
+    def flush_due(self):
+        interval = getattr(settings, "LENDERS_METRICS_FLUSH_INTERVAL", 60)
+        return time.monotonic() - self._last_flush >= interval
+
+    def flush(self):
+        """Schreibt die Zähler als ``RequestMetric``-Zeilen; bei Fehlern bleiben sie erhalten."""
+        from .models import RequestMetric
+
+        stats = self.take()
+        if not stats:
+            return 0
+        now = timezone.now()
+        try:
+            RequestMetric.objects.bulk_create([
+                RequestMetric(
+                    view_name=view_name[:200],
+                    recorded_at=now,
+                    count=data["count"],
+                    wall_ms_total=data["totals"]["wall_ms"],
+                    sql_ms_total=data["totals"]["sql_ms"],
+                    queries_total=int(data["totals"]["queries"]),
+                    buckets=data["buckets"],
+                )
+                for view_name, data in stats.items()
+            ])
+        except Exception as e:
+            logger.warning(f"⚠️ Request-Metriken konnten nicht gespeichert werden: {e}")
+            with self._lock:
+                for view_name, data in stats.items():
+                    merge(self._stats.setdefault(view_name, _empty()), data)
+            return 0
+        return len(stats)
+
+
+collector = Collector()
+
+
+# -----------------------
+# ⏱ Middleware
+# -----------------------
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "LENDERS_METRICS_ENABLED", True):
+            return self.get_response(request)
+
+        sql = [0, 0.0]  # Anzahl, Sekunden
+
+        def count_queries(execute, sql_text, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql_text, params, many, context)
+            finally:
+                sql[0] += 1
+                sql[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            response = self.get_response(request)
+        wall = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        if match is not None and match.view_name:
+            collector.record(match.view_name, wall * 1000, sql[1] * 1000, sql[0])
+            if collector.flush_due():
+                collector.flush()
+        return response
+
+
+# -----------------------
+# 📊 Auswertung
+# -----------------------
+
+def summary(since=None):
+    """Aggregiert gespeicherte (und noch nicht gespeicherte) Messwerte pro View.
+
+    Returns:
+        Liste von dicts, sortiert nach Gesamtzeit (teuerste Views zuerst).
+    """
+    from .models import RequestMetric
+
+    since = since or timezone.now() - timedelta(hours=24)
+    totals = {}
+    rows = RequestMetric.objects.filter(recorded_at__gte=since).values_list(
+        "view_name", "count", "wall_ms_total", "sql_ms_total", "queries_total", "buckets"
+    )
+    for view_name, count, wall_ms, sql_ms, queries, buckets in rows:
+        merge(totals.setdefault(view_name, _empty()), {
+            "count": count,
+            "totals": {"wall_ms": wall_ms, "sql_ms": sql_ms, "queries": queries},
+            "buckets": buckets,
+        })
+    for view_name, data in collector.snapshot().items():
+        merge(totals.setdefault(view_name, _empty()), data)
+
+    result = []
+    for view_name, data in totals.items():
+        count = data["count"] or 1
+        entry = {
+            "view_name": view_name,
+            "count": data["count"],
+            "wall_ms_total": data["totals"]["wall_ms"],
+        }
+        for name, bounds in METRICS.items():
+            entry[f"{name}_avg"] = data["totals"][name] / count
+            for q in (50, 95, 99):
+                entry[f"{name}_p{q}"] = percentile(data["buckets"][name], bounds, q / 100)
+        result.append(entry)
+    result.sort(key=lambda entry: entry["wall_ms_total"], reverse=True)
+    return result
+
+
+def prune(older_than_days):
+    from .models import RequestMetric
+
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return RequestMetric.objects.filter(recorded_at__lt=cutoff).delete()[0]
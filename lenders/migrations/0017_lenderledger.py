@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-17 10:29
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0016_sentconfirmation_booking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LenderLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_payments', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Summe Zahlungen (€)')),
+                ('total_bookings', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Summe Buchungen (€)')),
+                ('balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Saldo (€)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('lender', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ledger', to='lenders.lender')),
+            ],
+        ),
+    ]
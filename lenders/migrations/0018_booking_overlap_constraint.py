@@ -0,0 +1,78 @@
+# Generated by Django 5.2 on 2026-10-17 10:35
+
+from django.db import migrations, models
+
+# PostgreSQL: Exclusion-Constraint über (apartment_id, daterange) – braucht btree_gist.
+# SQLite: gleichwertige Trigger für INSERT und UPDATE.
+# Schlägt die Migration auf PostgreSQL fehl, gibt es bereits Doppelbuchungen;
+# diese zuerst bereinigen.
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    """
+    ALTER TABLE lenders_booking ADD CONSTRAINT booking_no_overlap
+    EXCLUDE USING gist (apartment_id WITH =, daterange(start_date, end_date, '[)') WITH &&)
+    WHERE (start_date < end_date)
+    """,
+]
+POSTGRES_BACKWARD = [
+    "ALTER TABLE lenders_booking DROP CONSTRAINT IF EXISTS booking_no_overlap",
+]
+
+SQLITE_OVERLAP_CONDITION = """
+    NEW.start_date < NEW.end_date AND EXISTS (
+        SELECT 1 FROM lenders_booking
+        WHERE apartment_id = NEW.apartment_id
+          AND start_date < NEW.end_date
+          AND end_date > NEW.start_date
+          AND start_date < end_date
+          {exclude_self}
+    )
+"""
+SQLITE_FORWARD = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS booking_no_overlap_insert
+    BEFORE INSERT ON lenders_booking
+    WHEN {SQLITE_OVERLAP_CONDITION.format(exclude_self="")}
+    BEGIN SELECT RAISE(ABORT, 'booking_no_overlap'); END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS booking_no_overlap_update
+    BEFORE UPDATE OF apartment_id, start_date, end_date ON lenders_booking
+    WHEN {SQLITE_OVERLAP_CONDITION.format(exclude_self="AND id != NEW.id")}
+    BEGIN SELECT RAISE(ABORT, 'booking_no_overlap'); END
+    """,
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS booking_no_overlap_insert",
+    "DROP TRIGGER IF EXISTS booking_no_overlap_update",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0017_lenderledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['apartment', 'start_date', 'end_date'], name='booking_apartment_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['end_date', 'start_date'], name='booking_dates_idx'),
+        ),
+        migrations.RunPython(
+            _run({"postgresql": POSTGRES_FORWARD, "sqlite": SQLITE_FORWARD}),
+            _run({"postgresql": POSTGRES_BACKWARD, "sqlite": SQLITE_BACKWARD}),
+        ),
+    ]
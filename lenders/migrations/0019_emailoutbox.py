@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-17 10:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0018_booking_overlap_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254, verbose_name='Empfänger')),
+                ('subject', models.CharField(max_length=200, verbose_name='Betreff')),
+                ('body_text', models.TextField()),
+                ('body_html', models.TextField(blank=True)),
+                ('language', models.CharField(choices=[('de', 'Deutsch'), ('en', 'English')], default='de', max_length=2)),
+                ('status', models.CharField(choices=[('pending', 'Wartend'), ('sending', 'Wird gesendet'), ('sent', 'Gesendet'), ('dead', 'Fehlgeschlagen (aufgegeben)')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Versuche')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Nächster Versuch')),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('claim_token', models.CharField(blank=True, max_length=32)),
+                ('last_error', models.TextField(blank=True, verbose_name='Letzter Fehler')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='lenders.booking')),
+                ('lender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outbox', to='lenders.lender')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='lenders.payment')),
+            ],
+            options={
+                'verbose_name': 'E-Mail-Ausgang',
+                'verbose_name_plural': 'E-Mail-Ausgang',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx')],
+            },
+        ),
+    ]
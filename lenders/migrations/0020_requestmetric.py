@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-17 10:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0019_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view_name', models.CharField(max_length=200)),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('wall_ms_total', models.FloatField(default=0)),
+                ('sql_ms_total', models.FloatField(default=0)),
+                ('queries_total', models.PositiveIntegerField(default=0)),
+                ('buckets', models.JSONField(default=dict)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recorded_at', 'view_name'], name='request_metric_time_idx')],
+            },
+        ),
+    ]
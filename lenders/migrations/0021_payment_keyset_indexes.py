@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-17 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0020_requestmetric'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lender',
+            index=models.Index(fields=['last_name', 'id'], name='lender_last_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['lender', 'date', 'id'], name='payment_lender_date_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-17 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0021_payment_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='bank_reference',
+            field=models.CharField(blank=True, default='', max_length=120, verbose_name='Bankreferenz'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['bank_reference'], name='payment_bank_reference_idx'),
+        ),
+    ]
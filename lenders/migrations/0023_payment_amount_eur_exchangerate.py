@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-17 11:06
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Case, F, When
+
+from lenders.expressions import RoundCents
+
+
+def backfill_amount_eur(apps, schema_editor):
+    # Ein UPDATE für alle Zahlungen – dieselbe Rundung wie Payment.calculate_amount_eur()
+    Payment = apps.get_model("lenders", "Payment")
+    Payment.objects.update(amount_eur=Case(
+        When(currency="USD", then=RoundCents(F("original_amount") * F("exchange_rate"))),
+        default=F("original_amount"),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0022_payment_bank_reference'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='amount_eur',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12, verbose_name='Betrag in EUR'),
+        ),
+        migrations.RunPython(backfill_amount_eur, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='payment',
+            name='exchange_rate',
+            field=models.DecimalField(decimal_places=4, default=Decimal('1.0'), help_text='EUR pro USD. Bei 1,0 wird der Tageskurs aus der Wechselkurstabelle übernommen.', max_digits=6, verbose_name='Wechselkurs (nur bei USD)'),
+        ),
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3, verbose_name='Währung')),
+                ('date', models.DateField(verbose_name='Datum')),
+                ('rate', models.DecimalField(decimal_places=6, max_digits=12, verbose_name='Kurs (pro 1 EUR)')),
+                ('source', models.CharField(default='ECB', max_length=20, verbose_name='Quelle')),
+            ],
+            options={
+                'verbose_name': 'Wechselkurs',
+                'verbose_name_plural': 'Wechselkurse',
+                'ordering': ['-date', 'currency'],
+                'constraints': [models.UniqueConstraint(fields=('currency', 'date'), name='exchange_rate_currency_date_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2 on 2026-10-17 16:20
+
+from django.db import migrations
+
+# Suchindizes für lenders/search.py.
+# PostgreSQL: pg_trgm-GIN-Indizes; die Ausdrücke müssen zu ``search.INDEXES`` passen.
+# SQLite: FTS5-Schattentabellen (Trigramm-Tokenizer, ab SQLite 3.34), per Trigger
+# synchron gehalten und beim Anlegen einmal aus den Tabellen befüllt.
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE INDEX IF NOT EXISTS lender_search_trgm_idx ON lenders_lender
+    USING gin ((first_name || ' ' || last_name || ' ' || email) gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS sentconfirmation_recipient_trgm_idx ON lenders_sentconfirmation
+    USING gin (recipient gin_trgm_ops)
+    """,
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS lender_search_trgm_idx",
+    "DROP INDEX IF EXISTS sentconfirmation_recipient_trgm_idx",
+]
+
+SQLITE_FTS_TABLES = {
+    "lenders_lender": ("first_name", "last_name", "email"),
+    "lenders_sentconfirmation": ("recipient",),
+}
+
+
+def _sqlite_forward(table, columns):
+    fts = f"{table}_fts"
+    names = ", ".join(columns)
+    new = ", ".join(f"new.{column}" for column in columns)
+    old = ", ".join(f"old.{column}" for column in columns)
+    insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});"
+    delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});"
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {names}, content='{table}', content_rowid='id', tokenize='trigram'
+        )
+        """,
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN {delete} {insert} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _sqlite_backward(table):
+    fts = f"{table}_fts"
+    return [
+        f"DROP TRIGGER IF EXISTS {fts}_insert",
+        f"DROP TRIGGER IF EXISTS {fts}_delete",
+        f"DROP TRIGGER IF EXISTS {fts}_update",
+        f"DROP TABLE IF EXISTS {fts}",
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        statements = POSTGRES_FORWARD
+    elif connection.vendor == "sqlite" and connection.Database.sqlite_version_info >= (3, 34, 0):
+        statements = [s for table, columns in SQLITE_FTS_TABLES.items() for s in _sqlite_forward(table, columns)]
+    else:
+        return  # kein Index – die Admin-Suche bleibt bei icontains
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        statements = POSTGRES_BACKWARD
+    elif vendor == "sqlite":
+        statements = [s for table in SQLITE_FTS_TABLES for s in _sqlite_backward(table)]
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0023_payment_amount_eur_exchangerate'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
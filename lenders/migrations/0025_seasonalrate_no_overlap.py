@@ -0,0 +1,115 @@
+# Generated by Django 5.2 on 2026-10-17 18:05
+
+from datetime import timedelta
+
+from django.db import migrations
+
+# Saisons eines Apartments dürfen sich nicht überschneiden – sonst rechnet
+# ``BookingQuerySet.with_cost`` (SQL) pro Nacht mehrere Aufschläge, während
+# ``RateIndex`` (Python) nur die Saison mit der kleinsten ID nimmt.
+#
+# 1. Bestehende Überschneidungen auflösen: jede Saison behält nur die Nächte,
+#    die keine ältere Saison (kleinere ID) belegt – genau die Preise, die
+#    ``RateIndex`` schon bisher berechnet hat. Bleiben mehrere Stücke übrig,
+#    wird die Saison aufgeteilt; bleibt keins, wird sie gelöscht.
+# 2. Neue Überschneidungen lehnt die Datenbank ab (auch bulk_create/Shell):
+#    PostgreSQL per Exclusion-Constraint, SQLite per Trigger.
+
+ONE_DAY = timedelta(days=1)
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    """
+    ALTER TABLE lenders_seasonalrate ADD CONSTRAINT seasonalrate_no_overlap
+    EXCLUDE USING gist (apartment_id WITH =, daterange(start_date, end_date, '[]') WITH &&)
+    WHERE (start_date <= end_date)
+    """,
+]
+POSTGRES_BACKWARD = [
+    "ALTER TABLE lenders_seasonalrate DROP CONSTRAINT IF EXISTS seasonalrate_no_overlap",
+]
+
+SQLITE_OVERLAP_CONDITION = """
+    NEW.start_date <= NEW.end_date AND EXISTS (
+        SELECT 1 FROM lenders_seasonalrate
+        WHERE apartment_id = NEW.apartment_id
+          AND start_date <= NEW.end_date
+          AND end_date >= NEW.start_date
+          AND start_date <= end_date
+          {exclude_self}
+    )
+"""
+SQLITE_FORWARD = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS seasonalrate_no_overlap_insert
+    BEFORE INSERT ON lenders_seasonalrate
+    WHEN {SQLITE_OVERLAP_CONDITION.format(exclude_self="")}
+    BEGIN SELECT RAISE(ABORT, 'seasonalrate_no_overlap'); END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS seasonalrate_no_overlap_update
+    BEFORE UPDATE OF apartment_id, start_date, end_date ON lenders_seasonalrate
+    WHEN {SQLITE_OVERLAP_CONDITION.format(exclude_self="AND id != NEW.id")}
+    BEGIN SELECT RAISE(ABORT, 'seasonalrate_no_overlap'); END
+    """,
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS seasonalrate_no_overlap_insert",
+    "DROP TRIGGER IF EXISTS seasonalrate_no_overlap_update",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+def split_overlapping_rates(apps, schema_editor):
+    SeasonalRate = apps.get_model("lenders", "SeasonalRate")
+    taken = {}  # apartment_id -> [(start, end_exklusiv)]
+    for rate in SeasonalRate.objects.order_by("pk"):
+        if rate.end_date < rate.start_date:
+            continue
+        pieces = [(rate.start_date, rate.end_date + ONE_DAY)]
+        for t_start, t_end in taken.get(rate.apartment_id, []):
+            pieces = [
+                part
+                for p_start, p_end in pieces
+                for part in ((p_start, min(p_end, t_start)), (max(p_start, t_end), p_end))
+                if part[0] < part[1]
+            ]
+        taken.setdefault(rate.apartment_id, []).extend(pieces)
+        if pieces == [(rate.start_date, rate.end_date + ONE_DAY)]:
+            continue
+        if not pieces:
+            rate.delete()
+            continue
+        (first_start, first_end), *rest = pieces
+        rate.start_date, rate.end_date = first_start, first_end - ONE_DAY
+        rate.save(update_fields=["start_date", "end_date"])
+        SeasonalRate.objects.bulk_create([
+            SeasonalRate(
+                apartment_id=rate.apartment_id,
+                start_date=start,
+                end_date=end - ONE_DAY,
+                percentage_adjustment=rate.percentage_adjustment,
+            )
+            for start, end in rest
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0024_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_overlapping_rates, migrations.RunPython.noop),
+        migrations.RunPython(
+            _run({"postgresql": POSTGRES_FORWARD, "sqlite": SQLITE_FORWARD}),
+            _run({"postgresql": POSTGRES_BACKWARD, "sqlite": SQLITE_BACKWARD}),
+        ),
+    ]
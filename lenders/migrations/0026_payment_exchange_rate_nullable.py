@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0025_seasonalrate_no_overlap'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='exchange_rate',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='EUR pro USD. Leer lassen, um den Tageskurs aus der Wechselkurstabelle zu übernehmen.', max_digits=6, null=True, verbose_name='Wechselkurs (nur bei USD)'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-17 11:40
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Doppelt importierte Zahlungen (paralleler Import vor dem Constraint) bleiben
+# erhalten, damit niemand Buchungen stillschweigend verliert – die jüngeren
+# bekommen eine markierte Referenz und lassen sich im Admin danach suchen.
+DUPLICATE_PREFIX = "DOPPELT-{pk}:"
+
+
+def mark_duplicate_references(apps, schema_editor):
+    Payment = apps.get_model("lenders", "Payment")
+    duplicates = (
+        Payment.objects.exclude(bank_reference="")
+        .values("bank_reference").annotate(count=Count("pk")).filter(count__gt=1)
+        .values_list("bank_reference", flat=True)
+    )
+    for reference in list(duplicates):
+        for payment in Payment.objects.filter(bank_reference=reference).order_by("pk")[1:]:
+            payment.bank_reference = (DUPLICATE_PREFIX.format(pk=payment.pk) + reference)[:120]
+            payment.save(update_fields=["bank_reference"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0026_payment_exchange_rate_nullable'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_duplicate_references, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payment_bank_reference_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(condition=models.Q(('bank_reference', ''), _negated=True), fields=('bank_reference',), name='payment_bank_reference_uniq'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-17 12:10
+
+from django.db import migrations
+
+# PostgreSQL: der Exclusion-Constraint aus 0018 rechnete ``daterange`` für jede
+# Zeile – bei Abreise vor Anreise schlug das Speichern mit einem DataError fehl.
+# Neu angelegt mit derselben Bedingung wie die SQLite-Trigger (nur gültige
+# Zeiträume), wie bei den Saisons in 0025. SQLite: unverändert.
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE lenders_booking DROP CONSTRAINT IF EXISTS booking_no_overlap",
+    """
+    ALTER TABLE lenders_booking ADD CONSTRAINT booking_no_overlap
+    EXCLUDE USING gist (apartment_id WITH =, daterange(start_date, end_date, '[)') WITH &&)
+    WHERE (start_date < end_date)
+    """,
+]
+POSTGRES_BACKWARD = [
+    "ALTER TABLE lenders_booking DROP CONSTRAINT IF EXISTS booking_no_overlap",
+    """
+    ALTER TABLE lenders_booking ADD CONSTRAINT booking_no_overlap
+    EXCLUDE USING gist (apartment_id WITH =, daterange(start_date, end_date, '[)') WITH &&)
+    """,
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0027_payment_bank_reference_uniq'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"postgresql": POSTGRES_FORWARD}),
+            _run({"postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -1,13 +1,18 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from datetime import date
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.utils.translation import activate, get_language
 from django.conf import settings
 from django.utils.html import strip_tags
+from django.utils import timezone
+
+from .expressions import ApplyPercent, DaysBetween, RoundCents
 
 LANGUAGE_CHOICES = [
     ('de', 'Deutsch'),
@@ -24,6 +29,50 @@ APARTMENT_COLORS = [
     "#cccccc",  # ⚪️ Grau
 ]
 
+VILLA_NAME = "La Villa Complete"
+
+# Name der Datenbank-Sperre gegen Doppelbuchungen (Migration 0018):
+# PostgreSQL-Exclusion-Constraint bzw. SQLite-Trigger.
+BOOKING_OVERLAP_CONSTRAINT = "booking_no_overlap"
+# Dasselbe für überschneidende Saisons eines Apartments (Migration 0025).
+SEASON_OVERLAP_CONSTRAINT = "seasonalrate_no_overlap"
+
+EUR_FIELD = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+def round_eur(value):
+    """Kaufmännische Rundung auf Cent – identisch zu ``RoundCents`` in SQL."""
+    return value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class LenderQuerySet(models.QuerySet):
+    def with_balance(self):
+        """Annotiert ``total_payments``, ``total_used`` und ``balance`` (EUR) per SQL.
+
+        Liefert dieselben Werte wie ``Lender.calculate_balance()``, aber für
+        beliebig viele Lender in einer einzigen Abfrage.
+        """
+        payments = (
+            Payment.objects.filter(lender=OuterRef('pk'))
+            .order_by().values('lender')
+            .annotate(total=Sum('amount_eur'))
+            .values('total')
+        )
+        bookings = (
+            Booking.objects.filter(lender=OuterRef('pk'))
+            .with_cost()
+            .order_by().values('lender')
+            .annotate(total=Sum('cost'))
+            .values('total')
+        )
+        zero = Value(Decimal('0.00'), output_field=EUR_FIELD)
+        return self.annotate(
+            total_payments=Coalesce(Subquery(payments, output_field=EUR_FIELD), zero),
+            total_used=Coalesce(Subquery(bookings, output_field=EUR_FIELD), zero),
+        ).annotate(
+            balance=RoundCents(F('total_payments') - F('total_used')),
+        )
+
 
 class Lender(models.Model):
     first_name = models.CharField("Vorname", max_length=50)
@@ -38,13 +87,44 @@ class Lender(models.Model):
     language = models.CharField("Sprache", max_length=2, choices=LANGUAGE_CHOICES, default='de')
     discount_percent = models.DecimalField("Rabatt in %", max_digits=5, decimal_places=2, default=Decimal('0.0'))
 
+    objects = LenderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset-Pagination der Zahlungsliste (Nachname, Lender, Datum, ID)
+            models.Index(fields=['last_name', 'id'], name='lender_last_name_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+    def calculate_totals(self):
+        """Summiert Zahlungen und Buchungskosten live aus der Datenbank."""
+        from .pricing import price_bookings
+        total_payments = self.payments.aggregate(total=Sum('amount_eur'))['total'] or Decimal('0.00')
+        total_bookings = sum((cost for _, cost in price_bookings(self.bookings.select_related('apartment'))), Decimal('0.00'))
+        return total_payments, total_bookings
+
+    def calculate_balance(self):
+        total_payments, total_bookings = self.calculate_totals()
+        return round_eur(total_payments - total_bookings)
+
     def current_balance(self):
-        total_payments = sum(p.amount_eur() for p in self.payments.all())
-        total_bookings = sum(b.total_cost() for b in self.bookings.all())
-        return (total_payments - total_bookings).quantize(Decimal('0.01'))
+        """Saldo aus dem Ledger – eine Zeile, unabhängig von der Historie."""
+        from .ledger import get_ledger
+        return get_ledger(self).balance
+
+
+class LenderLedger(models.Model):
+    """Laufend nachgeführte Summen pro Lender (siehe lenders/ledger.py)."""
+    lender = models.OneToOneField(Lender, on_delete=models.CASCADE, related_name='ledger')
+    total_payments = models.DecimalField("Summe Zahlungen (€)", max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    total_bookings = models.DecimalField("Summe Buchungen (€)", max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    balance = models.DecimalField("Saldo (€)", max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Ledger {self.lender}: {self.balance} €"
 
 
 class Loan(models.Model):
@@ -67,7 +147,12 @@ class Payment(models.Model):
     date = models.DateField()
     original_amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, choices=[('EUR', 'Euro'), ('USD', 'US Dollar')])
-    exchange_rate = models.DecimalField("Wechselkurs (nur bei USD)", max_digits=6, decimal_places=4, default=Decimal('1.0'))
+    exchange_rate = models.DecimalField(
+        "Wechselkurs (nur bei USD)", max_digits=6, decimal_places=4, null=True, blank=True,
+        help_text="EUR pro USD. Leer lassen, um den Tageskurs aus der Wechselkurstabelle zu übernehmen.",
+    )
+    # Beim Speichern berechnet – damit Summen und Salden direkt in SQL laufen
+    amount_eur = models.DecimalField("Betrag in EUR", max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
     loan = models.ForeignKey('Loan', on_delete=models.SET_NULL, null=True, blank=True, related_name='payments')
     PAYMENT_TYPE_CHOICES = [
         (False, _("Flexibel")),
@@ -80,11 +165,55 @@ class Payment(models.Model):
     )
     # 🆕 NEU:
     is_fixed = models.BooleanField("Einmaliger Fixbetrag", default=False)
+    # Eindeutige Kennung der Kontobewegung beim Import (verhindert Doppelimporte)
+    bank_reference = models.CharField("Bankreferenz", max_length=120, blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['lender', 'date', 'id'], name='payment_lender_date_idx'),
+        ]
+        constraints = [
+            # Eindeutig nur, wenn gesetzt – manuell erfasste Zahlungen haben keine Referenz
+            models.UniqueConstraint(
+                fields=['bank_reference'], condition=~Q(bank_reference=''), name='payment_bank_reference_uniq',
+            ),
+        ]
+
+    def calculate_amount_eur(self):
+        return round_eur(self.original_amount * self.exchange_rate) if self.currency == 'USD' else self.original_amount
+
+    def apply_exchange_rate(self):
+        """Übernimmt den Tageskurs aus ``ExchangeRate``, wenn das Kursfeld leer ist.
+
+        Ein gespeicherter Kurs wird nie ersetzt – auch nicht beim erneuten Speichern.
+
+        Returns:
+            False, wenn für eine USD-Zahlung weder eigener noch Tabellenkurs vorliegt.
+        """
+        if self.currency != 'USD' or self.exchange_rate is not None:
+            return True
+        from .exchange_rates import eur_rate
+        rate = eur_rate(self.currency, self.date) if self.date else None
+        if rate is None:
+            return False
+        self.exchange_rate = rate
+        return True
 
-    def amount_eur(self):
-        return (self.original_amount * self.exchange_rate).quantize(Decimal('0.01')) if self.currency == 'USD' else self.original_amount
+    def clean(self):
+        super().clean()
+        if self.original_amount is not None and self.date and not self.apply_exchange_rate():
+            raise ValidationError({
+                'exchange_rate': f"Kein Wechselkurs für {self.currency} am {self.date:%d.%m.%Y} hinterlegt – bitte eintragen."
+            })
 
     def save(self, *args, **kwargs):
+        if not self.apply_exchange_rate():
+            day = f" am {self.date:%d.%m.%Y}" if self.date else ""
+            raise ValidationError(f"Kein Wechselkurs für {self.currency}{day} hinterlegt.", code='missing_rate')
+        self.amount_eur = self.calculate_amount_eur()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'original_amount', 'currency', 'exchange_rate'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'exchange_rate', 'amount_eur'}
         if self.is_fixed:
             self.loan = None
         else:
@@ -99,6 +228,25 @@ class Payment(models.Model):
 
 
 
+class ExchangeRate(models.Model):
+    """Referenzkurs pro Währung und Tag, wie von der EZB veröffentlicht: 1 EUR = ``rate`` Einheiten."""
+    currency = models.CharField("Währung", max_length=3)
+    date = models.DateField("Datum")
+    rate = models.DecimalField("Kurs (pro 1 EUR)", max_digits=12, decimal_places=6)
+    source = models.CharField("Quelle", max_length=20, default="ECB")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'date'], name='exchange_rate_currency_date_uniq'),
+        ]
+        ordering = ['-date', 'currency']
+        verbose_name = "Wechselkurs"
+        verbose_name_plural = "Wechselkurse"
+
+    def __str__(self):
+        return f"{self.date}: 1 EUR = {self.rate} {self.currency}"
+
+
 class PaymentEmailLog(models.Model):
     payment = models.OneToOneField("Payment", on_delete=models.CASCADE, related_name="email_log")
     sent_at = models.DateTimeField(auto_now_add=True)
@@ -121,6 +269,11 @@ class Apartment(models.Model):
     def current_price(self):
         return self.price_per_night  # oder mit Logik für Saisonpreise
 
+    @property
+    def is_villa(self):
+        """True für „La Villa Complete“ – unabhängig von Groß-/Kleinschreibung und Leerzeichen."""
+        return self.name.strip().lower() == VILLA_NAME.lower()
+
     def save(self, *args, **kwargs):
         if not self.color or self.color == "#cccccc":
             existing_colors = set(Apartment.objects.values_list("color", flat=True))
@@ -131,6 +284,15 @@ class Apartment(models.Model):
         super().save(*args, **kwargs)
 
 
+def villa_rule_others(apartments):
+    """IDs der Apartments, von denen mindestens eins frei sein muss, damit die Villa buchbar ist.
+
+    Alle außer der Villa, auch inaktive – dieselbe Regel für ``Booking.clean``,
+    die Angebote (quotes.py) und die Verfügbarkeitssuche (availability.py).
+    """
+    return [apartment.pk for apartment in apartments if not apartment.is_villa]
+
+
 class SeasonalRate(models.Model):
     apartment = models.ForeignKey(Apartment, on_delete=models.CASCADE, related_name='seasonal_rates')
     start_date = models.DateField()
@@ -142,7 +304,86 @@ class SeasonalRate(models.Model):
 
     def adjusted_price(self):
         base = self.apartment.price_per_night
-        return (base * (Decimal("1") + self.percentage_adjustment / Decimal("100"))).quantize(Decimal("0.01"))
+        return round_eur(base * (Decimal("1") + self.percentage_adjustment / Decimal("100")))
+
+    def clean(self):
+        super().clean()
+
+        if self.apartment_id and self.start_date and self.end_date:
+            if self.end_date < self.start_date:
+                raise ValidationError(_("❌ Das Enddatum liegt vor dem Startdatum."), code='invalid_range')
+
+            # Saisons dürfen sich nicht überschneiden, damit jede Nacht genau einen Preis hat.
+            overlapping = SeasonalRate.objects.filter(
+                apartment_id=self.apartment_id,
+                start_date__lte=self.end_date,
+                end_date__gte=self.start_date,
+            ).exclude(pk=self.pk)
+            if overlapping.exists():
+                raise self.overlap_error()
+
+    def overlap_error(self):
+        return ValidationError(
+            _("❌ Dieser Zeitraum überschneidet sich mit einer bestehenden Saison von %(apartment)s."),
+            code='season_overlap',
+            params={'apartment': self.apartment.name},
+        )
+
+    def save(self, *args, **kwargs):
+        # Auch ohne full_clean() lehnt die Datenbank Überschneidungen ab (Migration 0025).
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except IntegrityError as e:
+            if SEASON_OVERLAP_CONSTRAINT in str(e):
+                raise self.overlap_error() from e
+            raise
+
+
+class BookingQuerySet(models.QuerySet):
+    def with_cost(self):
+        """Annotiert ``cost`` (EUR) per SQL – dieselbe Logik wie ``Booking.total_cost()``.
+
+        Alle Nächte kosten zunächst den rabattierten Grundpreis; für jede Saison
+        kommt die Differenz (Saisonpreis − Grundpreis) × überlappende Nächte dazu.
+        Das setzt überschneidungsfreie Saisons voraus – die Datenbank erzwingt
+        das seit Migration 0025, jede Nacht hat also höchstens einen Saisonpreis.
+        """
+        zero = Value(Decimal('0.00'), output_field=EUR_FIELD)
+        outer_price = OuterRef('apartment__price_per_night')
+        outer_discount = OuterRef('lender__discount_percent')
+        base_night = ApplyPercent(outer_price, outer_discount, '-')
+        season_night = ApplyPercent(ApplyPercent(outer_price, F('percentage_adjustment'), '+'), outer_discount, '-')
+        overlap_start = Greatest(F('start_date'), OuterRef('start_date'), output_field=models.DateField())
+        overlap_nights = Case(
+            When(end_date__lt=OuterRef('end_date'), then=DaysBetween(overlap_start, F('end_date')) + 1),
+            default=DaysBetween(overlap_start, OuterRef('end_date')),
+        )
+        seasonal_surcharge = (
+            SeasonalRate.objects.filter(
+                apartment=OuterRef('apartment'),
+                start_date__lt=OuterRef('end_date'),
+                end_date__gte=OuterRef('start_date'),
+            )
+            .order_by().values('apartment')
+            .annotate(total=Sum(overlap_nights * (season_night - base_night)))
+            .values('total')
+        )
+        nightly_cost = (
+            DaysBetween(F('start_date'), F('end_date'))
+            * ApplyPercent(F('apartment__price_per_night'), F('lender__discount_percent'), '-')
+        )
+        return self.annotate(
+            cost=Case(
+                When(
+                    Q(apartment__name=VILLA_NAME) & Q(custom_total_price__isnull=False) & ~Q(custom_total_price=0),
+                    then=RoundCents(F('custom_total_price')),
+                ),
+                When(end_date__lte=F('start_date'), then=zero),
+                default=RoundCents(nightly_cost + Coalesce(Subquery(seasonal_surcharge, output_field=EUR_FIELD), zero)),
+                output_field=EUR_FIELD,
+            ),
+        )
 
 
 class Booking(models.Model):
@@ -154,65 +395,67 @@ class Booking(models.Model):
     custom_total_price = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True, verbose_name="Pauschalpreis (optional)")
     override_confirm = models.BooleanField(default=False, verbose_name="Ich bestätige die Warnung manuell")
 
+    objects = BookingQuerySet.as_manager()
+
+    class Meta:
+        # Achtung SQLite: Migrationen, die die Tabelle neu aufbauen (AlterField u. ä.),
+        # verwerfen die Trigger aus 0018 – diese dann erneut anlegen.
+        indexes = [
+            models.Index(fields=['apartment', 'start_date', 'end_date'], name='booking_apartment_dates_idx'),
+            models.Index(fields=['end_date', 'start_date'], name='booking_dates_idx'),
+        ]
+
     def __str__(self):
         return f"{self.lender} – {self.apartment} – {self.start_date} bis {self.end_date}"
 
+    def overlap_error(self):
+        return ValidationError(
+            _("❌ Diese Buchung überschneidet sich mit einer bestehenden Buchung von %(apartment)s."),
+            code='overlap',
+            params={'apartment': self.apartment.name},
+        )
+
+    def save(self, *args, **kwargs):
+        # Die Datenbank lehnt Doppelbuchungen atomar ab – auch ohne full_clean().
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except IntegrityError as e:
+            if BOOKING_OVERLAP_CONSTRAINT in str(e):
+                raise self.overlap_error() from e
+            raise
+
     def nights(self):
         return (self.end_date - self.start_date).days
 
-    def get_seasonal_price(self):
-        if not self.apartment or not self.start_date or not self.end_date:
-            return None
-        overlapping_rate = self.apartment.seasonal_rates.filter(
-            start_date__lte=self.start_date,
-            end_date__gte=self.end_date
-        ).first()
-        if overlapping_rate:
-            return overlapping_rate.adjusted_price()
-        return None
-
     def price_per_night_after_discount(self):
-        if self.apartment.name == "La Villa Complete" and self.custom_total_price:
+        """Durchschnittspreis pro Nacht; Saisonpreise werden Nacht für Nacht berechnet."""
+        if self.apartment.name == VILLA_NAME and self.custom_total_price:
             return self.custom_total_price
-        seasonal_price = self.get_seasonal_price()
-        base_price = seasonal_price or self.apartment.price_per_night
-        discount = self.lender.discount_percent or Decimal('0')
-        return (base_price * (Decimal('1') - discount / Decimal('100'))).quantize(Decimal('0.01'))
+        nights = self.nights()
+        return round_eur(self.total_cost() / nights) if nights > 0 else Decimal('0.00')
 
-    def total_cost(self):
-        if self.apartment.name == "La Villa Complete" and self.custom_total_price:
-            return self.custom_total_price.quantize(Decimal('0.01'))
-        return (Decimal(self.nights()) * self.price_per_night_after_discount()).quantize(Decimal('0.01'))
+    def total_cost(self, price_book=None):
+        """Gesamtkosten inkl. Rabatt; siehe lenders/pricing.py."""
+        from .pricing import PriceBook
+        return (price_book or PriceBook()).booking_cost(self)
 
     def clean(self):
         super().clean()
 
-        if self.apartment and self.start_date and self.end_date:
-            overlapping = Booking.objects.filter(
-                apartment=self.apartment,
-                start_date__lt=self.end_date,
-                end_date__gt=self.start_date,
-            ).exclude(id=self.id)
+        if self.start_date and self.end_date and self.end_date <= self.start_date:
+            raise ValidationError(_("❌ Die Abreise muss nach der Anreise liegen."), code='invalid_range')
 
-            if overlapping.exists():
-                raise ValidationError(
-                    _("❌ Diese Buchung überschneidet sich mit einer bestehenden Buchung von %(apartment)s."),
-                    code='overlap',
-                    params={'apartment': self.apartment.name},
-                )
+        if self.apartment and self.start_date and self.end_date:
+            from .occupancy import OccupancyIndex
+            occupancy = OccupancyIndex.build(self.start_date, self.end_date)
 
-            if self.apartment.name.strip().lower() == "la villa complete":
-                other_apartments = Apartment.objects.exclude(name__iexact="La Villa Complete")
-                all_occupied = True
+            if occupancy.is_occupied(self.apartment_id, self.start_date, self.end_date, exclude=self.id):
+                raise self.overlap_error()
 
-                for apt in other_apartments:
-                    if not Booking.objects.filter(
-                        apartment=apt,
-                        start_date__lt=self.end_date,
-                        end_date__gt=self.start_date,
-                    ).exists():
-                        all_occupied = False
-                        break
+            if self.apartment.is_villa:
+                other_apartments = villa_rule_others(Apartment.objects.only('name'))
+                all_occupied = occupancy.all_occupied(other_apartments, self.start_date, self.end_date)
 
                 if all_occupied and not self.override_confirm:
                     raise ValidationError(
@@ -227,7 +470,7 @@ class SentConfirmation(models.Model):
     booking = models.ForeignKey("Booking", on_delete=models.CASCADE, null=True, blank=True)  # 🆕
     sent_at = models.DateTimeField(auto_now_add=True)
     language = models.CharField(max_length=2, choices=LANGUAGE_CHOICES)
-    recipient = models.EmailField()
+    recipient = models.EmailField()  # Suchindex: Migration 0024, siehe lenders/search.py
 
     def __str__(self):
         return f"{self.lender} – {self.sent_at.strftime('%Y-%m-%d %H:%M')}"
@@ -238,3 +481,67 @@ class SentConfirmation(models.Model):
         if self.booking:
             return f"Buchung: {self.booking.start_date} – {self.lender}"
         return f"Bestätigung – {self.lender}"
+
+
+class EmailOutbox(models.Model):
+    """Zu versendende E-Mails – gefüllt von den Signalen, abgearbeitet von ``process_outbox``."""
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Wartend'),
+        (STATUS_SENDING, 'Wird gesendet'),
+        (STATUS_SENT, 'Gesendet'),
+        (STATUS_DEAD, 'Fehlgeschlagen (aufgegeben)'),
+    ]
+
+    lender = models.ForeignKey("Lender", on_delete=models.SET_NULL, null=True, blank=True, related_name="outbox")
+    payment = models.ForeignKey("Payment", on_delete=models.SET_NULL, null=True, blank=True)
+    booking = models.ForeignKey("Booking", on_delete=models.SET_NULL, null=True, blank=True)
+    recipient = models.EmailField("Empfänger")
+    subject = models.CharField("Betreff", max_length=200)
+    body_text = models.TextField()
+    body_html = models.TextField(blank=True)
+    language = models.CharField(max_length=2, choices=LANGUAGE_CHOICES, default='de')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField("Versuche", default=0)
+    next_attempt_at = models.DateTimeField("Nächster Versuch", default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField("Letzter Fehler", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "E-Mail-Ausgang"
+        verbose_name_plural = "E-Mail-Ausgang"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} – {self.subject} ({self.get_status_display()})"
+
+
+class RequestMetric(models.Model):
+    """Histogramme von Laufzeit und SQL-Abfragen pro View (siehe lenders/metrics.py).
+
+    Jede Zeile enthält die Zähler eines Prozesses für ein Flush-Intervall.
+    """
+    view_name = models.CharField(max_length=200)
+    recorded_at = models.DateTimeField(default=timezone.now)
+    count = models.PositiveIntegerField(default=0)
+    wall_ms_total = models.FloatField(default=0)
+    sql_ms_total = models.FloatField(default=0)
+    queries_total = models.PositiveIntegerField(default=0)
+    buckets = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recorded_at', 'view_name'], name='request_metric_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.view_name} – {self.count} Requests ({self.recorded_at:%Y-%m-%d %H:%M})"
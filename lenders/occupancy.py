@@ -0,0 +1,114 @@
+# lenders/occupancy.py
+"""
+Belegungsindex pro Apartment und Tag.
+
+Alle Buchungen eines Zeitfensters werden mit einer Abfrage geladen und je
+Apartment als Bitset abgelegt (Bit *i* = Nacht ``origin + i`` ist belegt).
+Überschneidungs- und „La Villa Complete“-Prüfung werden damit zu einfachen
+Bit-Operationen – unabhängig davon, wie viele Apartments und Buchungen es gibt.
+"""
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from .cache import get_version
+from .models import Booking
+
+# Ein gecachter Index deckt großzügig mehr als den angefragten Zeitraum ab,
+# damit aufeinanderfolgende Prüfungen (z. B. im Buchungsformular) ihn wiederverwenden.
+CACHE_PADDING_BEFORE = timedelta(days=31)
+CACHE_PADDING_AFTER = timedelta(days=366)
+
+
+class OccupancyIndex:
+    def __init__(self, start, end, bookings=()):
+        """``bookings``: Iterable aus (booking_id, apartment_id, start_date, end_date)."""
+        self.start = start
+        self.end = end
+        self.bits = defaultdict(int)
+        self.masks = defaultdict(list)  # apartment_id -> [(booking_id, maske)]
+        self.version = None  # Buchungs-Version beim Laden, siehe get_occupancy()
+        for booking_id, apartment_id, b_start, b_end in bookings:
+            mask = self.range_mask(b_start, b_end)
+            if mask:
+                self.bits[apartment_id] |= mask
+                self.masks[apartment_id].append((booking_id, mask))
+
+    @classmethod
+    def build(cls, start, end):
+        """Lädt alle Buchungen, die [start, end) berühren – genau eine Abfrage."""
+        rows = Booking.objects.filter(start_date__lt=end, end_date__gt=start).values_list(
+            "pk", "apartment_id", "start_date", "end_date"
+        )
+        return cls(start, end, rows)
+
+    def covers(self, start, end):
+        return self.start <= start and end <= self.end
+
+    def range_mask(self, start, end):
+        """Bitmaske der Nächte [start, end), auf das Fenster des Index beschnitten."""
+        first = max((start - self.start).days, 0)
+        last = min((end - self.start).days, (self.end - self.start).days)
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def occupied_bits(self, apartment_id, exclude=None):
+        if exclude is None:
+            return self.bits.get(apartment_id, 0)
+        bits = 0
+        for booking_id, mask in self.masks.get(apartment_id, ()):
+            if booking_id != exclude:
+                bits |= mask
+        return bits
+
+    def is_occupied(self, apartment_id, start, end, exclude=None):
+        """True, wenn im Zeitraum mindestens eine Nacht des Apartments gebucht ist."""
+        return bool(self.occupied_bits(apartment_id, exclude) & self.range_mask(start, end))
+
+    def all_occupied(self, apartment_ids, start, end):
+        """True, wenn jedes der Apartments im Zeitraum belegt ist (leere Liste: True)."""
+        mask = self.range_mask(start, end)
+        return all(self.bits.get(apartment_id, 0) & mask for apartment_id in apartment_ids)
+
+    def free_apartments(self, apartment_ids, start, end):
+        mask = self.range_mask(start, end)
+        return [apartment_id for apartment_id in apartment_ids if not self.bits.get(apartment_id, 0) & mask]
+
+
+# -----------------------
+# 🗂 Prozessweiter Cache, über den Versionszähler auch prozessübergreifend aktuell
+# -----------------------
+
+_lock = threading.Lock()
+_cached = None
+_generation = 0
+
+
+def invalidate():
+    global _cached, _generation
+    with _lock:
+        _cached = None
+        _generation += 1
+
+
+def get_occupancy(start, end):
+    """Gecachter Index, der mindestens [start, end) abdeckt.
+
+    Neu geladen, sobald sich die Buchungs-Version ändert (auch durch andere
+    Worker, siehe cache.py); ``invalidate()`` verwirft ihn im eigenen Prozess
+    sofort. Für Hinweise im Formular gedacht – ``Booking.clean`` baut mit
+    ``OccupancyIndex.build`` frisch auf, weil es exakt sein muss.
+    """
+    global _cached
+    version = get_version("booking")
+    with _lock:
+        index, generation = _cached, _generation
+    if index is not None and index.version == version and index.covers(start, end):
+        return index
+    index = OccupancyIndex.build(start - CACHE_PADDING_BEFORE, end + CACHE_PADDING_AFTER)
+    index.version = version
+    with _lock:
+        if generation == _generation:  # keine Änderung während des Aufbaus
+            _cached = index
+    return index
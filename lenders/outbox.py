@@ -0,0 +1,298 @@
+# lenders/outbox.py
+"""
+Persistenter E-Mail-Ausgang.
+
+Signale und Admin legen Nachrichten nur noch als ``EmailOutbox``-Zeile an
+(fertig gerendert, in derselben Transaktion wie die auslösende Änderung).
+Versendet wird von ``manage.py process_outbox``: stapelweise über eine
+SMTP-Verbindung, mit exponentiellem Backoff bei Fehlern. Nachrichten, die
+``LENDERS_OUTBOX_MAX_ATTEMPTS``-mal scheitern, landen im Status „dead“.
+``SentConfirmation`` wird erst nach erfolgreicher Zustellung angelegt.
+"""
+import logging
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .email_utils import email_language, render_email
+from .models import EmailOutbox, SentConfirmation
+from .statements import lender_statement
+from lenders.utils.formatting import format_eur
+
+logger = logging.getLogger(__name__)
+
+# Wie lange ein Worker eine geholte Nachricht für sich reserviert. Stürzt er ab,
+# übernimmt nach Ablauf ein anderer Lauf.
+CLAIM_LEASE = timedelta(minutes=10)
+
+PAYMENT_SUBJECTS = {
+    "de": "💰 Zahlungseingang bestätigt",
+    "en": "💰 Payment received",
+}
+PAYMENT_DIGEST_SUBJECTS = {
+    "de": "💰 Zahlungseingänge bestätigt",
+    "en": "💰 Payments received",
+}
+BOOKING_SUBJECTS = {
+    "de": "📅 Buchungsbestätigung – Casa Bella Vista",
+    "en": "📅 Booking Confirmation – Casa Bella Vista",
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def retry_delay(attempts):
+    """Wartezeit nach dem ``attempts``-ten Fehlversuch: Basis × 2^(n-1), gedeckelt."""
+    base = _setting("LENDERS_OUTBOX_RETRY_BASE", 60)
+    cap = _setting("LENDERS_OUTBOX_RETRY_MAX", 6 * 60 * 60)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), cap))
+
+
+# -----------------------
+# 📥 Einreihen
+# -----------------------
+
+def build(recipient, subject, template_name, context=None, language="de", **links):
+    """Rendert die E-Mail als ungespeicherte ``EmailOutbox``-Zeile. ``links``: lender/payment/booking."""
+    if not recipient:
+        raise ValueError("Empfängeradresse fehlt.")
+    html_content, text_content = render_email(template_name, context, language)
+    return EmailOutbox(
+        recipient=recipient,
+        subject=subject,
+        body_text=text_content,
+        body_html=html_content,
+        language=language,
+        **links,
+    )
+
+
+def _save(message):
+    message.save()
+    logger.info(
+        f"📮 E-Mail an {message.recipient} eingereiht (Outbox #{message.pk}, Betreff: '{message.subject}')",
+        extra={"lender_id": message.lender_id},
+    )
+    return message
+
+
+def enqueue(recipient, subject, template_name, context=None, language="de", **links):
+    """Rendert die E-Mail und legt sie in den Ausgang. ``links``: lender/payment/booking."""
+    return _save(build(recipient, subject, template_name, context, language, **links))
+
+
+def enqueue_many(messages):
+    """Legt viele mit ``build()`` erzeugte Nachrichten per ``bulk_create`` in den Ausgang."""
+    messages = EmailOutbox.objects.bulk_create(messages, batch_size=500)
+    if messages:
+        logger.info(f"📮 {len(messages)} E-Mail(s) gesammelt eingereiht")
+    return messages
+
+
+def payment_confirmation(payment, balance=None):
+    """Zahlungsbestätigung als ungespeicherte Nachricht (``balance`` spart die Ledger-Abfrage)."""
+    lender = payment.lender
+    language = email_language(lender.language, PAYMENT_SUBJECTS)
+    context = {
+        "lender": lender,
+        "payment": payment,
+        "balance": format_eur(lender.current_balance() if balance is None else balance),
+        "formatted_amount": format_eur(payment.original_amount),
+        "language": language,
+    }
+    return build(
+        recipient=lender.email,
+        subject=PAYMENT_SUBJECTS[language],
+        template_name=f"emails/payment_confirmation_{language}.html",
+        context=context,
+        language=language,
+        lender=lender,
+        payment=payment,
+    )
+
+
+def enqueue_payment_confirmation(payment):
+    return _save(payment_confirmation(payment))
+
+
+def payment_digest(lender, payments, balance):
+    """Eine Sammelbestätigung für mehrere Zahlungen eines Lenders (z. B. nach einem Import)."""
+    language = email_language(lender.language, PAYMENT_DIGEST_SUBJECTS)
+    context = {
+        "lender": lender,
+        "payments": sorted(payments, key=lambda payment: (payment.date, payment.pk)),
+        "total": format_eur(sum((payment.amount_eur for payment in payments), Decimal("0.00"))),
+        "balance": format_eur(balance),
+        "language": language,
+    }
+    return build(
+        recipient=lender.email,
+        subject=PAYMENT_DIGEST_SUBJECTS[language],
+        template_name=f"emails/payment_digest_{language}.html",
+        context=context,
+        language=language,
+        lender=lender,
+    )
+
+
+def enqueue_booking_confirmation(booking):
+    lender = booking.lender
+    language = email_language(lender.language, BOOKING_SUBJECTS)
+    # Kontoübersicht einmal berechnen – die Templates rechnen nichts mehr nach
+    statement = lender_statement(lender)
+    cost = next(
+        (-line.amount for line in statement["lines"] if line.kind == "booking" and line.item.pk == booking.pk),
+        None,
+    )
+    if cost is None:
+        cost = booking.total_cost()
+    context = {
+        "lender": lender,
+        "booking": booking,
+        "statement": statement["lines"],
+        "total_payments": format_eur(statement["total_payments"]),
+        "total_bookings": format_eur(statement["total_bookings"]),
+        "balance": format_eur(statement["balance"]),
+        "formatted_total_cost": format_eur(cost),
+        "language": language,
+    }
+    return enqueue(
+        recipient=lender.email,
+        subject=BOOKING_SUBJECTS[language],
+        template_name=f"emails/booking_confirmation_{language}.html",
+        context=context,
+        language=language,
+        lender=lender,
+        booking=booking,
+    )
+
+
+# -----------------------
+# 📤 Versenden
+# -----------------------
+
+def claim_batch(batch_size, now=None):
+    """Reserviert bis zu ``batch_size`` fällige Nachrichten für diesen Lauf."""
+    now = now or timezone.now()
+    due = Q(status=EmailOutbox.STATUS_PENDING, next_attempt_at__lte=now) | Q(
+        status=EmailOutbox.STATUS_SENDING, locked_until__lt=now
+    )
+    ids = list(
+        EmailOutbox.objects.filter(due).order_by("next_attempt_at", "pk").values_list("pk", flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # Nur Zeilen, die noch fällig sind – ein parallel laufender Worker bekommt sie nicht doppelt.
+    EmailOutbox.objects.filter(due, pk__in=ids).update(
+        status=EmailOutbox.STATUS_SENDING, claim_token=token, locked_until=now + CLAIM_LEASE
+    )
+    return list(
+        EmailOutbox.objects.filter(claim_token=token, status=EmailOutbox.STATUS_SENDING)
+        .select_related("lender")
+        .order_by("next_attempt_at", "pk")
+    )
+
+
+def _build_message(item, connection):
+    email = EmailMultiAlternatives(
+        subject=item.subject,
+        body=item.body_text,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[item.recipient],
+        connection=connection,
+    )
+    if item.body_html:
+        email.attach_alternative(item.body_html, "text/html")
+    return email
+
+
+def _mark_sent(item, now):
+    item.status = EmailOutbox.STATUS_SENT
+    item.attempts += 1
+    item.sent_at = now
+    item.last_error = ""
+    item.claim_token = ""
+    item.locked_until = None
+    item.save(update_fields=["status", "attempts", "sent_at", "last_error", "claim_token", "locked_until"])
+    if item.lender_id and (item.payment_id or item.booking_id):
+        SentConfirmation.objects.create(
+            lender_id=item.lender_id,
+            payment_id=item.payment_id,
+            booking_id=item.booking_id,
+            language=item.language,
+            recipient=item.recipient,
+        )
+
+
+def _mark_failed(item, error, now):
+    item.attempts += 1
+    item.last_error = f"{type(error).__name__}: {error}"
+    item.claim_token = ""
+    item.locked_until = None
+    if item.attempts >= _setting("LENDERS_OUTBOX_MAX_ATTEMPTS", 6):
+        item.status = EmailOutbox.STATUS_DEAD
+        logger.error(f"☠️ Outbox #{item.pk} an {item.recipient} nach {item.attempts} Versuchen aufgegeben: {error}")
+    else:
+        item.status = EmailOutbox.STATUS_PENDING
+        item.next_attempt_at = now + retry_delay(item.attempts)
+        logger.warning(
+            f"⏳ Outbox #{item.pk} an {item.recipient} fehlgeschlagen ({item.attempts}. Versuch), "
+            f"nächster Versuch {item.next_attempt_at:%Y-%m-%d %H:%M}: {error}"
+        )
+    item.save(update_fields=["status", "attempts", "next_attempt_at", "last_error", "claim_token", "locked_until"])
+
+
+def process_outbox(batch_size=None, connection=None):
+    """Versendet einen Stapel fälliger Nachrichten über eine gemeinsame Verbindung.
+
+    Returns:
+        dict mit ``sent``, ``failed`` und ``dead``.
+    """
+    batch_size = batch_size or _setting("LENDERS_OUTBOX_BATCH_SIZE", 50)
+    result = {"sent": 0, "failed": 0, "dead": 0}
+    items = claim_batch(batch_size)
+    if not items:
+        return result
+
+    connection = connection or get_connection()
+    try:
+        for item in items:
+            now = timezone.now()
+            try:
+                connection.open()  # no-op, solange die Verbindung steht
+                _build_message(item, connection).send()
+            except Exception as e:
+                # Verbindung verwerfen – der nächste Versuch öffnet eine frische.
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+                _mark_failed(item, e, now)
+                result["dead" if item.status == EmailOutbox.STATUS_DEAD else "failed"] += 1
+            else:
+                _mark_sent(item, now)
+                result["sent"] += 1
+    finally:
+        connection.close()
+
+    logger.info(f"📤 Outbox: {result['sent']} gesendet, {result['failed']} verschoben, {result['dead']} aufgegeben")
+    return result
+
+
+def retry(queryset):
+    """Setzt Nachrichten (auch aufgegebene) auf „sofort erneut versuchen“."""
+    return queryset.exclude(status=EmailOutbox.STATUS_SENT).update(
+        status=EmailOutbox.STATUS_PENDING,
+        attempts=0,
+        next_attempt_at=timezone.now(),
+        claim_token="",
+        locked_until=None,
+    )
@@ -0,0 +1,193 @@
+# lenders/pricing.py
+"""
+Preisberechnung Nacht für Nacht.
+
+Die Saisonpreise eines Apartments werden einmal geladen und als sortierte,
+überschneidungsfreie Intervalle gehalten (``RateIndex``). Jede Nacht eines
+Aufenthalts bekommt den Preis der Saison, in der sie liegt – ein Aufenthalt
+über eine Saisongrenze hinweg wird also anteilig berechnet.
+
+``PriceBook`` bündelt die Indizes mehrerer Apartments, damit beliebig viele
+Buchungen mit einer einzigen Abfrage der Saisonpreise berechnet werden können.
+``get_price_book()`` hält ein solches Preisbuch aller Apartments pro Prozess
+vor, solange sich weder Apartments noch Saisonpreise ändern.
+"""
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from .cache import get_versions
+from .models import VILLA_NAME, Apartment, SeasonalRate, round_eur
+
+ONE_DAY = timedelta(days=1)
+
+
+def discounted(price, discount_percent):
+    discount = discount_percent or Decimal('0')
+    return round_eur(price * (Decimal('1') - discount / Decimal('100')))
+
+
+class RateIndex:
+    """Saisonpreise eines Apartments als sortierte Intervalle [start, end)."""
+
+    def __init__(self, base_price, rates=()):
+        self.base_price = base_price
+        self.starts = []
+        self.segments = []  # (start, end_exklusiv, preis)
+
+        # Überschneiden sich Saisons, gilt pro Nacht die zuerst angelegte (kleinste ID),
+        # wie früher bei ``seasonal_rates.first()``. Seit Migration 0025 lässt die
+        # Datenbank keine Überschneidungen mehr zu; bestehende wurden genauso aufgeteilt.
+        taken = []
+        for rate in sorted(rates, key=lambda r: r.pk or 0):
+            price = round_eur(base_price * (Decimal('1') + rate.percentage_adjustment / Decimal('100')))
+            pieces = [(rate.start_date, rate.end_date + ONE_DAY)]
+            for t_start, t_end in taken:
+                pieces = [
+                    part
+                    for p_start, p_end in pieces
+                    for part in ((p_start, min(p_end, t_start)), (max(p_start, t_end), p_end))
+                    if part[0] < part[1]
+                ]
+            for p_start, p_end in pieces:
+                taken.append((p_start, p_end))
+                self.segments.append((p_start, p_end, price))
+
+        self.segments.sort()
+        self.starts = [segment[0] for segment in self.segments]
+
+    @classmethod
+    def for_apartment(cls, apartment):
+        """Index aus ``apartment.seasonal_rates`` (nutzt prefetch_related, falls vorhanden)."""
+        return cls(apartment.price_per_night, apartment.seasonal_rates.all())
+
+    def price_segments(self, start, end):
+        """Zerlegt [start, end) in Abschnitte (nächte, preis_pro_nacht)."""
+        result = []
+        cursor = start
+        i = max(bisect_right(self.starts, start) - 1, 0)
+        while cursor < end and i < len(self.segments):
+            seg_start, seg_end, price = self.segments[i]
+            i += 1
+            if seg_end <= cursor:
+                continue
+            if seg_start >= end:
+                break
+            if seg_start > cursor:
+                result.append(((seg_start - cursor).days, self.base_price))
+                cursor = seg_start
+            stop = min(seg_end, end)
+            result.append(((stop - cursor).days, price))
+            cursor = stop
+        if cursor < end:
+            result.append(((end - cursor).days, self.base_price))
+        return result
+
+    def nightly_prices(self, start, end):
+        """Liste (datum, preis) für jede Nacht zwischen ``start`` und ``end``."""
+        nights = []
+        day = start
+        for count, price in self.price_segments(start, end):
+            for _ in range(count):
+                nights.append((day, price))
+                day += ONE_DAY
+        return nights
+
+    def cost(self, start, end, discount_percent=None):
+        """Gesamtpreis für [start, end) inkl. Rabatt, Nacht für Nacht berechnet."""
+        if not start or not end or end <= start:
+            return Decimal('0.00')
+        total = sum(
+            (Decimal(count) * discounted(price, discount_percent) for count, price in self.price_segments(start, end)),
+            Decimal('0.00'),
+        )
+        return round_eur(total)
+
+
+class PriceBook:
+    """Saisonpreise mehrerer Apartments, mit einer Abfrage geladen."""
+
+    def __init__(self, apartments=()):
+        self.indexes = {}
+        self.apartments = {}
+        self.version = None
+        self.load(apartments)
+
+    def load(self, apartments):
+        missing = {}
+        for apartment in apartments:
+            if apartment.pk in self.indexes:
+                continue
+            self.apartments[apartment.pk] = apartment
+            if "seasonal_rates" in getattr(apartment, "_prefetched_objects_cache", {}):
+                self.indexes[apartment.pk] = RateIndex.for_apartment(apartment)
+            else:
+                missing[apartment.pk] = apartment
+        if not missing:
+            return
+        rates = defaultdict(list)
+        for rate in SeasonalRate.objects.filter(apartment_id__in=missing):
+            rates[rate.apartment_id].append(rate)
+        for pk, apartment in missing.items():
+            self.indexes[pk] = RateIndex(apartment.price_per_night, rates[pk])
+
+    def index(self, apartment):
+        if apartment.pk not in self.indexes:
+            self.load([apartment])
+        return self.indexes[apartment.pk]
+
+    def quote(self, apartment, start, end, discount_percent=None, custom_total_price=None):
+        """Preis eines (geplanten) Aufenthalts – dieselbe Logik wie ``Booking.total_cost()``."""
+        if apartment.name == VILLA_NAME and custom_total_price:
+            return round_eur(custom_total_price)
+        return self.index(apartment).cost(start, end, discount_percent)
+
+    def booking_cost(self, booking):
+        return self.quote(
+            booking.apartment,
+            booking.start_date,
+            booking.end_date,
+            booking.lender.discount_percent,
+            booking.custom_total_price,
+        )
+
+
+def price_bookings(bookings):
+    """Berechnet die Kosten vieler Buchungen in einem Durchlauf.
+
+    Liefert eine Liste von (buchung, kosten). Apartment und Lender sollten per
+    ``select_related`` mitgeladen sein; die Saisonpreise aller beteiligten
+    Apartments werden mit einer einzigen Abfrage geholt.
+    """
+    bookings = list(bookings)
+    book = PriceBook({b.apartment_id: b.apartment for b in bookings}.values())
+    return [(booking, book.booking_cost(booking)) for booking in bookings]
+
+
+# -----------------------
+# 🗂 Prozessweites Preisbuch aller Apartments
+# -----------------------
+
+_lock = threading.Lock()
+_price_book = None
+
+
+def get_price_book():
+    """Preisbuch aller Apartments; neu geladen, sobald sich Apartments oder Saisonpreise ändern.
+
+    Anders als der Belegungsindex merkt es auch Änderungen anderer Prozesse
+    (Versionszähler aus cache.py). Nur lesen – ``load()`` nicht von außen aufrufen.
+    """
+    global _price_book
+    version = get_versions("apartment", "seasonalrate")
+    with _lock:
+        book = _price_book
+    if book is not None and book.version == version:
+        return book
+    book = PriceBook(Apartment.objects.prefetch_related("seasonal_rates"))
+    book.version = version
+    with _lock:
+        _price_book = book
+    return book
@@ -0,0 +1,160 @@
+# lenders/quotes.py
+"""
+Angebote für geplante Buchungen: Preis, Saldo danach, Belegung, Villa-Regel.
+
+Ein Aufruf bewertet beliebig viele Kandidaten (Apartment, Anreise, Abreise)
+eines Lenders auf einmal. Alles, was dafür nötig ist, wird einmal geladen
+bzw. aus prozessweiten Caches genommen:
+
+- Lender samt Ledger-Saldo: eine Abfrage,
+- Preise und Saisonpreise aller Apartments: ``pricing.get_price_book()``,
+- Belegung des Gesamtzeitraums: ``occupancy.get_occupancy()``.
+
+Die Ergebnisse sind Hinweise fürs Formular; verbindlich prüft weiterhin
+``Booking.clean()`` bzw. die Datenbank beim Speichern.
+"""
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.utils.html import escape
+
+from .models import Booking, Lender, villa_rule_others
+from .occupancy import get_occupancy
+from .pricing import get_price_book
+
+Candidate = namedtuple("Candidate", "apartment_id start end custom_total_price", defaults=(None,))
+
+
+class QuoteError(ValueError):
+    """Ungültige Anfrage (fehlender Lender, falsches Datum …)."""
+
+
+# -----------------------
+# 📥 Anfrage lesen
+# -----------------------
+
+def _parse_date(value, field):
+    try:
+        return date.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        raise QuoteError(f"{field}: ungültiges Datum {value!r} (erwartet JJJJ-MM-TT)")
+
+
+def parse_id(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise QuoteError(f"{field}: ungültige ID {value!r}")
+
+
+def parse_candidates(items):
+    """Liste von Dicts mit ``apartment``, ``start_date``, ``end_date`` und optional ``custom_total_price``."""
+    if not isinstance(items, list) or not items:
+        raise QuoteError("candidates: mindestens ein Zeitraum erwartet")
+    limit = getattr(settings, "LENDERS_QUOTE_MAX_CANDIDATES", 100)
+    if len(items) > limit:
+        raise QuoteError(f"candidates: höchstens {limit} Zeiträume pro Anfrage")
+
+    candidates = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise QuoteError(f"candidates[{i}]: Objekt erwartet")
+        price = item.get("custom_total_price")
+        if price in (None, ""):
+            price = None
+        else:
+            try:
+                price = Decimal(str(price).replace(",", "."))
+            except InvalidOperation:
+                raise QuoteError(f"candidates[{i}].custom_total_price: ungültiger Betrag {price!r}")
+        candidates.append(Candidate(
+            parse_id(item.get("apartment"), f"candidates[{i}].apartment"),
+            _parse_date(item.get("start_date"), f"candidates[{i}].start_date"),
+            _parse_date(item.get("end_date"), f"candidates[{i}].end_date"),
+            price,
+        ))
+    return candidates
+
+
+# -----------------------
+# 💶 Angebote berechnen
+# -----------------------
+
+def quote_many(lender_id, candidates, booking_id=None):
+    """Bewertet alle Kandidaten eines Lenders.
+
+    Args:
+        booking_id: Buchung, die gerade bearbeitet wird – sie zählt weder als
+            Überschneidung noch zum Verbrauch (ihre Kosten werden dem Saldo gutgeschrieben).
+
+    Returns:
+        ``{"balance": Decimal, "quotes": [dict, …]}`` in der Reihenfolge der Kandidaten.
+    """
+    lender = Lender.objects.select_related("ledger").filter(pk=lender_id).first()
+    if lender is None:
+        raise QuoteError(f"lender: Lender {lender_id} existiert nicht")
+    balance = lender.current_balance()
+
+    book = get_price_book()
+    if booking_id:
+        booking = Booking.objects.select_related("apartment", "lender").filter(pk=booking_id).first()
+        if booking is not None and booking.lender_id == lender.pk:
+            balance += book.booking_cost(booking)
+
+    valid = [c for c in candidates if c.apartment_id in book.apartments and c.start < c.end]
+    occupancy = get_occupancy(min(c.start for c in valid), max(c.end for c in valid)) if valid else None
+    other_apartments = villa_rule_others(book.apartments.values())
+
+    quotes = []
+    for candidate in candidates:
+        result = {
+            "apartment": candidate.apartment_id,
+            "start_date": candidate.start.isoformat(),
+            "end_date": candidate.end.isoformat(),
+        }
+        apartment = book.apartments.get(candidate.apartment_id)
+        if apartment is None:
+            result.update(status="invalid", error="Unbekanntes Apartment")
+        elif candidate.end <= candidate.start:
+            result.update(status="invalid", error="Abreise muss nach der Anreise liegen")
+        else:
+            result.update(_quote(
+                book, occupancy, other_apartments, lender, balance, apartment, candidate, booking_id,
+            ))
+        quotes.append(result)
+    return {"balance": balance, "quotes": quotes}
+
+
+def _quote(book, occupancy, other_apartments, lender, balance, apartment, candidate, booking_id):
+    price = book.quote(apartment, candidate.start, candidate.end, lender.discount_percent, candidate.custom_total_price)
+    balance_after = balance - price
+    overlap = occupancy.is_occupied(apartment.pk, candidate.start, candidate.end, exclude=booking_id)
+    villa_blocked = (
+        apartment.is_villa
+        and occupancy.all_occupied(other_apartments, candidate.start, candidate.end)
+    )
+
+    warnings = []
+    if balance_after < 0:
+        warnings.append(
+            f"⚠️ Guthaben: Buchung kostet <strong>{price:.2f} €</strong>, "
+            f"Guthaben beträgt nur <strong>{balance:.2f} €</strong>."
+        )
+    if overlap:
+        warnings.append(f"❌ {escape(apartment.name)} ist in diesem Zeitraum bereits belegt.")
+    if villa_blocked:
+        warnings.append(
+            "📌 Hinweis: 'La Villa Complete' darf nur gebucht werden, wenn <strong>mindestens eine andere Wohnung frei</strong> ist."
+        )
+    return {
+        "status": "warning" if warnings else "ok",
+        "nights": (candidate.end - candidate.start).days,
+        "price": price,
+        "balance_after": balance_after,
+        "affordable": balance_after >= 0,
+        "overlap": overlap,
+        "villa_blocked": villa_blocked,
+        "warnings": warnings,
+    }
@@ -0,0 +1,211 @@
+# lenders/reports.py
+"""
+Gemeinsame Bausteine der Admin-Reports (lenders/views.py und CustomAdminSite).
+
+Die Tabellen werden als HTML-Fragment gerendert und versioniert gecacht –
+sie werden erst neu berechnet, wenn sich eines der zugrunde liegenden Models
+ändert (siehe lenders/cache.py).
+"""
+import base64
+import hashlib
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils.http import urlencode
+
+from .analytics import occupancy_stats
+from .cache import REPORT_APARTMENT_PRICES, REPORT_OCCUPANCY, REPORT_PAYMENT_USAGE, REPORT_PAYMENTS_RAW
+from .models import Apartment, Booking, Lender, Payment
+
+# -----------------------
+# 💳 Rohdaten Zahlungen (Keyset-Pagination)
+# -----------------------
+# Statt OFFSET wird ab dem letzten Schlüssel der vorigen Seite weitergelesen.
+# Die Sortierung passt zu den Indizes lender_last_name_idx (Nachname, ID) und
+# payment_lender_date_idx (Lender, Datum, ID) – jede Seite kostet gleich viel,
+# egal wie viele Zahlungen es insgesamt gibt.
+
+RAW_ORDERING = ("lender__last_name", "lender_id", "date", "id")
+
+
+def _keyset_filter(values, op):
+    """(a, b, c, d) > (x, y, z, w) als verschachtelte Q-Bedingung."""
+    condition = None
+    for field, value in reversed(list(zip(RAW_ORDERING, values))):
+        step = Q(**{f"{field}__{op}": value})
+        if condition is not None:
+            step |= Q(**{field: value}) & condition
+        condition = step
+    # Redundante Bereichsgrenze auf der ersten Spalte – damit kann die
+    # Datenbank direkt in den Index springen.
+    first = "gte" if op == "gt" else "lte"
+    return Q(**{f"{RAW_ORDERING[0]}__{first}": values[0]}) & condition
+
+
+def encode_cursor(payment):
+    values = [payment.lender.last_name, payment.lender_id, payment.date.isoformat(), payment.pk]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Cursor aus der URL; ``None`` bei ungültigen Werten (→ erste Seite)."""
+    try:
+        last_name, lender_id, day, pk = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return [str(last_name), int(lender_id), date.fromisoformat(day), int(pk)]
+    except (ValueError, TypeError):
+        return None
+
+
+def filter_payments(queryset, date_from=None, date_to=None, lender=None, currency=None, payment_type=None):
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    if lender:
+        queryset = queryset.filter(lender=lender)
+    if currency:
+        queryset = queryset.filter(currency=currency)
+    if payment_type:
+        queryset = queryset.filter(is_fixed=payment_type == "fixed")
+    return queryset
+
+
+def payment_list_raw_page(filters=None, after=None, before=None, page_size=None):
+    """Eine Seite der Rohdaten inkl. EUR-Zwischensumme und Cursor für vor/zurück.
+
+    Args:
+        filters (dict): ``date_from``, ``date_to``, ``lender``, ``currency``, ``payment_type``.
+        after / before: Cursor (``decode_cursor``) der Nachbarseite.
+    """
+    page_size = page_size or getattr(settings, "LENDERS_REPORT_PAGE_SIZE", 100)
+    payments = filter_payments(
+        Payment.objects.select_related("lender"),
+        **(filters or {}),
+    )
+    if before:
+        payments = payments.filter(_keyset_filter(before, "lt"))
+        payments = payments.order_by(*(f"-{field}" for field in RAW_ORDERING))
+    else:
+        if after:
+            payments = payments.filter(_keyset_filter(after, "gt"))
+        payments = payments.order_by(*RAW_ORDERING)
+
+    rows = list(payments[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, bool(after)
+
+    return {
+        "payments": rows,
+        "subtotal_eur": sum((payment.amount_eur for payment in rows), Decimal("0.00")),
+        "next_cursor": encode_cursor(rows[-1]) if rows and has_next else None,
+        "previous_cursor": encode_cursor(rows[0]) if rows and has_previous else None,
+    }
+
+
+def payment_list_raw_table(filters=None, after=None, before=None):
+    """HTML-Tabelle einer Seite; Filter und Cursor landen im Cache-Schlüssel."""
+    filters = {name: value for name, value in (filters or {}).items() if value}
+    query = urlencode({name: getattr(value, "pk", value) for name, value in sorted(filters.items())})
+
+    def build():
+        page = payment_list_raw_page(
+            filters,
+            after=decode_cursor(after) if after else None,
+            before=decode_cursor(before) if before else None,
+        )
+        return render_to_string("admin/lenders/reports/_payment_list_raw_table.html", {
+            **page,
+            "query": f"{query}&" if query else "",
+        })
+
+    page_key = hashlib.md5(f"{query}|{after or ''}|{before or ''}".encode()).hexdigest()
+    return REPORT_PAYMENTS_RAW.get_or_build(build, page_key)
+
+
+def payment_list_raw_context(request):
+    """Filterformular und Tabelle für beide Ansichten (lenders/views.py und Admin)."""
+    from .forms import PaymentReportFilterForm
+
+    form = PaymentReportFilterForm(request.GET)
+    table = None
+    if form.is_valid():
+        table = payment_list_raw_table(form.cleaned_data, request.GET.get("after"), request.GET.get("before"))
+    return {"form": form, "table": table}
+
+
+# -----------------------
+# 📊 Weitere Reports
+# -----------------------
+
+def payment_list_with_usage_table():
+    def build():
+        lenders = Lender.objects.with_balance().order_by("last_name", "first_name")
+        return render_to_string("admin/lenders/reports/_payment_list_with_usage_table.html", {"lenders": lenders})
+    return REPORT_PAYMENT_USAGE.get_or_build(build)
+
+
+def apartment_price_list_table(active_only=False):
+    def build():
+        apartments = Apartment.objects.prefetch_related("seasonal_rates").order_by("name")
+        if active_only:
+            apartments = apartments.filter(is_active=True)
+        return render_to_string("admin/lenders/reports/_apartment_price_list_table.html", {"apartments": apartments})
+    return REPORT_APARTMENT_PRICES.get_or_build(build, "active" if active_only else "all")
+
+
+# -----------------------
+# 📈 Auslastung und Umsatz
+# -----------------------
+
+MONTH_NAMES = ["Jan", "Feb", "Mär", "Apr", "Mai", "Jun", "Jul", "Aug", "Sep", "Okt", "Nov", "Dez"]
+
+
+def booking_years():
+    """Erstes und letztes Jahr mit Buchungen, mindestens bis zum laufenden Jahr."""
+    this_year = date.today().year
+    first = Booking.objects.order_by("start_date").values_list("start_date", flat=True).first()
+    last = Booking.objects.order_by("-end_date").values_list("end_date", flat=True).first()
+    return min(first.year if first else this_year, this_year), max(last.year if last else this_year, this_year)
+
+
+def occupancy_report_table(year, first_year, last_year):
+    """Monate des gewählten Jahres pro Apartment und die Jahresübersicht ``first_year``–``last_year``."""
+    def build():
+        apartments = [
+            {
+                "apartment": entry["apartment"],
+                "months": [(MONTH_NAMES[month - 1], values) for y, month, values in entry["months"] if y == year],
+                "total": dict(entry["years"])[year],
+                "years": entry["years"],
+            }
+            for entry in occupancy_stats(first_year, last_year)
+        ]
+        return render_to_string("admin/lenders/reports/_occupancy_table.html", {
+            "apartments": apartments,
+            "year": year,
+            "years": list(range(first_year, last_year + 1)),
+        })
+    return REPORT_OCCUPANCY.get_or_build(build, first_year, last_year, year)
+
+
+def occupancy_report_context(request):
+    first_year, last_year = booking_years()
+    try:
+        year = int(request.GET.get("year", date.today().year))
+    except ValueError:
+        year = date.today().year
+    year = min(max(year, first_year), last_year)
+    return {
+        "year": year,
+        "year_choices": list(range(first_year, last_year + 1)),
+        "table": occupancy_report_table(year, first_year, last_year),
+    }
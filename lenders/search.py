@@ -0,0 +1,230 @@
+# lenders/search.py
+"""
+Suche nach Lendern und Bestätigungen im Admin – über einen Index, mit Rangfolge.
+
+Statt ``icontains`` über mehrere Spalten (kein Index, jede Suche liest die
+ganze Tabelle) gibt es je Datenbank einen Trigramm-Index (Migration 0024):
+
+- SQLite: FTS5-Schattentabellen mit Trigramm-Tokenizer, per Trigger synchron
+  zur Haupttabelle (``lenders_lender_fts``, ``lenders_sentconfirmation_fts``),
+- PostgreSQL: GIN-Indizes mit ``pg_trgm`` auf denselben Spalten.
+
+Beide beantworten Teilwort-Suchen wie ``icontains`` aus dem Index: jedes
+Suchwort muss in einer der Spalten vorkommen. Findet das nichts, werden
+Kandidaten mit gemeinsamen Trigrammen geholt und nach Ähnlichkeit bewertet –
+so findet „Muller“ auch „Müller“ und „Schmdit“ auch „Schmidt“.
+
+Geliefert werden die IDs der besten Treffer, beste zuerst (höchstens
+``LENDERS_SEARCH_LIMIT``; bei sehr allgemeinen Begriffen die neuesten).
+Ohne Index (andere Datenbank, nur Suchwörter unter drei Zeichen) ist das
+Ergebnis ``None`` – der Admin sucht dann wie bisher.
+
+Der System-Check ``lenders.W001`` meldet fehlende SQLite-Trigger: Migrationen,
+die eine Tabelle neu aufbauen (AlterField u. ä.), verwerfen sie – der Index
+würde dann unbemerkt veralten.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .matching import normalize, trigrams
+
+# ``expression``: PostgreSQL-Ausdruck, genau so in den Indizes aus 0024
+SearchIndex = namedtuple("SearchIndex", "table fts columns expression")
+
+INDEXES = {
+    "lender": SearchIndex(
+        "lenders_lender", "lenders_lender_fts", ("first_name", "last_name", "email"),
+        "(first_name || ' ' || last_name || ' ' || email)",
+    ),
+    "sentconfirmation": SearchIndex(
+        "lenders_sentconfirmation", "lenders_sentconfirmation_fts", ("recipient",),
+        "recipient",
+    ),
+}
+
+# Kürzere Wörter (Initialen, „u.“) kann ein Trigramm-Index nicht finden
+MIN_WORD_LENGTH = 3
+# Kandidaten der unscharfen Suche, die genauer bewertet werden
+FUZZY_CANDIDATES = 200
+# Ab so vielen exakten Treffern („example.org“) wird nicht mehr nach Relevanz
+# sortiert, sondern die neuesten zuerst geliefert – die Rangfolge müsste sonst
+# jeden Treffer bewerten, und das wächst mit der Tabelle.
+RANK_MAX_MATCHES = 2000
+
+
+def search_limit():
+    return getattr(settings, "LENDERS_SEARCH_LIMIT", 200)
+
+
+def min_similarity():
+    return getattr(settings, "LENDERS_SEARCH_MIN_SIMILARITY", 0.4)
+
+
+def search_words(term):
+    return [word for word in (term or "").split() if len(word) >= MIN_WORD_LENGTH]
+
+
+# -----------------------
+# 🔎 Einstieg
+# -----------------------
+
+_fts_tables = {}
+
+
+def is_available(name, using=DEFAULT_DB_ALIAS):
+    """True, wenn die Datenbank für ``name`` einen Suchindex hat."""
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        return True
+    if connection.vendor != "sqlite":
+        return False
+    key = (connection.settings_dict["NAME"], name)
+    if key not in _fts_tables:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [INDEXES[name].fts])
+            _fts_tables[key] = cursor.fetchone() is not None
+    return _fts_tables[key]
+
+
+# Trigger pro FTS-Tabelle, siehe Migration 0024
+SQLITE_TRIGGER_EVENTS = ("insert", "delete", "update")
+
+
+@register(Tags.database)
+def check_sqlite_triggers(app_configs=None, databases=None, **kwargs):
+    """Warnt, wenn eine FTS-Tabelle existiert, ihre Trigger aber fehlen."""
+    warnings = []
+    for alias in databases or ():
+        connection = connections[alias]
+        if connection.vendor != "sqlite":
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+            existing = {row[0] for row in cursor.fetchall()}
+        for index in INDEXES.values():
+            if index.fts not in existing:
+                continue  # noch nicht migriert oder SQLite ohne Trigramm-Tokenizer
+            triggers = [f"{index.fts}_{event}" for event in SQLITE_TRIGGER_EVENTS]
+            missing = [trigger for trigger in triggers if trigger not in existing]
+            if missing:
+                warnings.append(Warning(
+                    f"Suchindex {index.fts} ({alias}): Trigger fehlen: {', '.join(missing)}",
+                    hint="Die Trigger aus Migration 0024 erneut anlegen und den Index mit 'rebuild' neu befüllen.",
+                    id="lenders.W001",
+                ))
+    return warnings
+
+
+def search_ids(name, term, limit=None, using=DEFAULT_DB_ALIAS):
+    """IDs der besten Treffer im Index ``name`` („lender“, „sentconfirmation“), beste zuerst.
+
+    Returns:
+        Liste von IDs (evtl. leer) oder ``None``, wenn der Index nicht helfen kann.
+    """
+    words = search_words(term)
+    if not words or not is_available(name, using):
+        return None
+    limit = limit or search_limit()
+    index = INDEXES[name]
+    with connections[using].cursor() as cursor:
+        if connections[using].vendor == "postgresql":
+            return _postgres_exact(cursor, index, words, limit) or _postgres_fuzzy(cursor, index, words, limit)
+        return _sqlite_exact(cursor, index, words, limit) or _sqlite_fuzzy(cursor, index, words, limit)
+
+
+# -----------------------
+# 🪶 SQLite: FTS5 mit Trigramm-Tokenizer
+# -----------------------
+
+def _quote(text):
+    """Als FTS5-Zeichenkette: Sonderzeichen und Operatoren verlieren ihre Bedeutung."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _sqlite_exact(cursor, index, words, limit):
+    # Jedes Wort als Teilzeichenkette irgendwo in der Zeile; Rang nach bm25
+    query = " AND ".join(_quote(word) for word in words)
+    matches = f"SELECT rowid FROM {index.fts} WHERE {index.fts} MATCH %s"
+    cursor.execute(f"SELECT count(*) FROM ({matches} LIMIT %s)", [query, RANK_MAX_MATCHES])
+    order = "rank" if cursor.fetchone()[0] < RANK_MAX_MATCHES else "rowid DESC"
+    cursor.execute(f"{matches} ORDER BY {order} LIMIT %s", [query, limit])
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _sqlite_fuzzy(cursor, index, words, limit):
+    normalized = normalize(" ".join(words)).split()
+    grams = set()
+    for word in [word.casefold() for word in words] + normalized:
+        grams |= {word[i:i + 3] for i in range(len(word) - 2)}
+    if not grams or not normalized:
+        return []
+    columns = ", ".join(index.columns)
+    cursor.execute(
+        f"SELECT rowid, {columns} FROM {index.fts} WHERE {index.fts} MATCH %s ORDER BY rank LIMIT %s",
+        [" OR ".join(_quote(gram) for gram in sorted(grams)), FUZZY_CANDIDATES],
+    )
+    threshold = min_similarity()
+    scored = []
+    for pk, *values in cursor.fetchall():
+        score = similarity(normalized, " ".join(value or "" for value in values))
+        if score >= threshold:
+            scored.append((-score, pk))
+    scored.sort()
+    return [pk for _score, pk in scored[:limit]]
+
+
+def similarity(words, text):
+    """Mittlere beste Trigramm-Ähnlichkeit (Dice) der normalisierten Suchwörter zu den Wörtern von ``text``."""
+    targets = [(token, trigrams(token)) for token in normalize(text).split()]
+    if not words or not targets:
+        return 0.0
+    total = 0.0
+    for word in words:
+        grams = trigrams(word)
+        best = 0.0
+        for token, token_grams in targets:
+            if word in token:
+                best = 1.0
+                break
+            best = max(best, 2 * len(grams & token_grams) / (len(grams) + len(token_grams)))
+        total += best
+    return total / len(words)
+
+
+# -----------------------
+# 🐘 PostgreSQL: pg_trgm
+# -----------------------
+
+def _like(word):
+    return "%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _postgres_exact(cursor, index, words, limit):
+    # ILIKE '%wort%' nutzt den GIN-Trigramm-Index
+    conditions = " AND ".join(f"{index.expression} ILIKE %s" for _word in words)
+    likes = [_like(word) for word in words]
+    matches = f"SELECT id FROM {index.table} WHERE {conditions}"
+    cursor.execute(f"SELECT count(*) FROM ({matches} LIMIT %s) AS matches", [*likes, RANK_MAX_MATCHES])
+    if cursor.fetchone()[0] < RANK_MAX_MATCHES:
+        cursor.execute(
+            f"{matches} ORDER BY word_similarity(%s, {index.expression}) DESC, id LIMIT %s",
+            [*likes, " ".join(words), limit],
+        )
+    else:
+        cursor.execute(f"{matches} ORDER BY id DESC LIMIT %s", [*likes, limit])
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _postgres_fuzzy(cursor, index, words, limit):
+    term = " ".join(words)
+    # Schwelle des Operators <% gilt für die Sitzung
+    cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)", [str(min_similarity())])
+    cursor.execute(
+        f"SELECT id FROM {index.table} WHERE %s <%% {index.expression} "
+        f"ORDER BY word_similarity(%s, {index.expression}) DESC, id LIMIT %s",
+        [term, term, limit],
+    )
+    return [row[0] for row in cursor.fetchall()]
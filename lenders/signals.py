@@ -1,102 +1,149 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from django.utils.translation import activate
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from django.conf import settings
-from .models import Booking, Payment, SentConfirmation
-from .utils.email_helpers import send_html_email
-from .email_utils import send_custom_email
-from lenders.utils.formatting import format_eur
+from .models import Apartment, Booking, ExchangeRate, Lender, LenderLedger, Payment, SeasonalRate
+from . import ledger, matching, occupancy, outbox
+from .cache import bump_version, bump_version_on_commit
 
 import logging
 logger = logging.getLogger(__name__)
 
+
+# -----------------------
+# 📒 Ledger (muss vor den E-Mail-Signalen registriert sein)
+# -----------------------
+
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=Booking)
+def ledger_remember_previous(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ledger.remember_previous(instance)
+
+
 @receiver(post_save, sender=Payment)
-def send_payment_confirmation(sender, instance, created, **kwargs):
-    if not created:
+@receiver(post_save, sender=Booking)
+def ledger_record_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        ledger.schedule_rebuild([instance.lender_id])
         return
+    ledger.record_saved(instance)
 
-    lender = instance.lender
-    language = lender.language or "de"
-    activate(language)
 
-    logger.info(f"📥 Neue Zahlung erkannt: ID {instance.pk}, Betrag {instance.original_amount} {instance.currency}")
+@receiver(pre_delete, sender=Payment)
+@receiver(pre_delete, sender=Booking)
+def ledger_remember_deleted(sender, instance, **kwargs):
+    ledger.remember_deleted(instance)
 
-    context = {
-        "lender": lender,
-        "payment": instance,
-        "balance": format_eur(lender.current_balance()),
-        "formatted_amount": format_eur(instance.original_amount),
-        "language": language
-    }
 
-    subject = {
-        "de": "💰 Zahlungseingang bestätigt",
-        "en": "💰 Payment received"
-    }.get(language, "💰 Payment received")
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Booking)
+def ledger_record_deleted(sender, instance, **kwargs):
+    ledger.record_deleted(instance)
+
+
+@receiver(post_save, sender=Lender)
+def ledger_lender_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        LenderLedger.objects.get_or_create(lender=instance)
+    else:
+        ledger.schedule_rebuild([instance.pk])
 
-    try:
-        send_custom_email(
-            recipient=lender.email,
-            subject=subject,
-            template_name=f"emails/payment_confirmation_{language}.html",
-            context=context,
-            language=language
-        )
-        SentConfirmation.objects.create(
-            lender=lender,
-            payment=instance,
-            language=language,
-            recipient=lender.email
-        )
-        logger.info(f"📤 Zahlungs-E-Mail erfolgreich gesendet an {lender.email}")
-    except Exception as e:
-        logger.warning(f"❌ Fehler beim Senden der Zahlungs-E-Mail an {lender.email}: {e}")
 
+@receiver(post_save, sender=Apartment)
+def ledger_apartment_changed(sender, instance, **kwargs):
+    ledger.schedule_rebuild(ledger.lender_ids_for_apartment(instance.pk))
+
+
+@receiver(post_save, sender=SeasonalRate)
+@receiver(post_delete, sender=SeasonalRate)
+def ledger_seasonal_rate_changed(sender, instance, **kwargs):
+    ledger.schedule_rebuild(ledger.lender_ids_for_apartment(instance.apartment_id))
+
+
+# -----------------------
+# 🗓 Belegungsindex
+# -----------------------
 
 @receiver(post_save, sender=Booking)
-def send_booking_confirmation(sender, instance, created, **kwargs):
-    if not created:
-        logger.debug(f"✋ Buchung {instance.pk} wurde aktualisiert, kein E-Mail-Versand.")
+@receiver(post_delete, sender=Booking)
+def occupancy_booking_changed(sender, **kwargs):
+    # Erst nach dem Commit – sonst baut ein paralleler Request den Index aus den alten Zeilen neu auf
+    transaction.on_commit(occupancy.invalidate)
+
+
+# -----------------------
+# 🔢 Versionszähler (ETags und gecachte Reports, siehe cache.py) – erst nach dem Commit
+# -----------------------
+
+VERSIONED_MODELS = {
+    Booking: "booking",
+    Payment: "payment",
+    Apartment: "apartment",
+    SeasonalRate: "seasonalrate",
+    Lender: "lender",
+    ExchangeRate: "exchangerate",
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_model_version(sender, **kwargs):
+    name = VERSIONED_MODELS.get(sender)
+    if name and sender is not Lender:  # Lender: zusammen mit dem Zuordnungs-Index, siehe unten
+        bump_version_on_commit(name)
+
+
+# -----------------------
+# 🔎 Zuordnungs-Index: Versionszähler und Index-Änderung in einem Commit-Callback
+# -----------------------
+
+@receiver(post_save, sender=Lender)
+def matching_lender_saved(sender, instance, raw=False, **kwargs):
+    def committed():
+        version = bump_version("lender")
+        if not raw:
+            matching.lender_saved(instance, version)
+    transaction.on_commit(committed)
+
+
+@receiver(post_delete, sender=Lender)
+def matching_lender_deleted(sender, instance, **kwargs):
+    lender_id = instance.pk
+    transaction.on_commit(lambda: matching.lender_deleted(lender_id, bump_version("lender")))
+
+
+# -----------------------
+# 📧 Bestätigungs-E-Mails
+# -----------------------
+
+@receiver(post_save, sender=Payment)
+def send_payment_confirmation(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
         return
 
-    lender = instance.lender
-    language = lender.language or "de"
-    activate(language)
+    logger.info(f"📥 Neue Zahlung erkannt: ID {instance.pk}, Betrag {instance.original_amount} {instance.currency}", extra={"lender_id": instance.lender_id})
+
+    try:
+        # Eigener Savepoint: ein Datenbankfehler beim Einreihen darf die Transaktion
+        # der Zahlung nicht abbrechen (PostgreSQL: „current transaction is aborted“)
+        with transaction.atomic():
+            outbox.enqueue_payment_confirmation(instance)
+    except Exception as e:
+        logger.warning(f"❌ Zahlungs-E-Mail an {instance.lender.email} konnte nicht eingereiht werden: {e}")
 
-    logger.info(f"📆 Neue Buchung erkannt: ID {instance.pk}, Zeitraum {instance.start_date}–{instance.end_date}")
 
-    context = {
-        "lender": lender,
-        "booking": instance,
-        "bookings": lender.bookings.order_by("start_date"),
-        "payments": lender.payments.order_by("date"),
-        "balance": format_eur(lender.current_balance()),
-        "formatted_total_cost": format_eur(instance.total_cost()),
-        "language": language,
-    }
+@receiver(post_save, sender=Booking)
+def send_booking_confirmation(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        logger.debug(f"✋ Buchung {instance.pk} wurde aktualisiert, kein E-Mail-Versand.")
+        return
 
-    subject = {
-        "de": "📅 Buchungsbestätigung – Casa Bella Vista",
-        "en": "📅 Booking Confirmation – Casa Bella Vista"
-    }.get(language, "📅 Booking Confirmation")
+    logger.info(f"📆 Neue Buchung erkannt: ID {instance.pk}, Zeitraum {instance.start_date}–{instance.end_date}", extra={"lender_id": instance.lender_id})
 
     try:
-        send_custom_email(
-            recipient=lender.email,
-            subject=subject,
-            template_name=f"emails/booking_confirmation_{language}.html",
-            context=context,
-            language=language
-        )
-        SentConfirmation.objects.create(
-            lender=lender,
-            booking=instance,
-            language=language,
-            recipient=lender.email
-        )
-        logger.info(f"📤 Buchungs-E-Mail erfolgreich gesendet an {lender.email}")
+        # Eigener Savepoint: ein Datenbankfehler beim Einreihen darf die Transaktion
+        # der Buchung nicht abbrechen (PostgreSQL: „current transaction is aborted“)
+        with transaction.atomic():
+            outbox.enqueue_booking_confirmation(instance)
     except Exception as e:
-        logger.warning(f"❌ Fehler beim Senden der Buchungs-E-Mail an {lender.email}: {e}")
+        logger.warning(f"❌ Buchungs-E-Mail an {instance.lender.email} konnte nicht eingereiht werden: {e}")
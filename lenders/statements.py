@@ -0,0 +1,268 @@
+# lenders/statements.py
+"""
+Kontoauszüge der Lender: Zahlungen und Buchungen mit laufendem Saldo.
+
+``statement_lines()`` führt Zahlungen (Gutschrift) und Buchungen (Belastung,
+zum Anreisetag) in einem chronologischen Durchlauf zusammen und rechnet den
+Saldo Zeile für Zeile mit. Die Buchungskosten kommen aus einem ``PriceBook``
+– Saisonpreise werden also einmal geladen, nicht pro Buchung.
+
+Jahresauszüge für alle Lender (``generate_annual_statements``):
+
+1. wenige Sammelabfragen laden Lender, Zahlungen und Buchungen bis Jahresende,
+2. pro Lender entsteht ein reines Daten-Dict (Anfangssaldo, Zeilen, Endsaldo),
+3. Worker-Prozesse rendern daraus HTML – und PDF, falls WeasyPrint oder
+   wkhtmltopdf installiert ist –, ohne selbst die Datenbank anzufassen,
+4. die Dateien landen in einem Verzeichnis oder einer ZIP-Datei.
+"""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import zipfile
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from decimal import Decimal
+
+import django
+from django.db import connections
+from django.template.loader import render_to_string
+from django.utils.translation import override
+
+from .models import Booking, Lender, Payment, round_eur
+from .pricing import get_price_book
+
+ZERO = Decimal("0.00")
+
+# ``amount``: Gutschrift positiv, Belastung negativ; ``balance``: Saldo nach der Zeile
+StatementLine = namedtuple("StatementLine", "date kind amount balance item")
+
+
+# -----------------------
+# 🧮 Laufender Saldo
+# -----------------------
+
+def statement_lines(payments, bookings, price_book=None, opening_balance=ZERO):
+    """Zahlungen und Buchungen als eine chronologische Liste mit laufendem Saldo.
+
+    Zahlungen sortieren nach Datum, Buchungen nach Anreise; am selben Tag
+    kommt die Zahlung zuerst. Buchungen brauchen ``apartment`` und ``lender``
+    (select_related), sonst kostet jede Zeile Abfragen.
+    """
+    book = price_book or get_price_book()
+    entries = [((payment.date, 0, payment.pk or 0), "payment", payment.amount_eur, payment) for payment in payments]
+    entries += [
+        ((booking.start_date, 1, booking.pk or 0), "booking", -book.booking_cost(booking), booking)
+        for booking in bookings
+    ]
+    entries.sort(key=lambda entry: entry[0])
+
+    lines = []
+    balance = opening_balance
+    for (day, _order, _pk), kind, amount, item in entries:
+        balance = round_eur(balance + amount)
+        lines.append(StatementLine(day, kind, amount, balance, item))
+    return lines
+
+
+def lender_statement(lender, price_book=None):
+    """Alle Zahlungen und Buchungen eines Lenders mit laufendem Saldo – zwei Abfragen.
+
+    Returns:
+        ``{"lines", "balance", "total_payments", "total_bookings"}``; ``balance``
+        entspricht ``lender.current_balance()``.
+    """
+    payments = list(lender.payments.order_by())
+    bookings = list(lender.bookings.select_related("apartment").order_by())
+    for booking in bookings:
+        booking.lender = lender  # Rabatt für die Kosten, ohne weitere Abfrage
+    lines = statement_lines(payments, bookings, price_book)
+    return {
+        "lines": lines,
+        "balance": lines[-1].balance if lines else ZERO,
+        "total_payments": sum((line.amount for line in lines if line.kind == "payment"), ZERO),
+        "total_bookings": -sum((line.amount for line in lines if line.kind == "booking"), ZERO),
+    }
+
+
+# -----------------------
+# 📄 Jahresauszüge: Daten
+# -----------------------
+
+def _line_data(line):
+    """Nur Werte, die sich an Worker-Prozesse übergeben lassen (kein Model-Objekt)."""
+    item = line.item
+    data = {"date": line.date, "kind": line.kind, "amount": line.amount, "balance": line.balance}
+    if line.kind == "payment":
+        data.update(
+            original_amount=item.original_amount,
+            currency=item.currency,
+            exchange_rate=item.exchange_rate,
+            is_fixed=item.is_fixed,
+        )
+    else:
+        data.update(
+            apartment=item.apartment.name,
+            start_date=item.start_date,
+            end_date=item.end_date,
+            nights=item.nights(),
+        )
+    return data
+
+
+def load_annual_statements(year, lender_ids=None):
+    """Daten der Jahresauszüge aller (bzw. der angegebenen) Lender.
+
+    Drei Abfragen für Lender, Zahlungen und Buchungen – unabhängig von der Zahl
+    der Lender; dazu das gecachte Preisbuch. Alles vor dem 1.1. fließt in den
+    Anfangssaldo, Buchungen mit Anreise nach dem Jahresende bleiben außen vor.
+    """
+    year_start, year_end = date(year, 1, 1), date(year, 12, 31)
+    lenders = Lender.objects.order_by("last_name", "first_name", "pk")
+    payments = Payment.objects.filter(date__lte=year_end).order_by()
+    bookings = Booking.objects.filter(start_date__lte=year_end).select_related("apartment", "lender").order_by()
+    if lender_ids is not None:
+        lenders = lenders.filter(pk__in=lender_ids)
+        payments = payments.filter(lender_id__in=lender_ids)
+        bookings = bookings.filter(lender_id__in=lender_ids)
+
+    payments_by_lender = defaultdict(list)
+    for payment in payments.iterator(chunk_size=2000):
+        payments_by_lender[payment.lender_id].append(payment)
+    bookings_by_lender = defaultdict(list)
+    for booking in bookings.iterator(chunk_size=2000):
+        bookings_by_lender[booking.lender_id].append(booking)
+
+    book = get_price_book()
+    statements = []
+    for lender in lenders:
+        lines = statement_lines(payments_by_lender.pop(lender.pk, ()), bookings_by_lender.pop(lender.pk, ()), book)
+        earlier = [line for line in lines if line.date < year_start]
+        current = [line for line in lines if line.date >= year_start]
+        opening = earlier[-1].balance if earlier else ZERO
+        statements.append({
+            "lender": {
+                "id": lender.pk,
+                "first_name": lender.first_name,
+                "last_name": lender.last_name,
+                "address": lender.address,
+                "postal_code": lender.postal_code,
+                "city": lender.city,
+                "country": lender.country,
+                "email": lender.email,
+            },
+            "language": lender.language or "de",
+            "year": year,
+            "opening_balance": opening,
+            "closing_balance": current[-1].balance if current else opening,
+            "total_payments": sum((line.amount for line in current if line.kind == "payment"), ZERO),
+            "total_bookings": -sum((line.amount for line in current if line.kind == "booking"), ZERO),
+            "lines": [_line_data(line) for line in current],
+        })
+    return statements
+
+
+# -----------------------
+# 🖨 Rendern (auch in Worker-Prozessen)
+# -----------------------
+
+def pdf_renderer():
+    """„weasyprint“, „wkhtmltopdf“ oder ``None`` – je nachdem, was lokal installiert ist."""
+    try:
+        import weasyprint  # noqa: F401
+        return "weasyprint"
+    except ImportError:
+        pass
+    if shutil.which("wkhtmltopdf"):
+        return "wkhtmltopdf"
+    return None
+
+
+def _html_to_pdf(html, renderer):
+    if renderer == "weasyprint":
+        import weasyprint
+        return weasyprint.HTML(string=html).write_pdf()
+    with tempfile.TemporaryDirectory() as tmp:
+        source, target = os.path.join(tmp, "statement.html"), os.path.join(tmp, "statement.pdf")
+        with open(source, "w", encoding="utf-8") as fh:
+            fh.write(html)
+        subprocess.run(["wkhtmltopdf", "--quiet", "--encoding", "utf-8", source, target], check=True)
+        with open(target, "rb") as fh:
+            return fh.read()
+
+
+def statement_filename(statement):
+    lender = statement["lender"]
+    name = re.sub(r"[^A-Za-z0-9]+", "-", f"{lender['last_name']} {lender['first_name']}").strip("-") or "lender"
+    return f"{statement['year']}_{name}_{lender['id']}"
+
+
+def render_statement(statement, pdf=None):
+    """Rendert einen Auszug. Returns: (dateiname_ohne_endung, html_bytes, pdf_bytes oder None)."""
+    language = statement["language"] if statement["language"] in ("de", "en") else "en"
+    with override(language):
+        html = render_to_string(f"statements/annual_statement_{language}.html", statement)
+    return statement_filename(statement), html.encode("utf-8"), _html_to_pdf(html, pdf) if pdf else None
+
+
+def _init_worker():
+    # Mit „spawn“ startet der Worker ohne geladene Django-Apps; bei „fork“ ist das ein No-op.
+    django.setup()
+
+
+def _render_all(statements, workers, pdf):
+    if workers <= 1:
+        for statement in statements:
+            yield render_statement(statement, pdf)
+        return
+    # Geerbte DB-Verbindungen dürfen nicht in mehreren Prozessen weiterbenutzt werden
+    connections.close_all()
+    chunksize = max(1, min(20, len(statements) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        yield from executor.map(render_statement, statements, [pdf] * len(statements), chunksize=chunksize)
+
+
+def generate_annual_statements(year, output, lender_ids=None, workers=None, pdf=True, progress=None):
+    """Erzeugt die Jahresauszüge und schreibt sie nach ``output`` (Verzeichnis oder ``*.zip``).
+
+    Args:
+        workers: Anzahl Render-Prozesse (Standard: Anzahl CPUs; 1 = ohne Prozesspool).
+        pdf: zusätzlich PDF erzeugen, falls ein Renderer installiert ist.
+        progress: ``callable(fertig, gesamt)``, wird nach jedem Auszug aufgerufen.
+
+    Returns:
+        ``{"statements": n, "files": n, "pdf": renderer oder None, "output": output}``
+    """
+    statements = load_annual_statements(year, lender_ids)
+    renderer = pdf_renderer() if pdf else None
+    workers = workers or os.cpu_count() or 1
+    total = len(statements)
+
+    to_zip = output.lower().endswith(".zip")
+    if to_zip:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        archive = zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED)
+    else:
+        os.makedirs(output, exist_ok=True)
+        archive = None
+
+    files = 0
+    try:
+        for done, (name, html, pdf_bytes) in enumerate(_render_all(statements, workers, renderer), start=1):
+            for extension, content in (("html", html), ("pdf", pdf_bytes)):
+                if content is None:
+                    continue
+                if archive is not None:
+                    archive.writestr(f"{name}.{extension}", content)
+                else:
+                    with open(os.path.join(output, f"{name}.{extension}"), "wb") as fh:
+                        fh.write(content)
+                files += 1
+            if progress:
+                progress(done, total)
+    finally:
+        if archive is not None:
+            archive.close()
+    return {"statements": total, "files": files, "pdf": renderer, "output": output}
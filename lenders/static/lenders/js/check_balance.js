@@ -1,50 +1,87 @@
-function checkBalance() {
-    const lender = document.querySelector("#id_lender")?.value;
-    const apartment = document.querySelector("#id_apartment")?.value;
-    const start = document.querySelector("#id_start_date")?.value;
-    const end = document.querySelector("#id_end_date")?.value;
+// Buchungsformular: Preis, Guthaben, Belegung und Villa-Regel live prüfen.
+// Änderungen werden gesammelt (Debounce); eine noch laufende Anfrage wird
+// abgebrochen, sobald eine neuere losgeht – es zählt immer nur die letzte.
 
-    console.log("🔁 Prüfe Buchungsbedingungen ...", lender, apartment, start, end);
+const QUOTE_URL = "/lenders/quotes/";
+const DEBOUNCE_MS = 300;
+const FIELDS = ["#id_lender", "#id_apartment", "#id_start_date", "#id_end_date", "#id_custom_total_price"];
 
-    const warningDiv = document.querySelector("#saldo-warning");
-    if (!warningDiv) {
-        console.warn("⚠️ Kein #saldo-warning Element gefunden!");
+let debounceTimer = null;
+let controller = null;
+
+function fieldValue(selector) {
+    return document.querySelector(selector)?.value || "";
+}
+
+// Beim Bearbeiten: /admin/lenders/booking/<id>/change/
+function currentBookingId() {
+    const match = window.location.pathname.match(/\/booking\/(\d+)\/change\/?$/);
+    return match ? Number(match[1]) : null;
+}
+
+// Admin-Datumsfelder sind TT.MM.JJJJ, die API erwartet JJJJ-MM-TT
+function isoDate(value) {
+    const match = value.trim().match(/^(\d{1,2})\.(\d{1,2})\.(\d{4})$/);
+    if (!match) return value.trim();
+    return `${match[3]}-${match[2].padStart(2, "0")}-${match[1].padStart(2, "0")}`;
+}
+
+function showWarnings(warningDiv, warnings) {
+    if (!warnings.length) {
+        warningDiv.innerHTML = "";
         return;
     }
+    const html = warnings.map(w => `<p style="margin: 0 0 5px;">${w}</p>`).join("");
+    warningDiv.innerHTML = `
+        <div style="border: 2px solid red; background-color: #ffe5e5; color: black; padding: 10px; margin-bottom: 10px;">
+            ${html}
+        </div>`;
+}
 
+function checkBalance() {
+    const warningDiv = document.querySelector("#saldo-warning");
+    if (!warningDiv) return;
+
+    const lender = fieldValue("#id_lender");
+    const apartment = fieldValue("#id_apartment");
+    const start = fieldValue("#id_start_date");
+    const end = fieldValue("#id_end_date");
+
+    if (controller) controller.abort();
     if (!lender || !apartment || !start || !end) {
+        controller = null;
         warningDiv.innerHTML = "";
         return;
     }
+    controller = new AbortController();
+    const signal = controller.signal;
 
-    fetch("/lenders/check_booking_warnings/", {
+    fetch(QUOTE_URL, {
         method: "POST",
+        signal,
         headers: {
-            "Content-Type": "application/x-www-form-urlencoded",
-            "X-CSRFToken": document.querySelector('[name=csrfmiddlewaretoken]')?.value || "",
+            "Content-Type": "application/json",
+            "X-CSRFToken": document.querySelector("[name=csrfmiddlewaretoken]")?.value || "",
         },
-        body: new URLSearchParams({
+        body: JSON.stringify({
             lender,
-            apartment,
-            start_date: start,
-            end_date: end
+            booking: currentBookingId(),
+            candidates: [{
+                apartment,
+                start_date: isoDate(start),
+                end_date: isoDate(end),
+                custom_total_price: fieldValue("#id_custom_total_price"),
+            }],
         }),
     })
     .then((res) => res.json())
     .then((data) => {
-        console.log("📥 Antwort vom Server:", data);
-
-        if (data.status === "ok" && Array.isArray(data.warnings) && data.warnings.length > 0) {
-            const html = data.warnings.map(w => `<p style="margin: 0 0 5px;">${w}</p>`).join("");
-            warningDiv.innerHTML = `
-                <div style="border: 2px solid red; background-color: #ffe5e5; color: black; padding: 10px; margin-bottom: 10px;">
-                    ${html}
-                </div>`;
-        } else {
-            warningDiv.innerHTML = "";
-        }
+        const quote = data.status === "ok" ? data.quotes[0] : null;
+        // Ungültige Eingaben (z. B. halb getipptes Datum) nicht als Fehler melden
+        showWarnings(warningDiv, quote?.warnings || []);
     })
     .catch((err) => {
+        if (err.name === "AbortError") return;  // durch neuere Anfrage ersetzt
         console.error("❌ Fehler bei der Guthabenprüfung:", err);
         warningDiv.innerHTML = `
             <div style="border: 2px solid orange; background-color: #fff3cd; color: black; padding: 10px;">
@@ -53,28 +90,30 @@ function checkBalance() {
     });
 }
 
+function scheduleCheck() {
+    clearTimeout(debounceTimer);
+    debounceTimer = setTimeout(checkBalance, DEBOUNCE_MS);
+}
 
-document.addEventListener("DOMContentLoaded", () => {
-    const fields = ["#id_lender", "#id_apartment", "#id_start_date", "#id_end_date"];
-    let lastValues = {};
 
-    function monitorFields() {
-        let changed = false;
-        fields.forEach((selector) => {
-            const el = document.querySelector(selector);
-            if (el) {
-                const val = el.value;
-                if (lastValues[selector] !== val) {
-                    lastValues[selector] = val;
-                    changed = true;
-                }
-            }
-        });
+document.addEventListener("DOMContentLoaded", () => {
+    if (!document.querySelector("#saldo-warning")) return;
 
-        if (changed) {
-            checkBalance();
+    let lastValues = FIELDS.map(fieldValue).join("|");
+    function changed() {
+        const values = FIELDS.map(fieldValue).join("|");
+        if (values !== lastValues) {
+            lastValues = values;
+            scheduleCheck();
         }
     }
 
-    setInterval(monitorFields, 1000);
+    FIELDS.forEach((selector) => {
+        const el = document.querySelector(selector);
+        el?.addEventListener("input", changed);
+        el?.addEventListener("change", changed);
+    });
+    // Kalender- und Autocomplete-Widgets setzen Werte ohne Event
+    setInterval(changed, 1000);
+    checkBalance();
 });
@@ -1,3 +1,747 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import traceback
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Sum
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from . import availability, bank_import, benchmark, matching, occupancy, outbox, quotes, search
+from .cache import bump_version
+from .email_utils import send_bulk_email
+from .admin import custom_admin_site
+from .demo_data import generate
+from .ledger import verify_ledgers
+from .models import (
+    VILLA_NAME, Apartment, Booking, EmailOutbox, ExchangeRate, Lender, LenderLedger, Payment, SeasonalRate,
+    SentConfirmation,
+)
+
+
+class DemoDataTests(TestCase):
+    def test_generate_creates_consistent_data(self):
+        counts = generate(lenders=20, apartments=3, seed=7)
+
+        self.assertEqual(counts["lenders"], 20)
+        self.assertEqual(counts["apartments"], 4)  # inkl. Villa
+        self.assertEqual(Booking.objects.count(), 40)
+        self.assertEqual(Payment.objects.count(), 80)
+        self.assertTrue(Payment.objects.filter(currency="USD").exists())
+        self.assertEqual(LenderLedger.objects.count(), 20)
+        self.assertEqual(verify_ledgers(Lender.objects.all()), [])
+
+    def test_generated_bookings_do_not_overlap(self):
+        generate(lenders=30, apartments=2, seed=3)
+
+        previous = {}
+        for booking in Booking.objects.order_by("apartment_id", "start_date"):
+            last_end = previous.get(booking.apartment_id)
+            if last_end is not None:
+                self.assertGreaterEqual(booking.start_date, last_end)
+            previous[booking.apartment_id] = booking.end_date
+
+    def test_same_seed_gives_same_data(self):
+        generate(lenders=5, apartments=2, seed=11)
+        first = list(Booking.objects.order_by("pk").values_list("start_date", "end_date"))
+        Lender.objects.all().delete()
+        Booking.objects.all().delete()
+        generate(lenders=5, apartments=2, seed=11)
+        second = list(Booking.objects.order_by("pk").values_list("start_date", "end_date"))
+        self.assertEqual(first, second)
+
+    def test_command_refuses_database_with_lenders(self):
+        generate(lenders=1, apartments=1, seed=1)
+        with self.assertRaises(CommandError):
+            call_command("generate_demo_data", "--lenders", "1", stdout=open(os.devnull, "w"))
+
+
+@override_settings(LENDERS_METRICS_ENABLED=False)
+class BenchmarkSmokeTests(TransactionTestCase):
+    def test_run_measures_all_scenarios(self):
+        report = benchmark.run(scales=[10], repeat=1, seed=1)
+
+        self.assertEqual(len(report["scales"]), 1)
+        results = report["scales"][0]["results"]
+        for name in ("current_balance", "total_cost", "report_with_usage_cold", "booking_events_cold",
+                     "check_booking_warnings", "changelist_booking"):
+            self.assertIn(name, results)
+            self.assertGreaterEqual(results[name]["median_ms"], 0)
+            self.assertIsNotNone(results[name]["queries"])
+        # Ergebnis muss sich als JSON speichern und vergleichen lassen
+        with tempfile.NamedTemporaryFile("w+", suffix=".json") as fh:
+            json.dump(report, fh)
+            fh.seek(0)
+            previous = json.load(fh)
+        rows = benchmark.compare(previous, report)
+        self.assertTrue(rows)
+        self.assertTrue(all(factor == 1 for *_, factor in rows))
+
+
+class QueryRecorder:
+    """Zeichnet jede SQL-Abfrage mit der Aufrufstelle auf, die sie ausgelöst hat."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, self.call_site()))
+        return execute(sql, params, many, context)
+
+    @staticmethod
+    def call_site():
+        # Innerster Frame aus dem Projekt oder aus Django außerhalb von django/db,
+        # also z. B. die Admin-Methode, das Model-``__str__`` oder ein Template-Tag.
+        for frame in reversed(traceback.extract_stack()[:-2]):
+            filename = frame.filename
+            in_project = filename.startswith(str(settings.BASE_DIR)) and "site-packages" not in filename
+            in_django = f"{os.sep}django{os.sep}" in filename and f"{os.sep}db{os.sep}" not in filename
+            if in_project or in_django:
+                short = os.path.relpath(filename, settings.BASE_DIR) if in_project else filename.split("site-packages" + os.sep)[-1]
+                return f"{short}:{frame.lineno} in {frame.name}"
+        return "?"
+
+    def report(self):
+        by_site = defaultdict(list)
+        for sql, site in self.queries:
+            by_site[site].append(sql)
+        lines = []
+        for site, statements in sorted(by_site.items(), key=lambda item: -len(item[1])):
+            lines.append(f"  {len(statements):>4} × {site}")
+            lines.append(f"         {statements[0][:160]}")
+        return "\n".join(lines)
+
+
+@override_settings(LENDERS_METRICS_ENABLED=False)
+class AdminQueryBudgetTests(TestCase):
+    """Jede Changelist und jedes Änderungsformular des Custom-Admins mit fester Abfragezahl.
+
+    Gemessen wird zweimal – mit wenigen und mit deutlich mehr Daten. Die Zahl
+    der Abfragen pro Seite darf dabei nicht wachsen und bleibt unter dem Budget.
+    """
+    MAX_QUERIES = 15
+
+    def setUp(self):
+        self.user = User.objects.create_superuser("budget", "budget@example.com", "pw")
+        self.client.force_login(self.user)
+
+    def populate(self, lenders, seed):
+        generate(lenders=lenders, apartments=2, seed=seed)
+        confirmations = []
+        messages = []
+        for lender in Lender.objects.filter(sentconfirmation__isnull=True).prefetch_related("payments", "bookings"):
+            payment = next(iter(lender.payments.all()), None)
+            booking = next(iter(lender.bookings.all()), None)
+            confirmations += [
+                SentConfirmation(lender=lender, payment=payment, language="de", recipient=lender.email),
+                SentConfirmation(lender=lender, booking=booking, language="de", recipient=lender.email),
+            ]
+            messages.append(outbox.build(lender.email, "Test", "emails/custom_email.html", lender=lender, booking=booking))
+        SentConfirmation.objects.bulk_create(confirmations)
+        outbox.enqueue_many(messages)
+        ExchangeRate.objects.bulk_create(
+            [ExchangeRate(currency="USD", date=date(2020, 1, 1 + i % 28), rate=Decimal("1.1")) for i in range(lenders)],
+            ignore_conflicts=True,
+        )
+
+    def admin_pages(self):
+        for model in custom_admin_site._registry:
+            info = (model._meta.app_label, model._meta.model_name)
+            yield f"{info[1]} changelist", reverse(f"{custom_admin_site.name}:%s_%s_changelist" % info)
+            yield f"{info[1]} add", reverse(f"{custom_admin_site.name}:%s_%s_add" % info)
+            obj = model._default_manager.order_by("-pk").first()
+            if obj is not None:
+                yield f"{info[1]} change", reverse(f"{custom_admin_site.name}:%s_%s_change" % info, args=[obj.pk])
+
+    def measure(self):
+        counts, reports = {}, {}
+        for name, url in self.admin_pages():
+            self.client.get(url)  # Caches (Versionen, Preisbuch …) aufwärmen
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, f"{name}: {url}")
+            counts[name] = len(recorder.queries)
+            reports[name] = recorder.report()
+        return counts, reports
+
+    def test_admin_pages_stay_within_query_budget(self):
+        self.populate(lenders=3, seed=1)
+        small, _ = self.measure()
+        self.populate(lenders=30, seed=2)
+        large, reports = self.measure()
+
+        for name, count in large.items():
+            with self.subTest(page=name):
+                message = f"{name}: {small.get(name)} → {count} Abfragen\n{reports[name]}"
+                self.assertLessEqual(count, self.MAX_QUERIES, message)
+                if name in small:
+                    self.assertLessEqual(count, small[name], message)
+
+
+class SeasonOverlapTests(TransactionTestCase):
+    """Überschneidende Saisons: SQL (``with_cost``) und Python (``total_cost``) rechnen gleich."""
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([("lenders", target)])
+
+    def setUp(self):
+        self.apartment = Apartment.objects.create(name="Casa Test", price_per_night=Decimal("100.00"))
+        self.lender = Lender.objects.create(
+            first_name="Eva", last_name="Saison", email="eva@example.org", address="", postal_code="",
+            country="", discount_percent=Decimal("10"),
+        )
+        Payment.objects.create(lender=self.lender, date=date(2024, 1, 1), original_amount=Decimal("5000"), currency="EUR")
+
+    def test_existing_overlaps_are_split_like_rate_index(self):
+        # Vor 0025 ließen sich überschneidende Saisons noch speichern
+        self.migrate("0024_search_indexes")
+        try:
+            SeasonalRate.objects.bulk_create([
+                SeasonalRate(apartment=self.apartment, start_date=date(2024, 7, 1), end_date=date(2024, 7, 10),
+                             percentage_adjustment=Decimal("20")),
+                SeasonalRate(apartment=self.apartment, start_date=date(2024, 7, 5), end_date=date(2024, 7, 20),
+                             percentage_adjustment=Decimal("50")),
+                SeasonalRate(apartment=self.apartment, start_date=date(2024, 7, 8), end_date=date(2024, 7, 9),
+                             percentage_adjustment=Decimal("-30")),
+            ])
+            booking = Booking.objects.create(
+                lender=self.lender, apartment=self.apartment, start_date=date(2024, 7, 3), end_date=date(2024, 7, 14),
+            )
+            expected = booking.total_cost()
+        finally:
+            self.migrate("0025_seasonalrate_no_overlap")
+
+        self.assertEqual(SeasonalRate.objects.count(), 2)  # die dritte lag komplett unter der ersten
+        self.assertEqual(Booking.objects.with_cost().get(pk=booking.pk).cost, expected)
+        self.assertEqual(Booking.objects.get(pk=booking.pk).total_cost(), expected)
+        lender = Lender.objects.with_balance().get(pk=self.lender.pk)
+        self.assertEqual(lender.balance, lender.current_balance())
+
+    def test_database_rejects_overlapping_seasons(self):
+        SeasonalRate.objects.create(apartment=self.apartment, start_date=date(2024, 7, 1), end_date=date(2024, 7, 10),
+                                    percentage_adjustment=Decimal("20"))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SeasonalRate.objects.bulk_create([
+                SeasonalRate(apartment=self.apartment, start_date=date(2024, 7, 10), end_date=date(2024, 7, 12),
+                             percentage_adjustment=Decimal("5")),
+            ])
+        with self.assertRaises(ValidationError) as raised:
+            SeasonalRate.objects.create(apartment=self.apartment, start_date=date(2024, 6, 25),
+                                        end_date=date(2024, 7, 1), percentage_adjustment=Decimal("5"))
+        self.assertEqual(raised.exception.code, "season_overlap")
+        # direkt anschließend ist erlaubt
+        SeasonalRate.objects.create(apartment=self.apartment, start_date=date(2024, 7, 11), end_date=date(2024, 7, 12),
+                                    percentage_adjustment=Decimal("5"))
+
+
+class PaymentExchangeRateTests(TestCase):
+    def setUp(self):
+        self.lender = Lender.objects.create(
+            first_name="Sam", last_name="Dollar", email="sam@example.org", address="", postal_code="", country="",
+        )
+        ExchangeRate.objects.create(currency="USD", date=date(2024, 3, 1), rate=Decimal("1.083800"))
+
+    def test_missing_rate_is_taken_from_table(self):
+        payment = Payment.objects.create(
+            lender=self.lender, date=date(2024, 3, 1), original_amount=Decimal("100"), currency="USD",
+        )
+        self.assertEqual(payment.exchange_rate, Decimal("0.9227"))
+        self.assertEqual(payment.amount_eur, Decimal("92.27"))
+
+    def test_stored_rate_is_never_replaced(self):
+        legacy = Payment.objects.create(
+            lender=self.lender, date=date(2024, 3, 1), original_amount=Decimal("100"), currency="USD",
+            exchange_rate=Decimal("1.0"),
+        )
+        balance = self.lender.current_balance()
+        legacy.save()
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.exchange_rate, Decimal("1.0"))
+        self.assertEqual(legacy.amount_eur, Decimal("100.00"))
+        self.assertEqual(self.lender.current_balance(), balance)
+
+    def test_usd_without_any_rate_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            Payment.objects.create(
+                lender=self.lender, date=date(2024, 2, 1), original_amount=Decimal("100"), currency="USD",
+            )
+
+
+class BankImportTests(TestCase):
+    CSV = (
+        "Buchungstag;Betrag;Währung;Name Zahlungsbeteiligter;Verwendungszweck;Bankreferenz\n"
+        "02.01.2024;1.234,56;EUR;Jürgen Müller;Darlehen Müller;REF-1\n"
+        "03.01.2024;-50,00;EUR;Jürgen Müller;Rückbuchung;REF-2\n"
+        "04.01.2024;200,00;EUR;Jürgen Müller;Darlehen Müller;REF-3\n"
+    )
+
+    def setUp(self):
+        Lender.objects.create(
+            first_name="Jürgen", last_name="Müller", email="juergen@example.org", address="", postal_code="", country="",
+        )
+
+    def plan(self, data):
+        return bank_import.plan(bank_import.parse_csv(io.BytesIO(data)), index=matching.LenderIndex.build())
+
+    def test_csv_encodings(self):
+        for encoding in ("utf-8", "utf-8-sig", "cp1252"):
+            with self.subTest(encoding=encoding):
+                rows = list(bank_import.parse_csv(io.BytesIO(self.CSV.encode(encoding))))
+                self.assertEqual([row.reference for row in rows], ["REF-1", "REF-3"])
+                self.assertEqual(rows[0].name, "Jürgen Müller")
+                self.assertEqual(rows[0].amount, Decimal("1234.56"))
+        with self.assertRaises(bank_import.ImportFormatError):
+            list(bank_import.parse_csv(io.BytesIO(b"Datum;Betrag\n02.01.2024;\x81\x8d\n")))
+
+    def test_csv_is_read_as_a_stream(self):
+        def upload():
+            yield from self.CSV.encode("cp1252").splitlines(keepends=True)[:2]
+            raise AssertionError("Datei wurde weiter gelesen als nötig")
+
+        self.assertEqual(next(bank_import.parse_csv(upload())).reference, "REF-1")
+
+    CAMT = """<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>
+<Ntry><Amt Ccy="EUR">150.00</Amt><CdtDbtInd>CRDT</CdtDbtInd><Sts>BOOK</Sts>
+<BookgDt><Dt>2024-01-05</Dt></BookgDt><AcctSvcrRef>CAMT-1</AcctSvcrRef></Ntry>
+<Ntry>{entry}<CdtDbtInd>CRDT</CdtDbtInd><Sts>BOOK</Sts><AcctSvcrRef>CAMT-2</AcctSvcrRef></Ntry>
+</Stmt></BkToCstmrStmt></Document>"""
+    CAMT_VALID = '<Amt Ccy="EUR">20.00</Amt><BookgDt><Dt>2024-01-06</Dt></BookgDt>'
+
+    def camt(self, entry):
+        return list(bank_import.parse_camt053(io.BytesIO(self.CAMT.format(entry=entry).encode())))
+
+    def test_camt(self):
+        self.assertEqual([(tx.reference, tx.amount) for tx in self.camt(self.CAMT_VALID)],
+                         [("CAMT-1", Decimal("150.00")), ("CAMT-2", Decimal("20.00"))])
+
+    def test_camt_invalid_entries_are_format_errors(self):
+        for case, entry in [
+            ("ohne Betrag", "<BookgDt><Dt>2024-01-06</Dt></BookgDt>"),
+            ("leerer Betrag", '<Amt Ccy="EUR"> </Amt><BookgDt><Dt>2024-01-06</Dt></BookgDt>'),
+            ("Betrag keine Zahl", '<Amt Ccy="EUR">zwanzig</Amt><BookgDt><Dt>2024-01-06</Dt></BookgDt>'),
+            ("ohne Datum", '<Amt Ccy="EUR">20.00</Amt>'),
+            ("Datum ungültig", '<Amt Ccy="EUR">20.00</Amt><BookgDt><Dt>6.1.</Dt></BookgDt>'),
+        ]:
+            with self.subTest(case), self.assertRaises(bank_import.ImportFormatError) as raised:
+                self.camt(entry)
+            self.assertTrue(str(raised.exception).startswith("Eintrag 2:"), raised.exception)
+
+    def test_reimport_is_skipped(self):
+        data = self.CSV.encode("cp1252")
+        first = self.plan(data)
+        self.assertEqual(bank_import.execute(first["payments"], notify="none")["created"], 2)
+        second = self.plan(data)
+        self.assertEqual(second["payments"], [])
+        self.assertEqual([reason for _tx, reason in second["skipped"]], ["Bereits importiert"] * 2)
+
+    def test_parallel_import_is_deduplicated_by_database(self):
+        data = self.CSV.encode("utf-8")
+        first, second = self.plan(data), self.plan(data)  # beide geplant, bevor einer speichert
+        bank_import.execute(first["payments"], notify="none")
+        result = bank_import.execute(second["payments"], notify="none")
+        self.assertEqual((result["created"], result["payments"]), (0, []))
+        self.assertEqual(Payment.objects.count(), 2)
+        self.assertEqual(
+            LenderLedger.objects.get(lender__last_name="Müller").balance,
+            Payment.objects.aggregate(total=Sum("amount_eur"))["total"],
+        )
+
+    def test_bank_reference_unique_unless_empty(self):
+        lender = Lender.objects.get()
+        for _ in range(2):
+            Payment.objects.create(lender=lender, date=date(2024, 1, 1), original_amount=Decimal("10"), currency="EUR")
+        Payment.objects.create(lender=lender, date=date(2024, 1, 1), original_amount=Decimal("10"), currency="EUR",
+                               bank_reference="REF-9")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Payment.objects.create(lender=lender, date=date(2024, 1, 2), original_amount=Decimal("10"), currency="EUR",
+                                   bank_reference="REF-9")
+
+
+class ConfirmationEnqueueTests(TestCase):
+    def test_unknown_language_uses_german_subject_and_template(self):
+        apartment = Apartment.objects.create(name="Casa Sprache", price_per_night=Decimal("80.00"))
+        for month, language in enumerate(("fr", "", "en"), start=2):
+            expected = "en" if language == "en" else "de"
+            with self.subTest(language=language):
+                lender = Lender.objects.create(
+                    first_name="Lina", last_name="Sprache", email=f"lina.{language or 'leer'}@example.org",
+                    address="", postal_code="", country="", language=language,
+                )
+                payment = Payment.objects.create(lender=lender, date=date(2024, 1, 1), original_amount=Decimal("900"),
+                                                 currency="EUR")
+                booking = Booking.objects.create(lender=lender, apartment=apartment,
+                                                 start_date=date(2024, month, 1), end_date=date(2024, month, 3))
+                digest = outbox.payment_digest(lender, [payment], Decimal("740.00"))
+                for message, subjects in [
+                    (EmailOutbox.objects.get(payment=payment), outbox.PAYMENT_SUBJECTS),
+                    (EmailOutbox.objects.get(booking=booking), outbox.BOOKING_SUBJECTS),
+                    (digest, outbox.PAYMENT_DIGEST_SUBJECTS),
+                ]:
+                    self.assertEqual((message.language, message.subject), (expected, subjects[expected]))
+                    self.assertIn(f'<html lang="{expected}">', message.body_html)  # Template derselben Sprache
+
+    def test_bulk_email_unknown_language_uses_german(self):
+        result = send_bulk_email(
+            [("x@example.org", "fr", {"message": "Hallo"}), ("y@example.org", "", {"message": "Hallo"})],
+            subject={"de": "Betreff", "en": "Subject"},
+            template_name="emails/broadcast_{language}.html",
+        )
+        self.assertEqual(result["sent"], 2)
+        self.assertEqual([message.subject for message in mail.outbox], ["Betreff", "Betreff"])
+
+    def test_failed_enqueue_keeps_payment_transaction_usable(self):
+        lender = Lender.objects.create(
+            first_name="Ole", last_name="Outbox", email="ole@example.org", address="", postal_code="", country="",
+        )
+
+        def broken_enqueue(payment):
+            # Datenbankfehler beim Einreihen (z. B. Constraint in der Outbox)
+            for _ in range(2):
+                ExchangeRate.objects.create(currency="USD", date=date(2024, 1, 1), rate=Decimal("1.1"))
+
+        with mock.patch.object(outbox, "enqueue_payment_confirmation", broken_enqueue), transaction.atomic():
+            payment = Payment.objects.create(
+                lender=lender, date=date(2024, 1, 1), original_amount=Decimal("10"), currency="EUR",
+            )
+            self.assertTrue(Payment.objects.filter(pk=payment.pk).exists())
+        self.assertFalse(ExchangeRate.objects.exists())
+        self.assertEqual(LenderLedger.objects.get(lender=lender).balance, Decimal("10.00"))
+
+
+class BalanceAnnotationTests(TestCase):
+    """``with_balance()`` / ``with_cost()`` (SQL) gegen die Python-Berechnung, auf Testdaten."""
+
+    def test_sql_matches_python_on_generated_data(self):
+        generate(lenders=40, apartments=3, seed=5)
+        bookings = list(Booking.objects.select_related("apartment", "lender"))
+        rates = list(SeasonalRate.objects.all())
+
+        # Die Testdaten decken alle Sonderfälle der Preislogik ab
+        self.assertTrue(Payment.objects.filter(currency="USD").exists())
+        self.assertTrue(any(booking.lender.discount_percent for booking in bookings))
+        villa = [booking for booking in bookings if booking.apartment.name == VILLA_NAME]
+        self.assertTrue(any(booking.custom_total_price for booking in villa))
+        self.assertTrue(any(not booking.custom_total_price for booking in villa))
+        self.assertTrue(any(
+            rate.apartment_id == booking.apartment_id and (
+                booking.start_date < rate.start_date < booking.end_date
+                or booking.start_date < rate.end_date + timedelta(days=1) < booking.end_date
+            )
+            for booking in bookings for rate in rates
+        ))
+
+        costs = dict(Booking.objects.with_cost().values_list("pk", "cost"))
+        for booking in bookings:
+            self.assertEqual(costs[booking.pk], booking.total_cost(), booking)
+        for lender in Lender.objects.with_balance():
+            total_payments, _total_bookings = lender.calculate_totals()
+            self.assertEqual(lender.total_payments, total_payments, lender)
+            self.assertEqual(lender.balance, lender.calculate_balance(), lender)
+
+
+class LedgerTests(TestCase):
+    """Der Ledger folgt Anlegen, Ändern und Löschen von Zahlungen und Buchungen."""
+
+    def setUp(self):
+        self.apartment = Apartment.objects.create(name="Casa Ledger", price_per_night=Decimal("100.00"))
+        self.anna, self.ben = (
+            Lender.objects.create(first_name=name, last_name="Ledger", email=f"{name.lower()}@example.org",
+                                  address="", postal_code="", country="")
+            for name in ("Anna", "Ben")
+        )
+
+    def balance(self, lender):
+        return LenderLedger.objects.get(lender=lender).balance
+
+    def assertLedgersMatchLive(self):
+        self.assertEqual(verify_ledgers(Lender.objects.select_related("ledger")), [])
+
+    def test_payment_update_and_delete(self):
+        payment = Payment.objects.create(lender=self.anna, date=date(2024, 1, 1), original_amount=Decimal("500"),
+                                         currency="EUR")
+        self.assertEqual(self.balance(self.anna), Decimal("500.00"))
+
+        payment.original_amount = Decimal("800")
+        payment.save()
+        self.assertEqual(self.balance(self.anna), Decimal("800.00"))
+
+        payment.lender = self.ben
+        payment.save()
+        self.assertEqual((self.balance(self.anna), self.balance(self.ben)), (Decimal("0.00"), Decimal("800.00")))
+
+        payment.delete()
+        self.assertEqual(self.balance(self.ben), Decimal("0.00"))
+        self.assertLedgersMatchLive()
+
+    def test_booking_update_and_delete(self):
+        Payment.objects.create(lender=self.anna, date=date(2024, 1, 1), original_amount=Decimal("1000"), currency="EUR")
+        booking = Booking.objects.create(lender=self.anna, apartment=self.apartment,
+                                         start_date=date(2024, 3, 1), end_date=date(2024, 3, 4))
+        self.assertEqual(self.balance(self.anna), Decimal("700.00"))
+
+        booking.end_date = date(2024, 3, 6)
+        booking.save()
+        self.assertEqual(self.balance(self.anna), Decimal("500.00"))
+
+        booking.delete()
+        self.assertEqual(self.balance(self.anna), Decimal("1000.00"))
+        self.assertLedgersMatchLive()
+
+    def test_deletes_cascade(self):
+        Payment.objects.create(lender=self.anna, date=date(2024, 1, 1), original_amount=Decimal("1000"), currency="EUR")
+        Booking.objects.create(lender=self.anna, apartment=self.apartment,
+                               start_date=date(2024, 3, 1), end_date=date(2024, 3, 4))
+        Booking.objects.create(lender=self.ben, apartment=self.apartment,
+                               start_date=date(2024, 4, 1), end_date=date(2024, 4, 3))
+
+        # Apartment weg → Buchungen weg → Saldo wieder gutgeschrieben
+        self.apartment.delete()
+        self.assertEqual((self.balance(self.anna), self.balance(self.ben)), (Decimal("1000.00"), Decimal("0.00")))
+        self.assertLedgersMatchLive()
+
+        # Lender weg → Zahlungen und Ledger weg, der andere Ledger bleibt unberührt
+        anna_id = self.anna.pk
+        self.anna.delete()
+        self.assertFalse(LenderLedger.objects.filter(lender_id=anna_id).exists())
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(self.balance(self.ben), Decimal("0.00"))
+
+
+class BookingOverlapTests(TestCase):
+    """Doppelbuchungen lehnt die Datenbank ab – auch ohne ``full_clean()``."""
+
+    def setUp(self):
+        self.apartment = Apartment.objects.create(name="Casa Overlap", price_per_night=Decimal("80.00"))
+        self.lender = Lender.objects.create(
+            first_name="Olga", last_name="Overlap", email="olga@example.org", address="", postal_code="", country="",
+        )
+        self.booking = self.book(date(2024, 5, 10), date(2024, 5, 15))
+
+    def book(self, start, end, apartment=None):
+        return Booking.objects.create(
+            lender=self.lender, apartment=apartment or self.apartment, start_date=start, end_date=end,
+        )
+
+    def test_overlapping_create_is_rejected(self):
+        for start, end in [
+            (date(2024, 5, 10), date(2024, 5, 15)),
+            (date(2024, 5, 8), date(2024, 5, 11)),
+            (date(2024, 5, 14), date(2024, 5, 20)),
+            (date(2024, 5, 11), date(2024, 5, 12)),
+        ]:
+            with self.subTest(start=start, end=end), self.assertRaises(ValidationError) as raised:
+                self.book(start, end)
+            self.assertEqual(raised.exception.code, "overlap")
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_overlapping_update_and_bulk_create_are_rejected(self):
+        later = self.book(date(2024, 6, 1), date(2024, 6, 5))
+        later.start_date = date(2024, 5, 14)
+        with self.assertRaises(ValidationError) as raised:
+            later.save()
+        self.assertEqual(raised.exception.code, "overlap")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Booking.objects.bulk_create([Booking(
+                lender=self.lender, apartment=self.apartment, start_date=date(2024, 5, 12), end_date=date(2024, 5, 13),
+            )])
+
+    def test_inverted_range_is_a_validation_error(self):
+        for start, end in [(date(2024, 7, 10), date(2024, 7, 5)), (date(2024, 7, 10), date(2024, 7, 10))]:
+            booking = Booking(lender=self.lender, apartment=self.apartment, start_date=start, end_date=end)
+            with self.subTest(start=start, end=end), self.assertRaises(ValidationError) as raised:
+                booking.full_clean()
+            self.assertEqual(raised.exception.error_dict["__all__"][0].code, "invalid_range")
+        # Ohne full_clean() prüft der Constraint nur gültige Zeiträume – kein Datenbankfehler
+        Booking.objects.create(lender=self.lender, apartment=self.apartment,
+                               start_date=date(2024, 5, 14), end_date=date(2024, 5, 11))
+
+    def test_touching_bookings_are_accepted(self):
+        self.book(date(2024, 5, 15), date(2024, 5, 18))  # Anreise am Abreisetag
+        self.book(date(2024, 5, 5), date(2024, 5, 10))  # Abreise am Anreisetag
+        other = Apartment.objects.create(name="Casa Nebenan", price_per_night=Decimal("80.00"))
+        self.book(date(2024, 5, 10), date(2024, 5, 15), apartment=other)
+        self.assertEqual(Booking.objects.count(), 4)
+
+
+@override_settings(LENDERS_METRICS_ENABLED=False)
+class SearchTests(TestCase):
+    """Index-Suche (lenders/search.py) und ihre Rangfolge in der Changelist."""
+
+    def setUp(self):
+        self.lenders = {
+            name: Lender.objects.create(
+                first_name=first, last_name=last, email=f"{first.lower()}.{last.lower()}@example.org",
+                address="", postal_code="", country="",
+            )
+            for name, first, last in [
+                ("mueller", "Jürgen", "Müller"),
+                ("schmidt", "Anna", "Schmidt"),
+                ("schmitz", "Hans", "Schmitz"),
+                ("weber", "Petra", "Weber"),
+            ]
+        }
+
+    def ids(self, *names):
+        return [self.lenders[name].pk for name in names]
+
+    def test_exact_match(self):
+        self.assertEqual(search.search_ids("lender", "Müller"), self.ids("mueller"))
+        self.assertEqual(search.search_ids("lender", "anna schmi"), self.ids("schmidt"))
+        self.assertEqual(search.search_ids("lender", "Zzzyx"), [])
+        self.assertIsNone(search.search_ids("lender", "Mü"))  # zu kurz für den Index
+
+    def test_fuzzy_match(self):
+        self.assertEqual(search.search_ids("lender", "Muller")[0], self.lenders["mueller"].pk)
+        self.assertEqual(search.search_ids("lender", "Schmdit")[0], self.lenders["schmidt"].pk)
+
+    def test_many_matches_return_newest(self):
+        with mock.patch.object(search, "RANK_MAX_MATCHES", 3):
+            self.assertEqual(search.search_ids("lender", "example.org", limit=2), self.ids("weber", "schmitz"))
+
+    def test_changelist_orders_by_rank(self):
+        self.client.force_login(User.objects.create_superuser("search", "search@example.com", "pw"))
+        url = reverse(f"{custom_admin_site.name}:lenders_lender_changelist")
+        response = self.client.get(url, {"q": "Schmdit"})
+        self.assertEqual(response.status_code, 200)
+        results = [lender.pk for lender in response.context["cl"].result_list]
+        self.assertEqual(results[0], self.lenders["schmidt"].pk)
+        self.assertNotIn(self.lenders["weber"].pk, results)
+
+    def test_check_reports_missing_triggers(self):
+        self.assertEqual(search.check_sqlite_triggers(databases=["default"]), [])
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER lenders_lender_fts_update")
+        warnings = search.check_sqlite_triggers(databases=["default"])
+        self.assertEqual([warning.id for warning in warnings], ["lenders.W001"])
+        self.assertIn("lenders_lender_fts_update", warnings[0].msg)
+
+
+@override_settings(LENDERS_METRICS_ENABLED=False)
+class BroadcastEmailTests(TestCase):
+    def test_unknown_language_falls_back_to_german(self):
+        self.client.force_login(User.objects.create_superuser("mail", "mail@example.com", "pw"))
+        lenders = [
+            Lender.objects.create(first_name=first, last_name="Rundmail", email=f"{first.lower()}@example.org",
+                                  address="", postal_code="", country="", language=language)
+            for first, language in [("Dora", "de"), ("Emil", "en"), ("Fleur", "fr"), ("Gustav", "")]
+        ]
+        response = self.client.post(reverse(f"{custom_admin_site.name}:lenders_lender_changelist"), {
+            "action": "broadcast_email",
+            "_selected_action": [lender.pk for lender in lenders],
+            "apply": "1",
+            "subject_de": "Hallo",
+            "message_de": "Deutscher Text",
+            "subject_en": "Hello",
+            "message_en": "English text",
+        })
+        self.assertEqual(response.status_code, 302)
+        subjects = {message.to[0]: message.subject for message in mail.outbox}
+        self.assertEqual(subjects, {
+            "dora@example.org": "Hallo", "emil@example.org": "Hello",
+            "fleur@example.org": "Hallo", "gustav@example.org": "Hallo",
+        })
+
+
+class VillaRuleTests(TestCase):
+    """``Booking.clean``, Angebote und Verfügbarkeitssuche wenden dieselbe Villa-Regel an."""
+
+    def setUp(self):
+        # Commit-Callbacks ausführen, damit Versionszähler und Belegungs-Cache die Daten sehen
+        with self.captureOnCommitCallbacks(execute=True):
+            self.villa = Apartment.objects.create(name=" la villa COMPLETE ", price_per_night=Decimal("650.00"))
+            self.casa = Apartment.objects.create(name="Casa Aktiv", price_per_night=Decimal("80.00"))
+            self.closed = Apartment.objects.create(name="Casa Inaktiv", price_per_night=Decimal("80.00"),
+                                                   is_active=False)
+            self.lender = Lender.objects.create(
+                first_name="Vera", last_name="Villa", email="vera@example.org", address="", postal_code="", country="",
+            )
+            Booking.objects.create(lender=self.lender, apartment=self.casa,
+                                   start_date=date(2024, 8, 1), end_date=date(2024, 8, 20))
+
+    def block(self, apartment):
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(lender=self.lender, apartment=apartment,
+                                   start_date=date(2024, 8, 1), end_date=date(2024, 8, 20))
+
+    def outcomes(self):
+        start, end = date(2024, 8, 5), date(2024, 8, 10)
+        booking = Booking(lender=self.lender, apartment=self.villa, start_date=start, end_date=end)
+        try:
+            booking.full_clean()
+            allowed_by_clean = True
+        except ValidationError as e:
+            self.assertIn("villa_blocked", [error.code for error in e.error_dict["__all__"]])
+            allowed_by_clean = False
+        quote, = quotes.quote_many(self.lender.pk, [quotes.Candidate(self.villa.pk, start, end)])["quotes"]
+        return (
+            allowed_by_clean,
+            not quote["villa_blocked"],
+            self.villa in availability.free_apartments(start, end),
+            availability.next_free_windows(self.villa.pk, 5, start, limit=1)[0].start == start,
+        )
+
+    def test_villa_name_is_matched_loosely(self):
+        self.assertTrue(self.villa.is_villa)
+        self.assertFalse(self.casa.is_villa)
+
+    def test_other_apartments_include_inactive_ones(self):
+        # Das inaktive Apartment ist noch frei – wie in Booking.clean zählt es
+        self.assertEqual(self.outcomes(), (True, True, True, True))
+
+    def test_villa_blocked_when_all_others_are_occupied(self):
+        self.block(self.closed)
+        self.assertEqual(self.outcomes(), (False, False, False, False))
+
+
+class OccupancyCacheTests(TestCase):
+    def test_other_process_booking_is_seen_after_version_bump(self):
+        apartment = Apartment.objects.create(name="Casa Cache", price_per_night=Decimal("80.00"))
+        lender = Lender.objects.create(
+            first_name="Carl", last_name="Cache", email="carl@example.org", address="", postal_code="", country="",
+        )
+        start, end = date(2024, 9, 1), date(2024, 9, 5)
+        self.assertFalse(occupancy.get_occupancy(start, end).is_occupied(apartment.pk, start, end))
+
+        # Ein anderer Worker bucht: kein Signal in diesem Prozess, nur der Versionszähler ändert sich
+        Booking.objects.bulk_create([Booking(lender=lender, apartment=apartment, start_date=start, end_date=end)])
+        self.assertFalse(occupancy.get_occupancy(start, end).is_occupied(apartment.pk, start, end))
+        bump_version("booking")
+        self.assertTrue(occupancy.get_occupancy(start, end).is_occupied(apartment.pk, start, end))
+
+
+class QuoteTests(TestCase):
+    def test_quotes_see_bookings_from_other_workers(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            apartment = Apartment.objects.create(name="Casa Angebot", price_per_night=Decimal("80.00"))
+            lender = Lender.objects.create(
+                first_name="Quirin", last_name="Quote", email="quirin@example.org", address="", postal_code="",
+                country="",
+            )
+        candidate = quotes.Candidate(apartment.pk, date(2024, 10, 1), date(2024, 10, 4))
+        quote, = quotes.quote_many(lender.pk, [candidate])["quotes"]
+        self.assertFalse(quote["overlap"])
+
+        # Gebucht über einen anderen Weg (anderer Worker, Import): hier kommt nur der Versionszähler an
+        Booking.objects.bulk_create([
+            Booking(lender=lender, apartment=apartment, start_date=date(2024, 10, 2), end_date=date(2024, 10, 6)),
+        ])
+        bump_version("booking")
+        quote, = quotes.quote_many(lender.pk, [candidate])["quotes"]
+        self.assertTrue(quote["overlap"])
+        self.assertEqual(quote["status"], "warning")
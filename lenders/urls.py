@@ -10,6 +10,8 @@ urlpatterns = [
     path("calendar/events/", views.booking_events, name="booking_events"),
 
     # ⚠️ Ajax-Checks
+    path("quotes/", views.quotes, name="quotes"),
+    path("availability/", views.availability, name="availability"),
     path("check_booking_warnings/", views.check_booking_warnings, name="check_booking_warnings"),
     path("check_balance/", views.check_balance, name="check_balance"),
 
@@ -17,4 +19,7 @@ urlpatterns = [
     path("reports/raw/", views.payment_list_raw, name="report_raw_payments"),
     path("reports/with-usage/", views.payment_list_with_usage, name="report_payments_with_usage"),
     path("reports/apartments/", views.apartment_price_list, name="report_apartment_prices"),
+
+    # 📤 Exporte, z. B. /lenders/exports/payments.csv?date_from=2025-01-01
+    path("exports/<str:dataset>.<str:fmt>", views.export, name="export"),
 ]
@@ -3,9 +3,15 @@ from django.http import HttpResponse
 from django.http import JsonResponse
 from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.csrf import csrf_exempt
-from .models import Lender, Apartment, Booking
+from django.views.decorators.http import condition, require_POST
+from django.utils import timezone
+from .availability import free_apartments, next_free_windows
+from .cache import CALENDAR_EVENTS, get_versions, last_modified
+from .forms import AvailabilityForm, FreeWindowForm
+from .models import Apartment, Booking
+from .quotes import QuoteError, parse_candidates, parse_id, quote_many
 from datetime import datetime, timedelta
-from decimal import Decimal
+import json
 
 # -------------------------------
 # 📅 Kalenderansicht
@@ -16,106 +22,172 @@ def lenders_home(request):
     
 @staff_member_required
 def calendar_view(request):
-    from .models import Apartment, Booking
-    from datetime import timedelta
-
+    # Die Termine lädt FullCalendar selbst über booking_events – nur für den sichtbaren Zeitraum.
     apartments = Apartment.objects.all()
-    bookings = Booking.objects.select_related("apartment", "lender").all()
-
-    events = []
-    for booking in bookings:
-        color = booking.apartment.color or "#999999"
-        events.append({
-            "title": f"{booking.apartment.name} – {booking.lender.first_name}",
-            "start": booking.start_date.isoformat(),
-            "end": (booking.end_date + timedelta(days=1)).isoformat(),
-            "color": color,
-        })
-
     return render(request, "lenders/calendar.html", {
-        "bookings": events,  # <-- das brauchst du
         "apartments": apartments,
     })
 
+
+CALENDAR_MODELS = CALENDAR_EVENTS.depends_on
+
+
+def get_contrast_color(hex_color):
+    hex_color = hex_color.lstrip('#')
+    r, g, b = [int(hex_color[i:i+2], 16) for i in (0, 2, 4)]
+    brightness = (r*299 + g*587 + b*114) / 1000
+    return '#000000' if brightness > 150 else '#ffffff'
+
+
+def _calendar_range(request):
+    """FullCalendar schickt ``start``/``end`` als ISO-Zeitstempel, z. B. 2025-06-29T00:00:00+02:00."""
+    def parse(value):
+        try:
+            return datetime.strptime(value[:10], "%Y-%m-%d").date() if value else None
+        except ValueError:
+            return None
+    return parse(request.GET.get("start")), parse(request.GET.get("end"))
+
+
+def _events_etag(request):
+    start, end = _calendar_range(request)
+    return f"{get_versions(*CALENDAR_MODELS)}:{start}:{end}"
+
+
+def _events_last_modified(request):
+    return last_modified(*CALENDAR_MODELS)
+
+
 @staff_member_required
+@condition(etag_func=_events_etag, last_modified_func=_events_last_modified)
 def booking_events(request):
-    """Liefert alle Buchungen als JSON (für FullCalendar oder JS-Frontend)."""
-    def get_contrast_color(hex_color):
-        hex_color = hex_color.lstrip('#')
-        r, g, b = [int(hex_color[i:i+2], 16) for i in (0, 2, 4)]
-        brightness = (r*299 + g*587 + b*114) / 1000
-        return '#000000' if brightness > 150 else '#ffffff'
-
-    bookings = Booking.objects.select_related("apartment", "lender").all()
-    events = []
+    """Liefert die Buchungen im angefragten Zeitraum als JSON (für FullCalendar).
+
+    Ohne ``start``/``end`` werden alle Buchungen geliefert. Antwortet mit 304,
+    solange sich Buchungen, Apartments und Lender nicht geändert haben.
+    """
+    start, end = _calendar_range(request)
+    events = CALENDAR_EVENTS.get_or_build(lambda: _build_events(start, end), start, end)
+    return JsonResponse(events, safe=False)
+
 
-    for booking in bookings:
-        color = booking.apartment.color or "#999999"
-        text_color = get_contrast_color(color)
+def _build_events(start, end):
+    colors = {}
+    for pk, color in Apartment.objects.values_list("pk", "color"):
+        color = color or "#999999"
+        colors[pk] = (color, get_contrast_color(color))
 
+    bookings = Booking.objects.order_by("start_date")
+    if start:
+        # Das Event endet (exklusiv) am Tag nach end_date
+        bookings = bookings.filter(end_date__gte=start)
+    if end:
+        bookings = bookings.filter(start_date__lt=end)
+
+    events = []
+    for apartment_id, apartment_name, first_name, b_start, b_end in bookings.values_list(
+        "apartment_id", "apartment__name", "lender__first_name", "start_date", "end_date"
+    ):
+        color, text_color = colors[apartment_id]
         events.append({
-            "title": f"{booking.apartment.name} – {booking.lender.first_name}",
-            "start": booking.start_date.isoformat(),
-            "end": (booking.end_date + timedelta(days=1)).isoformat(),
+            "title": f"{apartment_name} – {first_name}",
+            "start": b_start.isoformat(),
+            "end": (b_end + timedelta(days=1)).isoformat(),
             "color": color,
             "textColor": text_color,
         })
-
-    return JsonResponse(events, safe=False)
+    return events
 
 
 # -------------------------------
-# ✅ Neue kombinierte Prüfung
+# 💶 Angebote: Preis, Saldo und Belegung für viele Zeiträume
 # -------------------------------
 
-@csrf_exempt
+@require_POST
 @staff_member_required
-def check_booking_warnings(request):
-    """Prüft Saldo und Villa-Blockierung."""
-    apartment_id = request.POST.get("apartment")
-    lender_id = request.POST.get("lender")
-    start = request.POST.get("start_date")
-    end = request.POST.get("end_date")
+def quotes(request):
+    """JSON: ``{"lender": 1, "booking": 7, "candidates": [{"apartment": 2, "start_date": …, "end_date": …}]}``.
+
+    ``booking`` (optional) ist die gerade bearbeitete Buchung.
+    """
+    try:
+        data = json.loads(request.body or b"{}")
+        if not isinstance(data, dict):
+            raise QuoteError("JSON-Objekt erwartet")
+        lender_id = parse_id(data.get("lender"), "lender")
+        booking_id = parse_id(data["booking"], "booking") if data.get("booking") else None
+        result = quote_many(lender_id, parse_candidates(data.get("candidates")), booking_id=booking_id)
+    except ValueError as e:  # auch json.JSONDecodeError
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+    return JsonResponse({"status": "ok", **result})
+
+
+def _single_quote(request):
+    """Ein Kandidat aus den Formularfeldern der alten Prüf-Endpunkte; ``None``, wenn unvollständig."""
+    fields = [request.POST.get(name) for name in ("lender", "apartment", "start_date", "end_date")]
+    if not all(fields):
+        return None
+    lender_id, apartment, start, end = fields
+    booking_id = request.POST.get("booking")
+    candidates = parse_candidates([{"apartment": apartment, "start_date": start, "end_date": end}])
+    return quote_many(
+        parse_id(lender_id, "lender"), candidates,
+        booking_id=parse_id(booking_id, "booking") if booking_id else None,
+    )["quotes"][0]
 
-    if not all([apartment_id, lender_id, start, end]):
-        return JsonResponse({"status": "incomplete"})
-
-    apartment = Apartment.objects.get(id=apartment_id)
-    lender = Lender.objects.get(id=lender_id)
-    start = datetime.strptime(start, "%Y-%m-%d").date()
-    end = datetime.strptime(end, "%Y-%m-%d").date()
-    nights = (end - start).days
 
-    warnings = []
-
-    rabatt = lender.discount_percent or Decimal('0')
-    preis = apartment.price_per_night
-    kosten = (Decimal(nights) * preis * (Decimal('1') - rabatt / Decimal('100'))).quantize(Decimal('0.01'))
-    saldo = lender.current_balance()
+# -------------------------------
+# 🔍 Verfügbarkeit: freie Apartments und nächste freie Zeitfenster
+# -------------------------------
 
-    if kosten > saldo:
-        warnings.append(
-            f"⚠️ Guthaben: Buchung kostet <strong>{kosten:.2f} €</strong>, Guthaben beträgt nur <strong>{saldo:.2f} €</strong>."
+@staff_member_required
+def availability(request):
+    """``?start_date=…&end_date=…`` → freie Apartments;
+    ``?apartment=…&nights=…[&after=…&limit=…]`` → nächste freie Zeitfenster."""
+    if "apartment" in request.GET:
+        form = FreeWindowForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({"status": "error", "errors": form.errors}, status=400)
+        data = form.cleaned_data
+        windows = next_free_windows(
+            data["apartment"].pk, data["nights"], data["after"] or timezone.localdate(), data["limit"] or 5,
         )
+        return JsonResponse({
+            "status": "ok",
+            "apartment": data["apartment"].pk,
+            "nights": data["nights"],
+            "windows": [
+                {"start_date": w.start, "end_date": w.end, "free_until": w.free_until} for w in windows
+            ],
+        })
+
+    form = AvailabilityForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"status": "error", "errors": form.errors}, status=400)
+    apartments = free_apartments(form.cleaned_data["start_date"], form.cleaned_data["end_date"])
+    return JsonResponse({
+        "status": "ok",
+        "start_date": form.cleaned_data["start_date"],
+        "end_date": form.cleaned_data["end_date"],
+        "apartments": [{"id": a.pk, "name": a.name} for a in apartments],
+    })
 
-    if apartment.name.strip().lower() == "la villa complete":
-        other_apartments = Apartment.objects.exclude(name__iexact="La Villa Complete")
-        all_occupied = True
-        for apt in other_apartments:
-            if not Booking.objects.filter(
-                apartment=apt,
-                start_date__lt=end,
-                end_date__gt=start,
-            ).exists():
-                all_occupied = False
-                break
 
-        if all_occupied:
-            warnings.append(
-                "📌 Hinweis: 'La Villa Complete' darf nur gebucht werden, wenn <strong>mindestens eine andere Wohnung frei</strong> ist."
-            )
+# -------------------------------
+# ✅ Kombinierte Prüfung (ein Zeitraum, Formular-POST)
+# -------------------------------
 
-    return JsonResponse({"status": "ok", "warnings": warnings})
+@csrf_exempt
+@staff_member_required
+def check_booking_warnings(request):
+    """Prüft Saldo, Belegung und Villa-Blockierung."""
+    try:
+        quote = _single_quote(request)
+    except QuoteError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+    if quote is None:
+        return JsonResponse({"status": "incomplete"})
+    return JsonResponse({"status": "ok", "warnings": quote.get("warnings", [])})
 
 
 # -------------------------------
@@ -126,78 +198,67 @@ def check_booking_warnings(request):
 @staff_member_required
 def check_balance(request):
     """Nur Saldo-Prüfung – Legacy-Kompatibilität für JS."""
-    lender_id = request.POST.get("lender")
-    apartment_id = request.POST.get("apartment")
-    start = request.POST.get("start_date")
-    end = request.POST.get("end_date")
-
-    if not all([lender_id, apartment_id, start, end]):
+    try:
+        quote = _single_quote(request)
+    except QuoteError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+    if quote is None:
         return JsonResponse({"status": "incomplete"})
-
-    lender = Lender.objects.get(id=lender_id)
-    apartment = Apartment.objects.get(id=apartment_id)
-
-    start = datetime.strptime(start, "%Y-%m-%d").date()
-    end = datetime.strptime(end, "%Y-%m-%d").date()
-    nights = (end - start).days
-
-    if nights <= 0:
+    if quote["status"] == "invalid":
         return JsonResponse({"status": "invalid_dates"})
-
-    rabatt = lender.discount_percent or Decimal('0')
-    preis = apartment.price_per_night
-    kosten = (Decimal(nights) * preis * (Decimal('1') - rabatt / Decimal('100'))).quantize(Decimal('0.01'))
-    saldo = lender.current_balance()
-
-    if kosten > saldo:
+    if not quote["affordable"]:
         return JsonResponse({
             "status": "warning",
-            "saldo": f"{saldo:.2f}",
-            "kosten": f"{kosten:.2f}"
+            "saldo": f"{quote['balance_after'] + quote['price']:.2f}",
+            "kosten": f"{quote['price']:.2f}"
         })
-    else:
-        return JsonResponse({"status": "ok"})
-        
-  # -------------------------------
+    return JsonResponse({"status": "ok"})
+
+
+# -------------------------------
 # 📄 Admin-Reports
 # -------------------------------
-from .models import Payment  # Stelle sicher, dass Payment importiert ist
-from collections import defaultdict
+from . import reports
 
 @staff_member_required
 def payment_list_raw(request):
-    """Alle Zahlungen, sortiert nach Lender und Datum."""
-    payments = Payment.objects.select_related("lender").order_by("lender__last_name", "date")
-    return render(request, "admin/lenders/reports/payment_list_raw.html", {
-        "payments": payments
-    })
+    """Alle Zahlungen, sortiert nach Lender und Datum – seitenweise und filterbar."""
+    return render(request, "admin/lenders/reports/payment_list_raw.html", reports.payment_list_raw_context(request))
 
 
 @staff_member_required
 def payment_list_with_usage(request):
     """Zahlungen mit Aufstellung der verbrauchten Buchungskosten."""
-    lender_data = defaultdict(lambda: {"payments": [], "total": Decimal(0), "used": Decimal(0)})
-
-    for payment in Payment.objects.select_related("lender").all():
-        data = lender_data[payment.lender]
-        data["payments"].append(payment)
-        data["total"] += payment.amount_eur()
-
-    for booking in Booking.objects.select_related("lender").all():
-        lender_data[booking.lender]["used"] += booking.total_cost()
-
     return render(request, "admin/lenders/reports/payment_list_with_usage.html", {
-        "lender_data": dict(lender_data)
+        "table": reports.payment_list_with_usage_table()
     })
 
 
 @staff_member_required
 def apartment_price_list(request):
     """Schöne Preisliste für Appartements."""
-    apartments = Apartment.objects.filter(is_active=True).order_by("name")
     return render(request, "admin/lenders/reports/apartment_price_list.html", {
-        "apartments": apartments
+        "table": reports.apartment_price_list_table(active_only=True)
     })
+
+
+# -------------------------------
+# 📤 Exporte (CSV / Excel)
+# -------------------------------
+from django.http import Http404
+from . import exports
+from .forms import ExportFilterForm
+
+@staff_member_required
+def export(request, dataset, fmt):
+    """Streamt Zahlungen, Buchungen oder Salden; Filter per GET (von/bis, Lender, Apartment)."""
+    if dataset not in exports.DATASETS or fmt not in exports.FORMATS:
+        raise Http404("Unbekannter Export")
+    form = ExportFilterForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    return exports.export_response(dataset, fmt, **form.cleaned_data)
+
       
 from django.shortcuts import render
 